@@ -32,6 +32,7 @@ setup(
         "docker",
         "kubernetes",
         "hashids",
+        "grpcio-health-checking",
     ],
     zip_safe=False,
 )
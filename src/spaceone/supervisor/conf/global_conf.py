@@ -20,11 +20,29 @@ CONNECTORS = {
     },
     "DockerConnector": {
         # "start_port": 50060,
-        # "end_port": 50090
+        # "end_port": 50090,
+        # "inventory_ttl": 30,
+        # "connection_pool_maxsize": 16,
+        # "rate_limit": {"qps": 20, "burst": 40},
+        # "placement": "least_loaded",   # least_loaded | bin_packing
+        # "hosts": [
+        #     {
+        #         "name": "docker-1",
+        #         "base_url": "tcp://10.0.0.1:2376",
+        #         "hostname": "10.0.0.1",
+        #         "start_port": 50060,
+        #         "end_port": 50090,
+        #         "max_plugins": 20
+        #     },
+        #     {...}
+        # ]
     },
     "KubernetesConnector": {
         # "start_port": 50060,
         # "end_port": 50090,
+        # "inventory_ttl": 30,
+        # "connection_pool_maxsize": 16,
+        # "rate_limit": {"qps": 20, "burst": 40},
         # "namespace": "supervisor",
         # "service_account": "service_account_name",
         # "env": [
@@ -46,13 +64,43 @@ CONNECTORS = {
         # "volume_mounts": [
         # ],
         # "headless": True,
+        # "endpoints_ttl": 10,
+        # "capacity_ttl": 30,
+        # "watch_endpoints": True,
         # "replica": {
         #    "inventory.collector": 4
         # },
+        # "autoscaling": {
+        #     "inventory.collector": {
+        #         "min_replicas": 1,
+        #         "max_replicas": 8,
+        #         "target_cpu_utilization": 70
+        #     },
+        #     "inventory.collector?plugin-aws-ec2-inven-collector": {...}
+        # },
         # "nodeSelector": {
         #     "Category": "supervisor"
         # }
     },
+    "MultiKubernetesConnector": {
+        # "start_port": 50060,
+        # "end_port": 50090,
+        # "placement": "least_loaded",   # least_loaded | bin_packing
+        # ... options of KubernetesConnector, default of every target
+        # "targets": [
+        #     {
+        #         "name": "cluster-a",
+        #         "kubeconfig": "/opt/spaceone/supervisor/kubeconfig",
+        #         "context": "cluster-a",
+        #         "namespace": "supervisor",
+        #         # reachable from plugin service
+        #         "hostname": "supervisor.svc.cluster-a.example.com",
+        #         "max_plugins": 100,
+        #         "affinity": {"resource_type": ["inventory.collector"]}
+        #     },
+        #     {...}
+        # ]
+    },
 }
 
 HANDLERS = {
@@ -83,12 +131,18 @@ SCHEDULERS = {
     # 'publish': {
     #     'backend': 'spaceone.supervisor.scheduler.publish_scheduler.PublishScheduler',
     #     'queue': 'default_q',
-    #     'interval': 30
+    #     'interval': 10
     # },
     # 'sync': {
     #     'backend': 'spaceone.supervisor.scheduler.sync_scheduler.SyncScheduler',
     #     'queue': 'default_q',
     #     'interval': 120
+    # },
+    # 'event': {
+    #     'backend': 'spaceone.supervisor.scheduler.event_scheduler.EventScheduler',
+    #     'queue': 'plugin_event_q',
+    #     'debounce': 2,
+    #     'retry_interval': 10
     # }
 }
 
@@ -106,6 +160,97 @@ BACKEND = "DockerConnector"
 TAGS = {}
 LABELS = {}
 
+# Host many supervisors (domains) in one process
+# NAME, HOSTNAME, TOKEN, TAGS and LABELS are ignored, if SUPERVISORS is set
+SUPERVISORS = [
+    # {
+    #     "name": "root",
+    #     "hostname": "root-supervisor.svc.cluster.local",
+    #     "token": "...",
+    #     "tags": {},
+    #     "labels": [],
+    #     "start_port": 50060,
+    #     "end_port": 50090
+    # },
+]
+# size of worker pool shared by every supervisor
+SUPERVISOR_WORKERS = 4
+
+# Readiness wait of plugin is learned from time-to-ready of each image:version
+# after min_samples installs: timeout = p95 * factor (min_timeout ~ max_timeout)
+READINESS = {
+    "enabled": True,
+    "half_life": 86400,
+    "min_samples": 5,
+    "factor": 2,
+    "min_timeout": 30,
+    "max_timeout": 900,
+}
+
+# Time budget of one sync pass (seconds), must be shorter than sync lock (600)
+# Installs, deletes and waits which do not fit are deferred to next sync
+SYNC_BUDGET = 540
+
+# gRPC health check of published plugin endpoints
+# Supervisor must reach published endpoints (HOSTNAME, network policies)
+HEALTH_CHECK = {
+    "enabled": False,
+    "timeout": 2,
+    "cache_ttl": 30,
+    "pool_size": 16,
+    "failure_threshold": 3,
+    # reinstall plugin failing failure_threshold times in a row,
+    # otherwise failure only changes published state
+    "reprovision": False,
+}
+
+# Scale unused plugins to zero (Service, port and endpoint are kept)
+# Idle plugin wakes up, if plugin service asks RE_PROVISIONING of it
+# DockerConnector keeps idle marker at state store, so STATE_STORE.path is required
+IDLE_POLICY = {
+    "enabled": False,
+    "idle_timeout": 3600,
+    # millicores, plugin is idle below this CPU usage
+    "cpu_threshold": 5,
+    # state of idle plugin at Supervisor.publish
+    "publish_state": "PROVISIONING",
+}
+
+# Publish as soon as each plugin is ready during sync
+# requests within window (seconds) are merged into one Supervisor.publish
+INCREMENTAL_PUBLISH = {
+    "enabled": True,
+    "window": 2,
+}
+
+# Run many replicas of one supervisor, each replica syncs its own share of plugins
+# Replica keeps lease at cache (CACHES is required), member_id is HOSTNAME by default
+SHARDING = {
+    "enabled": False,
+    "lease_ttl": 180,
+    "vnodes": 64,
+}
+
+# Retry of plugin and repository service calls (exponential backoff with jitter)
+# Circuit of service opens after failure_threshold consecutive transient errors,
+# calls fail fast for reset_timeout seconds
+RESILIENCE = {
+    "max_retries": 3,
+    "base_delay": 0.2,
+    "max_delay": 2,
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+}
+
+# Local state (desired plugins, inventory, reserved ports, pending operations)
+# Empty path disables state store, mount persistent volume to keep it over restart
+STATE_STORE = {
+    "path": "",
+    # "path": "/var/lib/supervisor/state.db",
+    # restored inventory older than this is ignored (seconds)
+    "max_inventory_age": 600,
+}
+
 # This is admin user token for this domain
 # If you want remote TOKEN for security, use TOKEN_INFO instead of TOKEN
 TOKEN = ""
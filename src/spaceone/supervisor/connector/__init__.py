@@ -1,4 +1,40 @@
+import importlib
+from importlib.metadata import entry_points
+
 from spaceone.supervisor.connector.plugin_connector import PluginConnector
-from spaceone.supervisor.connector.docker_connector import DockerConnector
-from spaceone.supervisor.connector.kubernetes_connector import KubernetesConnector
 from spaceone.supervisor.connector.repository_connector import RepositoryConnector
+
+# Container backends are imported on first lookup,
+# so only SDK of the configured BACKEND (docker | kubernetes) is loaded.
+BACKENDS = {
+    "DockerConnector": "spaceone.supervisor.connector.docker_connector",
+    "KubernetesConnector": "spaceone.supervisor.connector.kubernetes_connector",
+    "MultiKubernetesConnector": "spaceone.supervisor.connector.multi_kubernetes_connector",
+}
+
+# Third party backend is registered as entry point
+# ex) [spaceone.supervisor.backends]
+#     MyConnector = my_package.my_connector:MyConnector
+BACKEND_ENTRY_POINT_GROUP = "spaceone.supervisor.backends"
+
+
+def __getattr__(name):
+    if name in BACKENDS:
+        backend = getattr(importlib.import_module(BACKENDS[name]), name)
+    else:
+        backend = _load_entry_point(name)
+    globals()[name] = backend
+    return backend
+
+
+def _load_entry_point(name):
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        eps = eps.select(group=BACKEND_ENTRY_POINT_GROUP)
+    else:
+        # python < 3.10
+        eps = eps.get(BACKEND_ENTRY_POINT_GROUP, [])
+    for entry_point in eps:
+        if entry_point.name == name:
+            return entry_point.load()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
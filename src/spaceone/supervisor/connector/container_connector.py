@@ -14,29 +14,142 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import threading
+
 from spaceone.core.connector import BaseConnector
-from spaceone.core import pygrpc
+from spaceone.core import config, pygrpc
 from spaceone.core.utils import parse_endpoint
 from spaceone.core.error import ERROR_NOT_IMPLEMENTED
 
+from spaceone.supervisor.lib.capacity import CapacityModel
+from spaceone.supervisor.lib.readiness_stats import ReadinessStats
+
+_READINESS_STATS = None
+_READINESS_STATS_LOCK = threading.Lock()
+
 
 class ContainerConnector(BaseConnector):
+    # LabelIndex of backend
+    _label_index = None
+    # StateStore shared by supervisor processes, None if not configured (set by SupervisorManager)
+    state_store = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def search(self, filters):
         raise ERROR_NOT_IMPLEMENTED(name='search')
 
-    def run(self, image, labels, ports, name, registry_config):
+    def run(self, image, labels, ports, name, registry_config, deadline=None):
         # Create Container
         raise ERROR_NOT_IMPLEMENTED(name='run')
 
-    def stop(self, container_id):
+    def stop(self, plugin):
         # Delete Container
         raise ERROR_NOT_IMPLEMENTED(name='stop')
 
+    def reconcile(self, plugin, image=None):
+        # Container can not be updated in place
+        return False
+
+    def supports_reconcile(self):
+        # reconcile is no-op, caller can skip building desired spec
+        return False
+
+    def scale(self, plugin, replicas=None):
+        # Scale to zero is not supported
+        return False
+
+    def get_usage(self, plugins):
+        # CPU usage is unknown
+        return {}
+
     def get(self, container_id):
         raise ERROR_NOT_IMPLEMENTED(name='get')
 
-    def list_used_ports(self):
+    def select_host(self, labels=None):
+        # Single host backend
+        return None
+
+    def list_used_ports(self, host=None):
         return set([])
+
+    def list_hosts(self):
+        # Single host backend
+        return [None]
+
+    def get_capacity(self):
+        # Capacity is unknown, every plugin is admitted
+        return CapacityModel()
+
+    def get_plugin_request(self, labels):
+        # One container per plugin
+        return {'pods': 1}
+
+    def get_rate_limit_stats(self):
+        # Backend API calls are not limited
+        return {}
+
+    def watch(self, callback):
+        # Backend can not notify changes
+        return False
+
+    def refresh(self):
+        # Rebuild inventory from backend
+        pass
+
+    def snapshot(self):
+        """ Inventory for local state store
+
+        Returns: [(key, PluginRecord), ...]
+        """
+        if self._label_index is None:
+            return []
+        return [(self._get_index_key(plugin), plugin) for plugin in self._label_index.query([])]
+
+    def restore(self, plugins, age):
+        """ Seed inventory from local state store
+
+        Args:
+            plugins: list of PluginRecord
+            age: seconds since plugins were saved
+        """
+        if self._label_index is None:
+            return
+        self._label_index.replace(
+            [(self._get_index_key(plugin), plugin, plugin.labels) for plugin in plugins], age)
+
+    def _get_wait_policy(self, image, timeout, initial_delay, interval):
+        """ Readiness wait of image, learned from previous installs
+
+        Returns: (timeout, initial_delay, interval)
+        """
+        stats = _get_readiness_stats()
+        if stats is None:
+            return timeout, initial_delay, interval
+        return stats.get_wait_policy(image, timeout, initial_delay, interval)
+
+    def _observe_ready(self, image, seconds):
+        """ Time to ready of image, only for installs which became ready
+
+        Timeout is censored (time to ready is unknown), so it is not observed.
+        Image which never gets ready keeps default wait, instead of escalating to max_timeout.
+        """
+        stats = _get_readiness_stats()
+        if stats is not None:
+            stats.observe(image, seconds)
+
+    def _get_index_key(self, plugin):
+        return plugin.name
+
+
+def _get_readiness_stats():
+    """ Shared by every connector, None if disabled"""
+    global _READINESS_STATS
+    conf = config.get_global('READINESS', {})
+    if conf.get('enabled', True) is False:
+        return None
+    with _READINESS_STATS_LOCK:
+        if _READINESS_STATS is None:
+            _READINESS_STATS = ReadinessStats(**{k: v for k, v in conf.items() if k != 'enabled'})
+        return _READINESS_STATS
@@ -19,80 +19,83 @@ __all__ = ["DockerConnector"]
 import docker
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from spaceone.core.error import ERROR_CONFIGURATION
 
 from spaceone.supervisor.connector.container_connector import ContainerConnector
+from spaceone.supervisor.error.supervisor import ERROR_NO_AVAILABLE_HOST
+from spaceone.supervisor.lib.capacity import CapacityModel
+from spaceone.supervisor.lib.deadline import Deadline
+from spaceone.supervisor.lib.label_index import LabelIndex
+from spaceone.supervisor.lib.rate_limiter import RateLimiter, RateLimitedProxy, HIGH, NORMAL, LOW
+from spaceone.supervisor.model.plugin_record import PluginRecord
 
 _LOGGER = logging.getLogger(__name__)
 
 # max second for status checking
 MAX_COUNT = 180
+# max second between full inventory refresh of label index
+INVENTORY_TTL = 30
+
+# max connections per docker daemon
+CONNECTION_POOL_MAXSIZE = 16
+
+# API calls per second (and burst) to each docker daemon
+RATE_LIMIT = {'qps': 20, 'burst': 40}
+# docker API, which changes containers
+MUTATING_APIS = ('create_container', 'start', 'stop', 'kill', 'restart', 'remove_container', 'pull')
+
+DEFAULT_HOST = {'name': 'local', 'base_url': 'unix://var/run/docker.sock'}
+HOST_LABEL = 'spaceone.supervisor.plugin.host'
 
 
 class DockerConnector(ContainerConnector):
+    _label_index = LabelIndex()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         _LOGGER.debug(f'[DockerConnector] config: {self.config}')
+        self.placement = self.config.get('placement', 'least_loaded')
+        # Without hosts, supervisor uses local docker daemon only
+        self.hosts = {host['name']: host for host in self.config.get('hosts', [DEFAULT_HOST])}
+        self.clients = {}
+        self.rate_limiters = {}
+        rate_limit = self.config.get('rate_limit', RATE_LIMIT)
         try:
-            self.client = docker.DockerClient(base_url='unix://var/run/docker.sock')
+            for name, host in self.hosts.items():
+                client = docker.DockerClient(
+                    base_url=host['base_url'],
+                    max_pool_size=self.config.get('connection_pool_maxsize', CONNECTION_POOL_MAXSIZE))
+                # every container and model API goes through client.api
+                self.rate_limiters[name] = RateLimiter(rate_limit['qps'], rate_limit['burst'])
+                client.api = RateLimitedProxy(client.api, self.rate_limiters[name], _get_priority)
+                self.clients[name] = client
         except Exception as e:
             _LOGGER.debug(f'[DockerConnector] {e}')
             raise ERROR_CONFIGURATION(key='docker configuration')
 
     def __del__(self):
-        self.client.close()
+        for client in self.clients.values():
+            client.close()
 
     def search(self, filters):
-        count = 0
-        plugins_info = []
         _LOGGER.debug(f'[search] filters: {filters}')
-        containers = self.client.containers.list(filters=filters)
-        count = len(containers)
+        if self._label_index.is_stale(self.config.get('inventory_ttl', INVENTORY_TTL)):
+            self._refresh_inventory()
+        plugins_info = self._label_index.query(filters.get('label', []))
+        count = len(plugins_info)
         _LOGGER.debug(f'[search] discovered containers: {count}')
-        for container in containers:
-            # Custom Labels
-            labels = container.labels
-            _LOGGER.debug("[DockerConnector] labels=%s" % labels)
-            if 'spaceone.supervisor.plugin_id' in labels:
-                plugin_id = labels['spaceone.supervisor.plugin_id']
-            else:
-                plugin_id = "Unknown"
-            if 'spaceone.supervisor.plugin.image' in labels:
-                image = labels['spaceone.supervisor.plugin.image']
-            else:
-                image = "Unknown"
-            if 'spaceone.supervisor.plugin.version' in labels:
-                version = labels['spaceone.supervisor.plugin.version']
-            else:
-                version = "Unknown"
-            if 'spaceone.supervisor.plugin.endpoint' in labels:
-                endpoint = labels['spaceone.supervisor.plugin.endpoint']
-            else:
-                endpoint = "Unknown"
-
-            # Ports
-            ports = container.attrs['NetworkSettings']['Ports']
-            plugin = {
-                'docker_id': container.id,
-                'plugin_id': plugin_id,
-                'image': image,
-                'version': version,
-                'ports': ports,
-                'endpoint': endpoint,
-                'labels': container.labels,
-                'name': container.name,
-                'status': self._update_state_machine(container.status)
-                }
-            plugins_info.append(plugin)
         return {'results': plugins_info, 'total_count': count}
 
-    def run(self, image, labels, ports, name, registry_config):
+    def run(self, image, labels, ports, name, registry_config, deadline=None):
         """ Make sure, custom label is exist
         custom labels:
          - spaceone.supervisor.plugin_id
          - spaceone.supervisor.plugin.image
          - spaceone.supervisor.plugin.version
+
+        Waiting for running stops at deadline, container is returned as it is.
         """
 
         # ports (dict)
@@ -101,55 +104,45 @@ class DockerConnector(ContainerConnector):
         # {'8080/tcp': 80}    , expose 8080/tcp to 80 (public)
         docker_ports = {'%s/tcp' % ports['TargetPort']: int(ports['HostPort'])}
         # command = "/bin/bash -c 'sleep 360'"
-        _LOGGER.debug("Create Docker ...")
+        host = labels.get(HOST_LABEL, self._get_default_host())
+        client = self.clients[host]
+        _LOGGER.debug(f"Create Docker at {host} ...")
         try:
-            container = self.client.containers.run(image=image, labels=labels, ports=docker_ports,
-                                                   name=name, detach=True, auto_remove=True)
+            container = self._get_or_create_container(client, image, labels, docker_ports, name)
+            # existing idle container is started again
+            self._set_idle(name, False)
 
             ######################
             # Wait until running
             ######################
-            count = 1
-            time.sleep(5)
-            status = self._get_status(container.id)
-            while status != "running":
-                time.sleep(1)
-                count = count + 1
-                status = self._get_status(container.id)
+            timeout, initial_delay, interval = self._get_wait_policy(image, MAX_COUNT, 5, 1)
+            wait = (deadline or Deadline()).limit(timeout)
+            started_at = time.monotonic()
+            status = container.status
+            waited = status != "running"
+            if waited and wait.sleep(initial_delay):
+                status = self._get_status(client, container.id)
+            # exited container does not start by itself
+            while status not in ('running', 'exited', 'dead') and wait.sleep(interval):
+                status = self._get_status(client, container.id)
                 _LOGGER.debug(f'[run] docker status check: {status}')
-                if count > MAX_COUNT:
-                    break
-
-            # Get up-to-date information
-            container = self.client.containers.get(container.id)
-            labels = container.labels
-            if 'spaceone.supervisor.plugin_id' in labels:
-                plugin_id = labels['spaceone.supervisor.plugin_id']
-            else:
-                plugin_id = "Unknown"
-            if 'spaceone.supervisor.plugin.image' in labels:
-                image = labels['spaceone.supervisor.plugin.image']
+            if status == "running":
+                if waited:
+                    self._observe_ready(image, time.monotonic() - started_at)
             else:
-                image = "Unknown"
-            if 'spaceone.supervisor.plugin.version' in labels:
-                version = labels['spaceone.supervisor.plugin.version']
-            else:
-                version = "Unknown"
-
-            # Ports
-            ports = container.attrs['NetworkSettings']['Ports']
-
-            plugin = {
-                'docker_id': container.id,
-                'plugin_id': plugin_id,
-                'image': image,
-                'version': version,
-                'ports': ports,
-                'labels': container.labels,
-                'name': container.name,
-                'status': self._update_state_machine(container.status)
-                }
+                # timeout is not time to ready, it is not observed
+                _LOGGER.debug(f'[run] not running in {timeout}s: {name}, {status}')
 
+            # Get up-to-date information
+            container = client.containers.get(container.id)
+            plugin = self._get_plugin_info(host, container)
+            if status in ('exited', 'dead'):
+                # failed container is not removed by docker (no auto_remove), next install creates it again
+                _LOGGER.debug(f'[run] remove failed container: {name}, {status}')
+                container.remove(force=True)
+                self._label_index.remove(container.id)
+                return plugin
+            self._label_index.add(container.id, plugin, plugin.labels)
             return plugin
 
         except Exception as e:
@@ -158,13 +151,15 @@ class DockerConnector(ContainerConnector):
             # TODO: 
             raise ERROR_CONFIGURATION(key='docker configuration')
 
-    def stop(self, plugin):
-        container_id = plugin['docker_id']
+    def stop(self, plugin: PluginRecord):
+        container_id = plugin.docker_id
         _LOGGER.debug(f'[docker stop] stop & delete {container_id}')
         try:
-            container = self.client.containers.get(container_id)
+            container = self.clients[plugin.host or self._get_default_host()].containers.get(container_id)
             container.stop()
             container.remove(force=True)
+            self._label_index.remove(container_id)
+            self._set_idle(container.name, False)
             return True
         except Exception as e:
             _LOGGER.error("Failed to stop docker")
@@ -172,23 +167,130 @@ class DockerConnector(ContainerConnector):
             # TODO
             raise ERROR_CONFIGURATION(key='docker configuration')
 
-    def list_used_ports(self):
+    def scale(self, plugin: PluginRecord, replicas=None):
+        """ Stop idle container or start it again
+
+        Stopped container keeps its name, labels and port binding.
+
+        Args:
+            replicas: 0 for stop, None for start
+        """
+        if replicas == 0 and self.state_store is None:
+            # other processes (publish) and restarted supervisor would see stopped container as ERROR
+            _LOGGER.debug(f'[scale] idle marker needs STATE_STORE.path, keep running: {plugin.name}')
+            return False
+
+        container = self.clients[plugin.host or self._get_default_host()].containers.get(plugin.docker_id)
+        if replicas == 0:
+            _LOGGER.debug(f'[scale] stop idle container: {plugin.name}')
+            self._set_idle(container.name, True)
+            container.stop()
+        else:
+            _LOGGER.debug(f'[scale] start container: {plugin.name}')
+            container.start()
+            self._set_idle(container.name, False)
+        container.reload()
+        plugin = self._get_plugin_info(plugin.host or self._get_default_host(), container)
+        self._label_index.add(container.id, plugin, plugin.labels)
+        return True
+
+    def get_usage(self, plugins: list) -> dict:
+        """ CPU usage of running containers
+
+        Returns:
+            - {name: millicores}
+        """
+        if len(plugins) == 0:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(plugins), 8)) as executor:
+            usages = executor.map(self._get_cpu_usage, plugins)
+        return {plugin.name: usage for plugin, usage in zip(plugins, usages) if usage is not None}
+
+    def refresh(self):
+        self._refresh_inventory()
+
+    def get_rate_limit_stats(self):
+        return {name: limiter.stats() for name, limiter in self.rate_limiters.items()}
+
+    def _get_index_key(self, plugin):
+        return plugin.docker_id
+
+    def select_host(self, labels=None):
+        """ Choose docker host for new plugin
+
+        placement:
+         - least_loaded: host which has the most free capacity
+         - bin_packing: host which has the least free capacity, but not full
+
+        Returns:
+            - host(dict): {'name': str, 'hostname': str, 'start_port': int, 'end_port': int}
+            - None, if only local docker daemon is used
+        """
+        if 'hosts' not in self.config:
+            return None
+
+        if self._label_index.is_stale(self.config.get('inventory_ttl', INVENTORY_TTL)):
+            self._refresh_inventory()
+
+        loads = dict.fromkeys(self.hosts, 0)
+        for plugin in self._label_index.query([]):
+            if plugin.host in loads:
+                loads[plugin.host] += 1
+
+        candidates = []
+        for name, host in self.hosts.items():
+            free = self._get_free_capacity(host, loads[name])
+            if free > 0:
+                candidates.append((free, name))
+
+        if len(candidates) == 0:
+            raise ERROR_NO_AVAILABLE_HOST(loads=loads)
+
+        if self.placement == 'bin_packing':
+            free, name = min(candidates)
+        else:
+            free, name = max(candidates)
+        _LOGGER.debug(f'[select_host] {self.placement}: {name}, free: {free}, loads: {loads}')
+        return self.hosts[name]
+
+    def list_hosts(self):
+        if 'hosts' not in self.config:
+            return [None]
+        return list(self.hosts.values())
+
+    def get_capacity(self):
+        """ Free plugin slots (max_plugins) of hosts, free ports are counted by manager
+
+        Returns: CapacityModel
+        """
+        if not all('max_plugins' in host for host in self.hosts.values()):
+            return CapacityModel()
+
+        if self._label_index.is_stale(self.config.get('inventory_ttl', INVENTORY_TTL)):
+            self._refresh_inventory()
+        loads = dict.fromkeys(self.hosts, 0)
+        for plugin in self._label_index.query([]):
+            if plugin.host in loads:
+                loads[plugin.host] += 1
+        free = sum(max(host['max_plugins'] - loads[name], 0) for name, host in self.hosts.items())
+        return CapacityModel(quota={'pods': free})
+
+    def list_used_ports(self, host=None):
         """ Find used ports
 
         Returns:
             - set of port
         """
-        containers = self.client.containers.list()
+        client = self.clients[host or self._get_default_host()]
+        # Stopped containers reserve their port bindings
+        containers = client.containers.list(all=True)
         allocated_ports = []
         for container in containers:
-            if 'NetworkSettings' not in container.attrs:
-                _LOGGER.debug(f'Skip {container} since no NetworkSettings')
-                continue
-            if 'Ports' not in container.attrs['NetworkSettings']:
+            ports = self._get_ports(container)
+            if not ports:
                 _LOGGER.debug(f'No Ports: {container}')
                 continue
 
-            ports = container.attrs['NetworkSettings']['Ports']
             """
             {'80/tcp': [{'HostIp': '0.0.0.0', 'HostPort': '8111'}]}
             {'50051/tcp': None}
@@ -205,11 +307,135 @@ class DockerConnector(ContainerConnector):
                 continue
         return set(allocated_ports)
 
-    def _get_status(self, container_id):
-        container = self.client.containers.get(container_id)
+    def _set_idle(self, name, idle):
+        """ Idle marker is kept at state store, stopped container itself looks like failed one """
+        if self.state_store is not None:
+            self.state_store.set_idle(name, idle)
+
+    def _list_idle(self):
+        if self.state_store is None:
+            return set([])
+        return self.state_store.list_idle()
+
+    def _refresh_inventory(self):
+        # one query of state store for every container of every host
+        idle = self._list_idle()
+        with ThreadPoolExecutor(max_workers=len(self.clients)) as executor:
+            results = executor.map(lambda host: self._list_host_plugins(host, idle), self.clients.keys())
+        entries = []
+        for host_entries in results:
+            entries.extend(host_entries)
+        self._label_index.replace(entries)
+
+    def _list_host_plugins(self, host, idle=None):
+        containers = self.clients[host].containers.list(all=True, filters={'label': 'spaceone.supervisor.name'})
+        entries = []
+        for container in containers:
+            plugin = self._get_plugin_info(host, container, idle)
+            entries.append((container.id, plugin, plugin.labels))
+        return entries
+
+    def _get_plugin_info(self, host, container, idle=None) -> PluginRecord:
+        """ idle: names of idle containers, read from state store if not given """
+        # Custom Labels
+        _LOGGER.debug("[DockerConnector] labels=%s" % container.labels)
+        return PluginRecord.from_labels(
+            container.labels,
+            name=container.name,
+            state=self._update_state_machine(container, idle),
+            docker_id=container.id,
+            host_port=self._get_host_port(self._get_ports(container)),
+            host=host
+        )
+
+    def _get_default_host(self):
+        return next(iter(self.hosts))
+
+    def _get_free_capacity(self, host, load):
+        start_port = host.get('start_port', self.config['start_port'])
+        end_port = host.get('end_port', self.config['end_port'])
+        free = end_port - start_port - load
+        if 'max_plugins' in host:
+            free = min(free, host['max_plugins'] - load)
+        return free
+
+    @staticmethod
+    def _get_ports(container):
+        """ Published ports of running container, or port bindings of stopped container """
+        ports = container.attrs.get('NetworkSettings', {}).get('Ports')
+        if not ports:
+            ports = container.attrs.get('HostConfig', {}).get('PortBindings')
+        return ports
+
+    def _get_cpu_usage(self, plugin: PluginRecord):
+        try:
+            container = self.clients[plugin.host or self._get_default_host()].containers.get(plugin.docker_id)
+            stats = container.stats(stream=False)
+            cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - \
+                stats['precpu_stats']['cpu_usage']['total_usage']
+            system_delta = stats['cpu_stats']['system_cpu_usage'] - \
+                stats['precpu_stats']['system_cpu_usage']
+            online_cpus = stats['cpu_stats'].get('online_cpus', 1)
+            if system_delta <= 0:
+                return None
+            return cpu_delta / system_delta * online_cpus * 1000
+        except Exception as e:
+            _LOGGER.debug(f'[_get_cpu_usage] {plugin.name}: {e}')
+            return None
+
+    @staticmethod
+    def _get_host_port(ports):
+        """
+        {'50051/tcp': [{'HostIp': '0.0.0.0', 'HostPort': '50060'}]}
+        """
+        for host_maps in (ports or {}).values():
+            for host_map in host_maps or []:
+                if 'HostPort' in host_map:
+                    return int(host_map['HostPort'])
+        return None
+
+    @staticmethod
+    def _get_or_create_container(client, image, labels, ports, name):
+        """ Plugin name is deterministic, so retried or concurrent install finds existing container
+        """
+        try:
+            container = client.containers.get(name)
+            _LOGGER.debug(f'[run] container already exists: {name}')
+            if container.status != 'running':
+                container.start()
+            return container
+        except docker.errors.NotFound:
+            pass
+
+        try:
+            # Keep stopped container, since idle plugin is stopped with its port reserved
+            return client.containers.run(image=image, labels=labels, ports=ports, name=name, detach=True)
+        except docker.errors.APIError as e:
+            # created by concurrent install
+            if e.status_code == 409:
+                return client.containers.get(name)
+            raise e
+
+    @staticmethod
+    def _get_status(client, container_id):
+        container = client.containers.get(container_id)
         return container.status
 
-    def _update_state_machine(self, status):
-        if status == 'running':
+    def _update_state_machine(self, container, idle=None):
+        if container.status == 'running':
             return "ACTIVE"
+        if idle is None:
+            idle = self._list_idle()
+        if container.name in idle:
+            return "IDLE"
         return "ERROR"
+
+
+def _get_priority(api_name):
+    if api_name in MUTATING_APIS:
+        return HIGH
+    if api_name == 'containers':
+        return NORMAL
+    if api_name == 'close':
+        return None
+    return LOW
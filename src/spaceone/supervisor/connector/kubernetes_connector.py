@@ -16,13 +16,25 @@
 __all__ = ["KubernetesConnector"]
 
 import logging
+import threading
 import time
-from kubernetes import client
+from kubernetes import client, watch
 from kubernetes import config as k8s_config
 
 from spaceone.core.error import ERROR_CONFIGURATION
 
 from spaceone.supervisor.connector.container_connector import ContainerConnector
+from spaceone.supervisor.lib.capacity import CapacityModel
+from spaceone.supervisor.lib.deadline import Deadline
+from spaceone.supervisor.lib.label_index import LabelIndex
+from spaceone.supervisor.lib.rate_limiter import (
+    RateLimiter,
+    RateLimitedProxy,
+    HIGH,
+    NORMAL,
+    LOW,
+)
+from spaceone.supervisor.model.plugin_record import PluginRecord
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -30,55 +42,258 @@ _LOGGER = logging.getLogger(__name__)
 MAX_COUNT = 300
 WAIT_CREATION = 30
 ENDPOINT_INTERVAL = 10
+# max second between full inventory refresh of label index
+INVENTORY_TTL = 30
+# max connections per host of shared ApiClient
+CONNECTION_POOL_MAXSIZE = 16
+# max second between refresh of ResourceQuota and nodes
+CAPACITY_TTL = 30
+# ResourceQuota name -> key of CapacityModel
+QUOTA_KEYS = {
+    "pods": "pods",
+    "cpu": "cpu",
+    "requests.cpu": "cpu",
+    "memory": "memory",
+    "requests.memory": "memory",
+    "limits.cpu": "limits.cpu",
+    "limits.memory": "limits.memory",
+}
+MEMORY_UNITS = {
+    "Ki": 2**10,
+    "Mi": 2**20,
+    "Gi": 2**30,
+    "Ti": 2**40,
+    "Pi": 2**50,
+    "Ei": 2**60,
+    # milli-byte, ResourceQuota reports ex) 1288490188800m
+    "m": 10**-3,
+    "k": 10**3,
+    "M": 10**6,
+    "G": 10**9,
+    "T": 10**12,
+    "P": 10**15,
+    "E": 10**18,
+}
+# API calls per second (and burst) to kubernetes API server
+RATE_LIMIT = {"qps": 20, "burst": 40}
+# max second between endpoints refresh of headless services
+ENDPOINTS_TTL = 10
+# second of one endpoints watch request, watch is restarted after it
+WATCH_TIMEOUT = 300
+# annotation of Deployment scaled to zero by idle policy
+IDLE_ANNOTATION = "spaceone.supervisor.plugin.idle"
+# waiting reasons of plugin container, which never become ready without reprovision
+FAILURE_REASONS = (
+    "CrashLoopBackOff",
+    "ImagePullBackOff",
+    "ErrImagePull",
+    "InvalidImageName",
+    "CreateContainerConfigError",
+    "CreateContainerError",
+)
 
 
 class KubernetesConnector(ContainerConnector):
-    def __init__(self, *args, **kwargs):
+    _label_index = LabelIndex()
+    _endpoints_updated_at = None
+    # Deployments and HorizontalPodAutoscalers of last inventory refresh, for reconcile
+    _deployments = {}
+    _autoscalers = None
+    # endpoints watch thread of process, shared by every supervisor identity
+    _endpoints_watcher = None
+    _endpoints_watcher_lock = threading.Lock()
+    _endpoints_callbacks = []
+
+    def __init__(self, *args, target: dict = None, **kwargs):
         super().__init__(*args, **kwargs)
+        # class keeps inventory and endpoints watch shared by process
+        self._inventory_owner = KubernetesConnector
+        if target is not None:
+            # one cluster of MultiKubernetesConnector, keeps inventory of its own
+            self.config = target
+            self._label_index = LabelIndex()
+            self._endpoints_updated_at = None
+            self._deployments = {}
+            self._autoscalers = None
+            self._endpoints_watcher = None
+            self._endpoints_watcher_lock = threading.Lock()
+            self._endpoints_callbacks = []
+            self._inventory_owner = self
         _LOGGER.debug("[KubernetesConnector] config: %s" % self.config)
         self.headless = self.config.get("headless", False)
         self.node_selector = self.config.get("nodeSelector", {})
         self.NUM_OF_REPLICAS = 1
         self.namespace = self.config["namespace"]
+        # (free quota, allocatable of nodes, updated_at), cleared by run and stop
+        self._capacity = None
 
         try:
-            k8s_config.load_incluster_config()
-            conf = client.Configuration()
+            self.api_client = self._create_api_client()
         except Exception as e:
             _LOGGER.debug(f"[KubernetesConnector] {e}")
             raise ERROR_CONFIGURATION(key="kubernetes configuration")
 
+        # All APIs share connection pool of api_client and rate limiter
+        rate_limit = self.config.get("rate_limit", RATE_LIMIT)
+        self.rate_limiter = RateLimiter(rate_limit["qps"], rate_limit["burst"])
+        self.core_v1 = self._limit(client.CoreV1Api(self.api_client))
+        self.apps_v1 = self._limit(client.AppsV1Api(self.api_client))
+        self.autoscaling_v2 = self._limit(client.AutoscalingV2Api(self.api_client))
+        self.custom_objects = self._limit(client.CustomObjectsApi(self.api_client))
+
+    def _limit(self, api):
+        return RateLimitedProxy(api, self.rate_limiter, _get_priority)
+
+    def _create_api_client(self):
+        """ApiClient of in-cluster config, or kubeconfig context if configured
+
+        Service account token is reloaded by refresh_api_key_hook before it expires,
+        so connector can be reused for the lifetime of process.
+        """
+        conf = client.Configuration()
+        if "context" in self.config:
+            k8s_config.load_kube_config(
+                config_file=self.config.get("kubeconfig"),
+                context=self.config["context"],
+                client_configuration=conf,
+                persist_config=False,
+            )
+        else:
+            k8s_config.load_incluster_config(client_configuration=conf)
+        conf.connection_pool_maxsize = self.config.get(
+            "connection_pool_maxsize", CONNECTION_POOL_MAXSIZE
+        )
+        return client.ApiClient(conf)
+
     def __del__(self):
         pass
 
     def search(self, filters: dict) -> dict:
-        count = 0
         plugins_info = []
         # _LOGGER.debug("[KubernetesConnector] filters=%s" % filters)
-        if "label" in filters:
-            services = self._list_services(filters["label"])
-        else:
-            services = []
-        # _LOGGER.debug(services)
-        count = len(services)
-        for service in services:
-            plugin = self._get_plugin_info_from_service(service)
-
-            if self.headless:
-                endpoints = plugin.get("endpoints", [])
-                if len(endpoints) == 0:
+        if "label" not in filters:
+            return {"results": plugins_info, "total_count": 0}
+
+        if self._label_index.is_stale(self.config.get("inventory_ttl", INVENTORY_TTL)):
+            self._refresh_inventory()
+        elif self.headless and self._is_endpoints_stale():
+            self._refresh_endpoints()
+
+        plugins = self._label_index.query(filters["label"])
+        count = len(plugins)
+        for plugin in plugins:
+            if self.headless and not filters.get("include_unready", False):
+                # Idle plugin has no endpoint until it wakes up
+                if not plugin.endpoints and plugin.state != "IDLE":
                     continue
 
             plugins_info.append(plugin)
 
         return {"results": plugins_info, "total_count": count}
 
-    def run(self, image, labels, ports, name, registry_config):
+    def refresh(self):
+        self._refresh_inventory()
+
+    def get_rate_limit_stats(self):
+        return self.rate_limiter.stats()
+
+    def get_capacity(self):
+        """Free ResourceQuota of namespace and allocatable of nodes matching nodeSelector
+
+        Cached for capacity_ttl seconds, part which can not be read (RBAC) is unknown.
+        Returns: CapacityModel
+        """
+        ttl = self.config.get("capacity_ttl", CAPACITY_TTL)
+        capacity = self._capacity
+        if capacity is None or time.monotonic() - capacity[2] > ttl:
+            capacity = (self._get_free_quota(), self._list_nodes(), time.monotonic())
+            self._capacity = capacity
+        return CapacityModel(quota=capacity[0], nodes=capacity[1])
+
+    def get_plugin_request(self, labels):
+        """Resources of new Deployment, same as _create_deployment
+
+        Returns: {'pods': replicas, 'cpu': millicores, 'memory': bytes, 'limits.cpu': ..., 'limits.memory': ...}
+        """
+        mgmt_labels = self._get_k8s_label(labels)
+        request = {
+            "pods": self._get_replica(
+                mgmt_labels.get("resource_type"), mgmt_labels.get("plugin_id")
+            )
+        }
+        resources = self.config.get("resources", {})
+        try:
+            for key, value in resources.get("limits", {}).items():
+                if key in ("cpu", "memory"):
+                    request[f"limits.{key}"] = _parse_quantity(key, value)
+                    # requests default to limits
+                    request[key] = request[f"limits.{key}"]
+            for key, value in resources.get("requests", {}).items():
+                if key in ("cpu", "memory"):
+                    request[key] = _parse_quantity(key, value)
+        except ValueError as e:
+            # request is unknown, plugin is admitted by number of pods only
+            _LOGGER.error(f"[get_plugin_request] invalid quantity of resources, {e}")
+            return {"pods": request["pods"]}
+        return request
+
+    def _get_free_quota(self) -> dict:
+        try:
+            quotas = self.core_v1.list_namespaced_resource_quota(self.namespace).items
+        except Exception as e:
+            _LOGGER.debug(f"[get_capacity] can not list ResourceQuota, {e}")
+            return {}
+
+        free = {}
+        for quota in quotas:
+            hard = quota.status.hard or {}
+            used = quota.status.used or {}
+            for name, value in hard.items():
+                key = QUOTA_KEYS.get(name)
+                if key is None:
+                    continue
+                try:
+                    amount = _parse_quantity(key, value) - _parse_quantity(
+                        key, used.get(name, "0")
+                    )
+                except ValueError as e:
+                    # unknown, not checked
+                    _LOGGER.debug(f"[get_capacity] can not parse quota {name}, {e}")
+                    continue
+                # every ResourceQuota of namespace applies
+                free[key] = min(free.get(key, amount), amount)
+        return free
+
+    def _list_nodes(self):
+        """Allocatable of schedulable nodes, None if nodes can not be listed"""
+        selector = ",".join(f"{k}={v}" for k, v in self.node_selector.items())
+        try:
+            nodes = self.core_v1.list_node(label_selector=selector).items
+        except Exception as e:
+            _LOGGER.debug(f"[get_capacity] can not list nodes, {e}")
+            return None
+
+        try:
+            return [
+                {
+                    "cpu": _parse_cpu(node.status.allocatable["cpu"]),
+                    "memory": _parse_memory(node.status.allocatable["memory"]),
+                }
+                for node in nodes
+                if not node.spec.unschedulable
+            ]
+        except ValueError as e:
+            _LOGGER.debug(f"[get_capacity] can not parse allocatable of nodes, {e}")
+            return None
+
+    def run(self, image, labels, ports, name, registry_config, deadline=None):
         """Make sure, custom label is exist
         custom labels:
          - spaceone.supervisor.plugin_id
          - spaceone.supervisor.plugin.image
          - spaceone.supervisor.plugin.version
+
+        Waiting for available replica stops at deadline, plugin is returned as it is.
         """
 
         # ports (dict)
@@ -86,9 +301,11 @@ class KubernetesConnector(ContainerConnector):
         # Docker API uses like
         # {'8080/tcp': 80}    , expose 8080/tcp to 80 (public)
         _LOGGER.debug(f"[run] create kubernetes deployment")
+        self._capacity = None
 
         resp_svc = self._get_service(labels, name, ports)
-        resp_dep = self._get_deployment(labels, name, image, registry_config)
+        resp_dep = self._get_deployment(labels, name, image, registry_config, deadline)
+        self._apply_autoscaler(name, self._get_k8s_label(labels))
 
         try:
             # Update endpoints, if needed
@@ -96,7 +313,12 @@ class KubernetesConnector(ContainerConnector):
             # endpoints = self._update_endpoints(name)
 
             # _LOGGER.debug(f'[run] created deployment: {resp_dep}')
-            plugin = self._get_plugin_info_from_service(resp_svc)
+            resp_dep = self.apps_v1.read_namespaced_deployment(
+                name=name, namespace=self.namespace
+            )
+            state = self._get_deployment_state(resp_dep, [])
+            plugin = self._get_plugin_info_from_service(resp_svc, state)
+            self._label_index.add(name, plugin, plugin.labels)
 
             # _LOGGER.debug(f'[run] plugin: {plugin}')
             return plugin
@@ -106,20 +328,29 @@ class KubernetesConnector(ContainerConnector):
             _LOGGER.debug(e)
             raise ERROR_CONFIGURATION(key="kubernetes create")
 
-    def stop(self, plugin):
+    def stop(self, plugin: PluginRecord):
         # TODO: seperated Service & Deployment
+        self._capacity = None
         try:
-            name = plugin["name"]
+            name = plugin.name
             # delete_namespaced_service
-            k8s_core_v1 = client.CoreV1Api()
-            resp_svc = k8s_core_v1.delete_namespaced_service(name, self.namespace)
+            resp_svc = self.core_v1.delete_namespaced_service(name, self.namespace)
             _LOGGER.debug(f"[stop] deleted service")
 
             # delete_namespaced_deployment
-            k8s_apps_v1 = client.AppsV1Api()
-            resp_dep = k8s_apps_v1.delete_namespaced_deployment(name, self.namespace)
+            resp_dep = self.apps_v1.delete_namespaced_deployment(name, self.namespace)
             _LOGGER.debug(f"[stop] deleted deployment")
 
+            try:
+                self.autoscaling_v2.delete_namespaced_horizontal_pod_autoscaler(
+                    name, self.namespace
+                )
+                _LOGGER.debug(f"[stop] deleted autoscaler")
+            except Exception as e:
+                _LOGGER.debug(f"[stop] no autoscaler, {e}")
+
+            self._label_index.remove(name)
+
             return True
         except Exception as e:
             _LOGGER.error("Failed to stop docker")
@@ -127,33 +358,303 @@ class KubernetesConnector(ContainerConnector):
             # TODO
             raise ERROR_CONFIGURATION(key="docker configuration")
 
+    def scale(self, plugin: PluginRecord, replicas=None):
+        """Scale Deployment of idle plugin to zero, or back to desired replicas
+
+        Service, port and endpoint are kept, so plugin wakes up without reinstall.
+
+        Args:
+            replicas: 0 for scale to zero, None for desired replicas
+
+        Returns: True if Deployment is scaled
+        """
+        mgmt_labels = self._get_k8s_label(plugin.labels)
+        if replicas == 0:
+            if self._get_autoscaling(
+                mgmt_labels.get("resource_type"), mgmt_labels.get("plugin_id")
+            ):
+                # HorizontalPodAutoscaler does not scale to zero
+                return False
+            annotations = {IDLE_ANNOTATION: "true"}
+        else:
+            replicas = self._get_replica(
+                mgmt_labels.get("resource_type"), mgmt_labels.get("plugin_id")
+            )
+            annotations = {IDLE_ANNOTATION: None}
+
+        _LOGGER.debug(f"[scale] {plugin.name}: {replicas}")
+        resp_dep = self.apps_v1.patch_namespaced_deployment(
+            name=plugin.name,
+            namespace=self.namespace,
+            body={
+                "metadata": {"annotations": annotations},
+                "spec": {"replicas": replicas},
+            },
+        )
+        plugin = plugin._replace(state=self._get_deployment_state(resp_dep, []))
+        self._label_index.add(plugin.name, plugin, plugin.labels)
+        return True
+
+    def get_usage(self, plugins: list) -> dict:
+        """CPU usage of plugins from metrics API (metrics-server)
+
+        Returns: {name: millicores}
+        """
+        try:
+            response = self.custom_objects.list_namespaced_custom_object(
+                group="metrics.k8s.io",
+                version="v1beta1",
+                namespace=self.namespace,
+                plural="pods",
+                label_selector="supervisor_name",
+            )
+        except Exception as e:
+            _LOGGER.debug(f"[get_usage] metrics API is not available, {e}")
+            return {}
+
+        names = {plugin.name for plugin in plugins}
+        usage = {}
+        for item in response.get("items", []):
+            # Pod name is <deployment name>-<pod-template-hash>-<random>
+            name = item["metadata"]["name"].rsplit("-", 2)[0]
+            if name not in names:
+                continue
+            for container in item.get("containers", []):
+                usage[name] = usage.get(name, 0) + _parse_cpu(container["usage"]["cpu"])
+        return usage
+
+    def supports_reconcile(self):
+        return True
+
+    def reconcile(self, plugin: PluginRecord, image=None):
+        """Patch live Deployment of plugin to desired spec in place
+
+        Service and port are not touched, so Deployment rolls out without reprovision.
+
+        Args:
+            plugin: PluginRecord
+            image: desired image uri, None for current image
+
+        Returns: True if Deployment is patched
+        """
+        # Deployment listed by inventory refresh, no read per plugin
+        resp_dep = self._inventory_owner._deployments.get(plugin.name)
+        if resp_dep is None:
+            # created after last inventory refresh
+            try:
+                resp_dep = self.apps_v1.read_namespaced_deployment(
+                    name=plugin.name, namespace=self.namespace
+                )
+            except Exception as e:
+                _LOGGER.debug(f"[reconcile] may not found, {e}")
+                return False
+
+        mgmt_labels = self._get_k8s_label(plugin.labels)
+        autoscaled = self._apply_autoscaler(
+            plugin.name, mgmt_labels, self._inventory_owner._autoscalers
+        )
+
+        live = self.api_client.sanitize_for_serialization(resp_dep)
+        # Replicas of idle plugin are kept zero until it wakes up
+        idle = IDLE_ANNOTATION in (live["metadata"].get("annotations") or {})
+        patch = self._get_deployment_patch(
+            live, plugin.labels, image, autoscaled or idle
+        )
+        if len(patch) == 0:
+            return False
+
+        _LOGGER.debug(f"[reconcile] {plugin.name}: {patch}")
+        resp_dep = self.apps_v1.patch_namespaced_deployment(
+            name=plugin.name, namespace=self.namespace, body=patch
+        )
+        # next sync compares with patched spec, even before inventory refresh
+        self._inventory_owner._deployments[plugin.name] = resp_dep
+        return True
+
+    def _get_deployment_patch(self, live, labels, image=None, autoscaled=False):
+        """Compare live Deployment with desired spec
+
+        Args:
+            live(dict): serialized V1Deployment
+            labels(dict): annotations of plugin service
+            autoscaled: replicas are managed by HorizontalPodAutoscaler (or idle policy)
+
+        Returns: JSON patch (list)
+        """
+        mgmt_labels = self._get_k8s_label(labels)
+        pod_spec = live["spec"]["template"]["spec"]
+        container = pod_spec["containers"][0]
+        patch = []
+
+        desired_replicas = self._get_replica(
+            mgmt_labels.get("resource_type"), mgmt_labels.get("plugin_id")
+        )
+        if not autoscaled and live["spec"].get("replicas") != desired_replicas:
+            patch.append(
+                {"op": "replace", "path": "/spec/replicas", "value": desired_replicas}
+            )
+
+        desired = [
+            (
+                "/spec/template/spec/nodeSelector",
+                pod_spec,
+                "nodeSelector",
+                self.node_selector or None,
+            ),
+            (
+                "/spec/template/spec/containers/0/env",
+                container,
+                "env",
+                self.config.get("env"),
+            ),
+            (
+                "/spec/template/spec/containers/0/resources",
+                container,
+                "resources",
+                self.config.get("resources"),
+            ),
+        ]
+        if image:
+            desired.append(
+                ("/spec/template/spec/containers/0/image", container, "image", image)
+            )
+
+        for path, obj, key, value in desired:
+            if obj.get(key) == value or (not obj.get(key) and not value):
+                continue
+            if key == "resources" and _normalize_resources(
+                obj.get(key)
+            ) == _normalize_resources(value):
+                # same quantities in other notation, ex) 1 and 1000m
+                continue
+            if value:
+                patch.append({"op": "add", "path": path, "value": value})
+            else:
+                patch.append({"op": "remove", "path": path})
+        return patch
+
     def _get_replica(self, resource_type, plugin_id=None):
         _LOGGER.debug(
             f"[_get_replica] resource_type: {resource_type}, plugin_id: {plugin_id}"
         )
 
+        autoscaling = self._get_autoscaling(resource_type, plugin_id)
+        if autoscaling:
+            return autoscaling.get("min_replicas", self.NUM_OF_REPLICAS)
+
         REPLICA_DIC = self.config.get("replica", {})
-        resource_type_with_plugin_id = resource_type
-        if plugin_id:
-            resource_type_with_plugin_id = f"{resource_type}?{plugin_id}"
-
-        if resource_type_with_plugin_id in REPLICA_DIC:
-            return REPLICA_DIC[resource_type_with_plugin_id]
-        elif resource_type in REPLICA_DIC:
-            return REPLICA_DIC[resource_type]
+        return _get_resource_type_conf(
+            REPLICA_DIC, resource_type, plugin_id, self.NUM_OF_REPLICAS
+        )
+
+    def _get_autoscaling(self, resource_type, plugin_id=None):
+        """Autoscaling config of resource_type or resource_type?plugin_id
+
+        Returns: {'min_replicas': int, 'max_replicas': int, 'target_cpu_utilization': int}
+                 None, if replicas are static
+        """
+        AUTOSCALING_DIC = self.config.get("autoscaling", {})
+        return _get_resource_type_conf(AUTOSCALING_DIC, resource_type, plugin_id)
+
+    def _apply_autoscaler(self, name, mgmt_labels, autoscalers=None):
+        """Create, update or delete HorizontalPodAutoscaler of Deployment
+
+        Args:
+            autoscalers: {name: V2HorizontalPodAutoscaler} listed by inventory refresh,
+                None if not listed (HPA is read only when autoscaling is configured)
+
+        Returns: True if replicas are managed by autoscaler
+        """
+        autoscaling = self._get_autoscaling(
+            mgmt_labels.get("resource_type"), mgmt_labels.get("plugin_id")
+        )
+        if autoscalers is not None:
+            live = autoscalers.get(name)
+        elif autoscaling is None:
+            return False
+        else:
+            try:
+                live = self.autoscaling_v2.read_namespaced_horizontal_pod_autoscaler(
+                    name=name, namespace=self.namespace
+                )
+            except Exception as e:
+                _LOGGER.debug(f"[_apply_autoscaler] may not found, {e}")
+                live = None
+
+        if autoscaling is None:
+            if live:
+                _LOGGER.debug(f"[_apply_autoscaler] delete autoscaler: {name}")
+                self.autoscaling_v2.delete_namespaced_horizontal_pod_autoscaler(
+                    name=name, namespace=self.namespace
+                )
+                if autoscalers is not None:
+                    autoscalers.pop(name, None)
+            return False
+
+        hpa = self._create_autoscaler(name, mgmt_labels, autoscaling)
+        if live is None:
+            _LOGGER.debug(f"[_apply_autoscaler] create autoscaler: {hpa}")
+            live = self.autoscaling_v2.create_namespaced_horizontal_pod_autoscaler(
+                body=hpa, namespace=self.namespace
+            )
+            if autoscalers is not None:
+                autoscalers[name] = live
         else:
-            return self.NUM_OF_REPLICAS
+            live_spec = self.api_client.sanitize_for_serialization(live.spec)
+            if any(live_spec.get(k) != v for k, v in hpa["spec"].items()):
+                _LOGGER.debug(f"[_apply_autoscaler] patch autoscaler: {hpa}")
+                live = self.autoscaling_v2.patch_namespaced_horizontal_pod_autoscaler(
+                    name=name, namespace=self.namespace, body={"spec": hpa["spec"]}
+                )
+                if autoscalers is not None:
+                    autoscalers[name] = live
+        return True
+
+    @staticmethod
+    def _create_autoscaler(name, mgmt_labels, autoscaling):
+        """Create HorizontalPodAutoscaler content (dictionary)
 
-    def _get_deployment(self, labels, name, image, registry_config):
+        CPU utilization is measured against resources.requests.cpu of plugin container.
+        """
+        return {
+            "apiVersion": "autoscaling/v2",
+            "kind": "HorizontalPodAutoscaler",
+            "metadata": {"name": name, "labels": mgmt_labels},
+            "spec": {
+                "scaleTargetRef": {
+                    "apiVersion": "apps/v1",
+                    "kind": "Deployment",
+                    "name": name,
+                },
+                "minReplicas": autoscaling.get("min_replicas", 1),
+                "maxReplicas": autoscaling["max_replicas"],
+                "metrics": [
+                    {
+                        "type": "Resource",
+                        "resource": {
+                            "name": "cpu",
+                            "target": {
+                                "type": "Utilization",
+                                "averageUtilization": autoscaling.get(
+                                    "target_cpu_utilization", 80
+                                ),
+                            },
+                        },
+                    }
+                ],
+            },
+        }
+
+    def _get_deployment(self, labels, name, image, registry_config, deadline=None):
         """Create or get Deployment
 
         Args:
             name: random generated name for service & deployment
+            deadline: Deadline of waiting for available replica
         """
-        k8s_apps_v1 = client.AppsV1Api()
         try:
             # get deployment
-            resp_dep = k8s_apps_v1.read_namespaced_deployment(
+            resp_dep = self.apps_v1.read_namespaced_deployment(
                 name=name, namespace=self.namespace
             )
             return resp_dep
@@ -163,27 +664,30 @@ class KubernetesConnector(ContainerConnector):
         # Create Deployment
         try:
             deployment = self._create_deployment(image, name, labels, registry_config)
-            resp_dep = k8s_apps_v1.create_namespaced_deployment(
+            resp_dep = self.apps_v1.create_namespaced_deployment(
                 body=deployment, namespace=self.namespace
             )
 
             # create is asynchronous, wait a little
-            time.sleep(WAIT_CREATION)
-
-            # wait for max 5 minutes
-            wait_count = 0
-            while (
-                k8s_apps_v1.read_namespaced_deployment(
-                    name=name, namespace=self.namespace
-                ).status.available_replicas
-                < 1
-            ):
-                time.sleep(10)
-                wait_count += 10
-                if wait_count > 300:
-                    _LOGGER.debug(
-                        f"[_get_deployment] too much time to create deployment: {name}, {image}"
-                    )
+            # wait is learned from previous installs of image, or 5 minutes
+            timeout, initial_delay, interval = self._get_wait_policy(
+                image, MAX_COUNT, WAIT_CREATION, 10
+            )
+            wait = (deadline or Deadline()).limit(timeout)
+            started_at = time.monotonic()
+            wait.sleep(initial_delay)
+
+            # failed rollout (image pull, crash loop) does not become ready by waiting
+            state = self._get_rollout_state(name)
+            while state == "PROVISIONING" and wait.sleep(interval):
+                state = self._get_rollout_state(name)
+            if state == "ACTIVE":
+                self._observe_ready(image, time.monotonic() - started_at)
+            else:
+                # timeout is not time to ready, it is not observed
+                _LOGGER.debug(
+                    f"[_get_deployment] deployment is not ready: {name}, {image}, {state}"
+                )
 
             return resp_dep
         except Exception as e:
@@ -265,6 +769,110 @@ class KubernetesConnector(ContainerConnector):
 
         return deployment
 
+    def watch(self, callback):
+        """Watch Endpoints of managed services at background thread
+
+        Label index is updated as soon as pods are added or removed,
+        then callback(plugin) is called with updated PluginRecord.
+
+        Returns: True if watch is running
+        """
+        if self.headless is False or self.config.get("watch_endpoints", True) is False:
+            return False
+
+        cls = self._inventory_owner
+        with cls._endpoints_watcher_lock:
+            cls._endpoints_callbacks.append(callback)
+            if cls._endpoints_watcher is None or not cls._endpoints_watcher.is_alive():
+                cls._endpoints_watcher = threading.Thread(
+                    target=self._watch_endpoints,
+                    name="endpoints_watch",
+                    daemon=True,
+                )
+                cls._endpoints_watcher.start()
+        return True
+
+    def _watch_endpoints(self):
+        resource_version = None
+        while True:
+            try:
+                w = watch.Watch()
+                kwargs = {
+                    "namespace": self.namespace,
+                    "label_selector": "supervisor_name",
+                    "timeout_seconds": WATCH_TIMEOUT,
+                }
+                if resource_version:
+                    kwargs["resource_version"] = resource_version
+                for event in w.stream(self.core_v1.list_namespaced_endpoints, **kwargs):
+                    item = event["object"]
+                    resource_version = item.metadata.resource_version
+                    self._inventory_owner._endpoints_updated_at = time.monotonic()
+                    if event["type"] == "DELETED":
+                        endpoints = ()
+                    else:
+                        endpoints = tuple(self._parse_endpoints(item))
+                    plugin = self._update_plugin_endpoints(
+                        item.metadata.name, endpoints
+                    )
+                    if plugin:
+                        for callback in list(self._endpoints_callbacks):
+                            callback(plugin)
+            except client.exceptions.ApiException as e:
+                # 410 Gone, resource_version is too old
+                _LOGGER.debug(f"[_watch_endpoints] restart watch: {e.status}")
+                resource_version = None
+                time.sleep(1)
+            except Exception as e:
+                _LOGGER.error(f"[_watch_endpoints] restart watch: {e}")
+                resource_version = None
+                time.sleep(1)
+
+    def _get_rollout_state(self, name):
+        """State of new Deployment, pods are listed only until it is available
+
+        Returns: ACTIVE | PROVISIONING | ERROR
+        """
+        deployment = self.apps_v1.read_namespaced_deployment(
+            name=name, namespace=self.namespace
+        )
+        # available_replicas is None, until first pod is ready
+        if (deployment.status.available_replicas or 0) >= 1:
+            return "ACTIVE"
+        # pods of other slot share mgmt labels of legacy selector, select by owner
+        pods = [
+            pod
+            for pod in self.core_v1.list_namespaced_pod(
+                namespace=self.namespace, label_selector="supervisor_name"
+            ).items
+            if _is_owned_by(pod, name)
+        ]
+        state = self._get_deployment_state(deployment, pods)
+        # ready, but not available for minReadySeconds yet
+        return "PROVISIONING" if state == "ACTIVE" else state
+
+    def _update_plugin_endpoints(self, name, endpoints: tuple):
+        """Update endpoints of indexed plugin
+
+        Returns: updated PluginRecord, None if not changed
+        """
+        plugin = self._label_index.get(name)
+        if plugin is None or plugin.endpoints is None or plugin.endpoints == endpoints:
+            return None
+        _LOGGER.debug(f"[_update_plugin_endpoints] {name}: {endpoints}")
+        plugin = plugin._replace(endpoints=endpoints)
+        self._label_index.add(name, plugin, plugin.labels)
+        return plugin
+
+    def _is_endpoints_stale(self):
+        watcher = self._inventory_owner._endpoints_watcher
+        if watcher is not None and watcher.is_alive():
+            return False
+        if self._endpoints_updated_at is None:
+            return True
+        ttl = self.config.get("endpoints_ttl", ENDPOINTS_TTL)
+        return time.monotonic() - self._endpoints_updated_at > ttl
+
     def _update_endpoints(self, svc_name):
         if self.headless is False:
             # Do nothing
@@ -283,10 +891,9 @@ class KubernetesConnector(ContainerConnector):
         """Create or Get Service
         Return: service object
         """
-        k8s_core_v1 = client.CoreV1Api()
         try:
             # get service
-            resp_svc = k8s_core_v1.read_namespaced_service(
+            resp_svc = self.core_v1.read_namespaced_service(
                 name=name, namespace=self.namespace
             )
             # _LOGGER.debug(f'[run] found service: {resp_svc}')
@@ -298,7 +905,7 @@ class KubernetesConnector(ContainerConnector):
             # Create Service
             service = self._create_service(label, name, port)
             # _LOGGER.debug(f'[run] service yml: {service}')
-            resp_svc = k8s_core_v1.create_namespaced_service(
+            resp_svc = self.core_v1.create_namespaced_service(
                 body=service, namespace=self.namespace
             )
             # _LOGGER.debug(f'[run] created service: {resp_svc}')
@@ -347,12 +954,8 @@ class KubernetesConnector(ContainerConnector):
         }
         return service
 
-    def _list_services(self, label):
-        """
-        label(string):
-            spaceone.supervisor.name=<supervisor name>
-        label(list):
-            ['spaceone.supervisor.name=<supervisor name>', 'a=b', ...]
+    def _refresh_inventory(self):
+        """Rebuild label index from every annotated service in namespace
 
         In K8S service, we put label at Annotation like
 
@@ -365,80 +968,76 @@ class KubernetesConnector(ContainerConnector):
                            spaceone.supervisor.plugin.version: 1.0
                            spaceone.supervisor.plugin_id: plugin-885ff2c52a6c
         """
-        k8s_core_v1 = client.CoreV1Api()
-        resp = k8s_core_v1.list_namespaced_service(namespace=self.namespace)
-        result = []
-
-        # labels
-        labels = []
-        if isinstance(label, list):
-            labels = label
-        else:
-            labels = [label]
-
-        # k,v = label.split("=")
-        # _LOGGER.debug(f'[_list_service] labels: {labels}')
+        resp = self.core_v1.list_namespaced_service(namespace=self.namespace)
+        states = self._list_deployment_states()
+        self._inventory_owner._autoscalers = self._list_autoscalers()
+        endpoints_by_name = self._list_endpoints() if self.headless else {}
+        entries = []
         for item in resp.items:
-            if hasattr(item.metadata, "annotations") and isinstance(
-                item.metadata.annotations, dict
-            ):
-                annotations = item.metadata.annotations
-            else:
-                annotations = {}
-            if self._exist_label_in_annotation(labels, annotations):
-                result.append(item)
+            annotations = getattr(item.metadata, "annotations", None)
+            if not isinstance(annotations, dict):
+                continue
+            if "spaceone.supervisor.name" not in annotations:
+                # not a plugin service of supervisor
+                continue
+            state = states.get(item.metadata.name, "ERROR")
+            endpoints = endpoints_by_name.get(item.metadata.name, [])
+            plugin = self._get_plugin_info_from_service(item, state, endpoints)
+            entries.append((item.metadata.name, plugin, plugin.labels))
+        self._label_index.replace(entries)
+
+    def _list_deployment_states(self):
+        """Derive plugin state of every managed Deployment
+
+        Deployments and their pods are fetched by one label-selected list call each.
+
+        Returns: {deployment name: ACTIVE | PROVISIONING | ERROR}
+        """
+        deployments = self.apps_v1.list_namespaced_deployment(
+            namespace=self.namespace, label_selector="supervisor_name"
+        ).items
+        pods = self.core_v1.list_namespaced_pod(
+            namespace=self.namespace, label_selector="supervisor_name"
+        ).items
+
+        pods_by_deployment = {}
+        for pod in pods:
+            dep_name = _get_deployment_name(pod)
+            if dep_name:
+                pods_by_deployment.setdefault(dep_name, []).append(pod)
+
+        states = {}
+        for deployment in deployments:
+            name = deployment.metadata.name
+            states[name] = self._get_deployment_state(
+                deployment, pods_by_deployment.get(name, [])
+            )
+        self._inventory_owner._deployments = {
+            deployment.metadata.name: deployment for deployment in deployments
+        }
+        return states
 
-        # _LOGGER.debug(f'[_list_service] services: {result}')
-        return result
+    def _list_autoscalers(self):
+        """Returns: {name: V2HorizontalPodAutoscaler}, None if they can not be listed"""
+        try:
+            items = self.autoscaling_v2.list_namespaced_horizontal_pod_autoscaler(
+                namespace=self.namespace, label_selector="supervisor_name"
+            ).items
+        except Exception as e:
+            _LOGGER.debug(f"[_list_autoscalers] {e}")
+            return None
+        return {item.metadata.name: item for item in items}
 
     def _get_endpoints(self, svc_name):
         """This will be different from service type
         Headless Service: multiple endpoints
         Service: single endpoint
         """
-
-        def _parse_subsets(response):
-            subsets = response.subsets
-
-            if subsets is None:
-                _LOGGER.debug(
-                    f"[_get_endpoints] subsets is None : {response.metadata.name}"
-                )
-                return []
-
-            addrs = []
-            port = None
-            endpoints = []
-            for subset in subsets:
-                addrs = _parse_endpoints(subset.addresses)
-                port = _parse_port(subset.ports)
-            for addr in addrs:
-                endpoint = f"grpc://{addr}:{port}"
-                endpoints.append(endpoint)
-            return endpoints
-
-        def _parse_endpoints(addresses):
-            """Parse list of addresses"""
-            result = []
-            for address in addresses:
-                ip = address.ip
-                result.append(ip)
-            return result
-
-        def _parse_port(ports):
-            result = []
-            for port in ports:
-                svc_port = port.port
-                result.append(svc_port)
-            if len(result) == 1:
-                return result[0]
-
-        k8s_core_v1 = client.CoreV1Api()
         try:
-            response = k8s_core_v1.read_namespaced_endpoints(
+            response = self.core_v1.read_namespaced_endpoints(
                 name=svc_name, namespace=self.namespace
             )
-            endpoints = _parse_subsets(response)
+            endpoints = self._parse_endpoints(response)
             # _LOGGER.debug(f'[_get_endpoints] {endpoints}')
             return endpoints
         except Exception as e:
@@ -447,70 +1046,85 @@ class KubernetesConnector(ContainerConnector):
             )
             return []
 
-    def _get_plugin_info_from_service(self, service):
+    def _list_endpoints(self):
+        """Endpoints of every managed service by one label-selected list call
+
+        Returns: {service name: [endpoint, ...]}
+        """
+        response = self.core_v1.list_namespaced_endpoints(
+            namespace=self.namespace, label_selector="supervisor_name"
+        )
+        self._inventory_owner._endpoints_updated_at = time.monotonic()
+        return {
+            item.metadata.name: self._parse_endpoints(item) for item in response.items
+        }
+
+    def _refresh_endpoints(self):
+        """Update endpoints of indexed plugins, since replicas are changed by autoscaler"""
+        endpoints_by_name = self._list_endpoints()
+        for plugin in self._label_index.query([]):
+            if plugin.endpoints is None:
+                continue
+            endpoints = tuple(endpoints_by_name.get(plugin.name, []))
+            if endpoints != plugin.endpoints:
+                _LOGGER.debug(f"[_refresh_endpoints] {plugin.name}: {endpoints}")
+                plugin = plugin._replace(endpoints=endpoints)
+                self._label_index.add(plugin.name, plugin, plugin.labels)
+
+    @staticmethod
+    def _parse_endpoints(response):
+        """Parse V1Endpoints to list of grpc://<pod ip>:<port>"""
+        subsets = response.subsets
+
+        if subsets is None:
+            _LOGGER.debug(
+                f"[_parse_endpoints] subsets is None : {response.metadata.name}"
+            )
+            return []
+
+        endpoints = []
+        for subset in subsets:
+            ports = [port.port for port in subset.ports or []]
+            if len(ports) != 1:
+                continue
+            for address in subset.addresses or []:
+                endpoints.append(f"grpc://{address.ip}:{ports[0]}")
+        return endpoints
+
+    def _get_plugin_info_from_service(
+        self, service, state, endpoints=None
+    ) -> PluginRecord:
         """
         service is V1Service object, not dictionary
+        state is derived from Deployment of service
+        endpoints is read from Endpoints of service, if not given (headless only)
         """
         # Custom Labels
         labels = service.metadata.annotations
         # _LOGGER.debug("[_get_plugin_info_from_service] labels=%s" % labels)
 
-        if "spaceone.supervisor.plugin_id" in labels:
-            plugin_id = labels["spaceone.supervisor.plugin_id"]
-        else:
-            plugin_id = "Unknown"
-        if "spaceone.supervisor.plugin.image" in labels:
-            image = labels["spaceone.supervisor.plugin.image"]
-        else:
-            image = "Unknown"
-        if "spaceone.supervisor.plugin.version" in labels:
-            version = labels["spaceone.supervisor.plugin.version"]
-        else:
-            version = "Unknown"
-        if "spaceone.supervisor.plugin.endpoint" in labels:
-            endpoint = labels["spaceone.supervisor.plugin.endpoint"]
-        else:
-            endpoint = "Unknown"
-
-        plugin = {
-            "plugin_id": plugin_id,
-            "image": image,
-            "version": version,
-            "endpoint": endpoint,
-            "labels": labels,
-            "name": service.metadata.name,
-            "status": self._update_state_machine(service.status),
-        }
-
         if self.headless:
-            endpoints = self._get_endpoints(service.metadata.name)
-            plugin["endpoints"] = endpoints
+            if endpoints is None:
+                endpoints = self._get_endpoints(service.metadata.name)
+            endpoints = tuple(endpoints)
+        else:
+            endpoints = None
+
+        host_port = None
+        if service.spec and service.spec.ports:
+            host_port = service.spec.ports[0].port
+
+        plugin = PluginRecord.from_labels(
+            labels,
+            name=service.metadata.name,
+            state=state,
+            endpoints=endpoints,
+            host_port=host_port,
+        )
 
         # _LOGGER.debug(f'[_get_plugin_info_from_service] plugin: {plugin}')
         return plugin
 
-    @staticmethod
-    def _exist_label_in_annotation(labels, annotation):
-        """Check existance of label in annotation
-            (Exact match)
-
-        Args:
-            labels(list)
-            annotation(dict)
-
-        Return:
-            True | False
-        """
-        result = False
-        for label in labels:
-            k, v = label.split("=")
-            if k in annotation and annotation[k] == v:
-                result = True
-            else:
-                # One of labels is not match
-                return False
-        return result
-
     @staticmethod
     def _get_k8s_label(labels):
         """make OPS labels for K8S management
@@ -521,6 +1135,7 @@ class KubernetesConnector(ContainerConnector):
           spaceone.supervisor.plugin.image: pyengine/aws-ec2
           spaceone.supervisor.plugin.version: 1.0
           spaceone.supervisor.plugin_id: plugin-885ff2c52a6c
+          spaceone.supervisor.plugin.slot: 0
         }
 
         Returns: mgmt_label (dict)
@@ -528,6 +1143,7 @@ class KubernetesConnector(ContainerConnector):
                 supervisor_name: root
                 plugin_id: plugin-aws-ec2
                 domain_id: domain-1234
+                slot: 0
             }
         """
         mgmt_label = {}
@@ -542,8 +1158,119 @@ class KubernetesConnector(ContainerConnector):
                 mgmt_label["version"] = v
             elif k == "spaceone.supervisor.plugin.resource_type":
                 mgmt_label["resource_type"] = v
+            elif k == "spaceone.supervisor.plugin.slot":
+                # selectors of rolling slots must not overlap
+                mgmt_label["slot"] = v
         return mgmt_label
 
     @staticmethod
-    def _update_state_machine(status):
-        return "ACTIVE"
+    def _get_deployment_state(deployment, pods):
+        """
+        ACTIVE: at least one replica is ready
+        IDLE: scaled to zero by idle policy
+        PROVISIONING: no ready replica yet, rollout is in progress
+        ERROR: no ready replica and rollout failed
+               (progress deadline exceeded, replica failure, image pull failure, crash loop)
+        """
+        if deployment.spec.replicas == 0 and IDLE_ANNOTATION in (
+            deployment.metadata.annotations or {}
+        ):
+            return "IDLE"
+
+        ready_replicas = deployment.status.ready_replicas or 0
+        if ready_replicas > 0:
+            return "ACTIVE"
+
+        for condition in deployment.status.conditions or []:
+            if (
+                condition.type == "Progressing"
+                and condition.reason == "ProgressDeadlineExceeded"
+            ):
+                return "ERROR"
+            if condition.type == "ReplicaFailure" and condition.status == "True":
+                return "ERROR"
+
+        for pod in pods:
+            for container_status in pod.status.container_statuses or []:
+                waiting = container_status.state.waiting
+                if waiting and waiting.reason in FAILURE_REASONS:
+                    _LOGGER.debug(
+                        f"[_get_deployment_state] {pod.metadata.name}: {waiting.reason}"
+                    )
+                    return "ERROR"
+
+        return "PROVISIONING"
+
+
+def _get_resource_type_conf(conf, resource_type, plugin_id=None, default=None):
+    """Find value of resource_type?plugin_id first, then resource_type"""
+    if plugin_id and f"{resource_type}?{plugin_id}" in conf:
+        return conf[f"{resource_type}?{plugin_id}"]
+    return conf.get(resource_type, default)
+
+
+def _get_priority(api_name):
+    """Create/delete first, then list, status polling (read) last"""
+    if api_name.startswith(("create_", "delete_", "patch_", "replace_")):
+        return HIGH
+    if api_name.startswith("list_"):
+        return NORMAL
+    return LOW
+
+
+def _get_deployment_name(pod):
+    """Deployment of pod from owner ReplicaSet, None if pod is not of Deployment"""
+    for owner in pod.metadata.owner_references or []:
+        if owner.kind == "ReplicaSet":
+            # ReplicaSet name is <deployment name>-<pod-template-hash>
+            return owner.name.rsplit("-", 1)[0]
+    return None
+
+
+def _is_owned_by(pod, deployment_name):
+    return _get_deployment_name(pod) == deployment_name
+
+
+def _normalize_resources(resources):
+    """resources of container with parsed quantities, for comparison"""
+    normalized = {}
+    for section, quantities in (resources or {}).items():
+        if not quantities:
+            continue
+        normalized[section] = {}
+        for key, value in quantities.items():
+            try:
+                normalized[section][key] = _parse_quantity(key, value)
+            except ValueError:
+                # compared as it is
+                normalized[section][key] = value
+    return normalized
+
+
+def _parse_quantity(key, quantity) -> float:
+    """Parse quantity of CapacityModel key (cpu in millicores, memory in bytes)"""
+    quantity = str(quantity)
+    if key.endswith("cpu"):
+        return _parse_cpu(quantity)
+    if key.endswith("memory"):
+        return _parse_memory(quantity)
+    return float(quantity)
+
+
+def _parse_memory(quantity: str) -> float:
+    """Parse memory quantity to bytes (ex. 64Mi, 1G, 134217728)"""
+    for unit, scale in MEMORY_UNITS.items():
+        if quantity.endswith(unit):
+            return float(quantity[: -len(unit)]) * scale
+    return float(quantity)
+
+
+def _parse_cpu(quantity: str) -> float:
+    """Parse CPU quantity of metrics API to millicores (ex. 12345678n, 250m, 1)"""
+    if quantity.endswith("n"):
+        return int(quantity[:-1]) / 1000000
+    if quantity.endswith("u"):
+        return int(quantity[:-1]) / 1000
+    if quantity.endswith("m"):
+        return float(quantity[:-1])
+    return float(quantity) * 1000
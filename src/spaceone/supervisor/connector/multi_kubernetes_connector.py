@@ -0,0 +1,282 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["MultiKubernetesConnector"]
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from spaceone.core.error import ERROR_CONFIGURATION
+
+from spaceone.supervisor.connector.container_connector import ContainerConnector
+from spaceone.supervisor.connector.kubernetes_connector import KubernetesConnector
+from spaceone.supervisor.error.supervisor import ERROR_NO_AVAILABLE_HOST
+from spaceone.supervisor.lib.capacity import CapacityModel
+from spaceone.supervisor.model.plugin_record import PluginRecord
+
+_LOGGER = logging.getLogger(__name__)
+
+HOST_LABEL = "spaceone.supervisor.plugin.host"
+# target options, which are not passed to KubernetesConnector
+PLACEMENT_KEYS = ("name", "hostname", "max_plugins", "affinity")
+
+
+class MultiKubernetesConnector(ContainerConnector):
+    """Plugins over several clusters (or namespaces) of kubeconfig contexts
+
+    Each target is a KubernetesConnector with its own ApiClient and inventory.
+    PluginRecord.host is name of target, so stop/scale/reconcile go to its cluster.
+    Endpoint of plugin is <name>.<target hostname>, hostname must be reachable
+    from plugin service (multi-cluster DNS or gateway).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.config.get("targets"):
+            raise ERROR_CONFIGURATION(key="MultiKubernetesConnector.targets")
+
+        base = {k: v for k, v in self.config.items() if k != "targets"}
+        self.placement = self.config.get("placement", "least_loaded")
+        self.hosts = {}
+        self.targets = {}
+        for target in self.config["targets"]:
+            name = target["name"]
+            host = {
+                "name": name,
+                "hostname": target.get("hostname"),
+                "start_port": target.get("start_port", base.get("start_port")),
+                "end_port": target.get("end_port", base.get("end_port")),
+                "max_plugins": target.get("max_plugins"),
+                "affinity": target.get("affinity", {}),
+            }
+            self.hosts[name] = {k: v for k, v in host.items() if v is not None}
+            conf = dict(base)
+            conf.update({k: v for k, v in target.items() if k not in PLACEMENT_KEYS})
+            self.targets[name] = KubernetesConnector(target=conf)
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.targets), thread_name_prefix="multi_k8s"
+        )
+
+    def search(self, filters: dict) -> dict:
+        """List every target concurrently
+
+        Unreachable target is reported in unknown_hosts with its last known plugins,
+        so caller neither installs them again at other targets nor deletes them.
+        If it was never listed, it is in unlisted_hosts too, since its plugins are not known.
+
+        Returns: {'results': list, 'total_count': int, 'unknown_hosts': [target name, ...],
+                  'unlisted_hosts': [target name, ...]}
+        """
+        results, unknown_hosts = self._fan_out(lambda c: c.search(filters))
+        plugins = []
+        for name, result in results:
+            plugins.extend(_set_host(p, name) for p in result["results"])
+        unlisted_hosts = []
+        for name in unknown_hosts:
+            label_index = self.targets[name]._label_index
+            if label_index.updated_at is None:
+                unlisted_hosts.append(name)
+                continue
+            plugins.extend(
+                _set_host(p, name) for p in label_index.query(filters.get("label", []))
+            )
+        return {
+            "results": plugins,
+            "total_count": len(plugins),
+            "unknown_hosts": unknown_hosts,
+            "unlisted_hosts": unlisted_hosts,
+        }
+
+    def run(self, image, labels, ports, name, registry_config, deadline=None):
+        host = labels.get(HOST_LABEL) or self._get_default_target()
+        plugin = self.targets[host].run(
+            image, labels, ports, name, registry_config, deadline
+        )
+        return _set_host(plugin, host)
+
+    def stop(self, plugin: PluginRecord):
+        return self._get_target(plugin).stop(plugin)
+
+    def reconcile(self, plugin: PluginRecord, image=None):
+        return self._get_target(plugin).reconcile(plugin, image)
+
+    def supports_reconcile(self):
+        return True
+
+    def scale(self, plugin: PluginRecord, replicas=None):
+        return self._get_target(plugin).scale(plugin, replicas)
+
+    def get_usage(self, plugins: list) -> dict:
+        usage = {}
+        for name, connector in self.targets.items():
+            target_plugins = [p for p in plugins if p.host == name]
+            if target_plugins:
+                usage.update(connector.get_usage(target_plugins))
+        return usage
+
+    def select_host(self, labels: dict = None):
+        """Choose target for new plugin
+
+        affinity: {label suffix: [value, ...]}, ex) {"resource_type": ["inventory.collector"]}
+            plugin whose label matches is placed at matching targets only.
+            target without affinity accepts any plugin.
+        placement:
+         - least_loaded: target which has the most free capacity
+         - bin_packing: target which has the least free capacity, but not full
+
+        Load of target is counted from its inventory, which is listed by search of sync.
+        Target which was never listed is not chosen.
+
+        Returns: host(dict): {'name': str, 'hostname': str, 'start_port': int, 'end_port': int}
+        """
+        loads = {
+            name: len(connector._label_index)
+            for name, connector in self.targets.items()
+            if connector._label_index.updated_at is not None
+        }
+
+        candidates = []
+        preferred = []
+        for name, host in self.hosts.items():
+            if name not in loads:
+                continue
+            free = _get_free_capacity(host, loads[name])
+            if free <= 0:
+                continue
+            affinity = host.get("affinity")
+            if not affinity:
+                candidates.append((free, name))
+            elif _match_affinity(affinity, labels or {}):
+                preferred.append((free, name))
+
+        candidates = preferred or candidates
+        if len(candidates) == 0:
+            raise ERROR_NO_AVAILABLE_HOST(loads=loads)
+
+        if self.placement == "bin_packing":
+            free, name = min(candidates)
+        else:
+            free, name = max(candidates)
+        _LOGGER.debug(
+            f"[select_host] {self.placement}: {name}, free: {free}, loads: {loads}"
+        )
+        return self.hosts[name]
+
+    def list_used_ports(self, host=None):
+        return self.targets[host or self._get_default_target()].list_used_ports()
+
+    def list_hosts(self):
+        return list(self.hosts.values())
+
+    def get_capacity(self):
+        """Capacity of every target together
+
+        Free quota is summed (target without quota is unlimited), nodes are merged.
+        Target of plugin is chosen later by select_host, so this is an upper bound.
+        """
+        results, unknown_hosts = self._fan_out(lambda c: c.get_capacity())
+        if unknown_hosts:
+            # unreachable target, capacity is unknown
+            return CapacityModel()
+
+        capacities = [capacity for _, capacity in results]
+        quota = {}
+        for key in set().union(*(c.quota for c in capacities)):
+            if all(key in c.quota for c in capacities):
+                quota[key] = sum(c.quota[key] for c in capacities)
+        nodes = None
+        if all(c.nodes is not None for c in capacities):
+            nodes = [node for c in capacities for node in c.nodes]
+        return CapacityModel(quota=quota, nodes=nodes)
+
+    def get_plugin_request(self, labels):
+        host = labels.get(HOST_LABEL) or self._get_default_target()
+        return self.targets[host].get_plugin_request(labels)
+
+    def refresh(self):
+        self._fan_out(lambda c: c.refresh())
+
+    def get_rate_limit_stats(self):
+        return {
+            name: connector.get_rate_limit_stats()
+            for name, connector in self.targets.items()
+        }
+
+    def snapshot(self):
+        entries = []
+        for name, connector in self.targets.items():
+            entries.extend(
+                (f"{name}/{key}", _set_host(plugin, name))
+                for key, plugin in connector.snapshot()
+            )
+        return entries
+
+    def restore(self, plugins, age):
+        for name, connector in self.targets.items():
+            connector.restore([p for p in plugins if p.host == name], age)
+
+    def watch(self, callback):
+        watching = False
+        for name, connector in self.targets.items():
+            if connector.watch(lambda plugin, n=name: callback(_set_host(plugin, n))):
+                watching = True
+        return watching
+
+    def _fan_out(self, fn) -> tuple:
+        """Call fn(connector) of every target concurrently
+
+        Unreachable target does not stop others, it is returned as unknown.
+        Returns: ([(target name, result), ...], [unknown target name, ...])
+        """
+        futures = {
+            name: self._executor.submit(fn, connector)
+            for name, connector in self.targets.items()
+        }
+        results = []
+        unknown_hosts = []
+        for name, future in futures.items():
+            try:
+                results.append((name, future.result()))
+            except Exception as e:
+                _LOGGER.error(f"[_fan_out] target {name} failed: {e}")
+                unknown_hosts.append(name)
+        return results, unknown_hosts
+
+    def _get_target(self, plugin: PluginRecord) -> KubernetesConnector:
+        return self.targets[plugin.host or self._get_default_target()]
+
+    def _get_default_target(self):
+        return next(iter(self.targets))
+
+
+def _set_host(plugin: PluginRecord, host: str) -> PluginRecord:
+    if plugin.host == host:
+        return plugin
+    return plugin._replace(host=host)
+
+
+def _get_free_capacity(host: dict, load: int) -> float:
+    if host.get("max_plugins") is None:
+        return float("inf")
+    return host["max_plugins"] - load
+
+
+def _match_affinity(affinity: dict, labels: dict) -> bool:
+    for key, values in affinity.items():
+        if labels.get(f"spaceone.supervisor.plugin.{key}") in values:
+            return True
+        if labels.get(f"spaceone.supervisor.{key}") in values:
+            return True
+    return False
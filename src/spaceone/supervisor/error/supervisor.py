@@ -7,3 +7,12 @@ class ERROR_INSTALL_PLUGINS(ERROR_BASE):
 
 class ERROR_DELETE_PLUGINS(ERROR_BASE):
     _message = 'delete plugin failed excluding: {plugins}'
+
+class ERROR_NO_AVAILABLE_HOST(ERROR_BASE):
+    _message = 'no host has free capacity for plugin: {loads}'
+
+class ERROR_CIRCUIT_OPEN(ERROR_UNAVAILAVBLE):
+    _message = 'circuit of {endpoint} is open, retry after {retry_after}s'
+
+class ERROR_INSUFFICIENT_CAPACITY(ERROR_BASE):
+    _message = 'not enough capacity for plugin {plugin_id}: {reason}'
@@ -0,0 +1,89 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["CapacityModel", "get_footprint"]
+
+# resources of namespace quota, which are checked
+QUOTA_KEYS = ("pods", "cpu", "memory", "limits.cpu", "limits.memory")
+
+
+class CapacityModel(object):
+    """Free capacity of backend, install plan is checked against it before creating objects
+
+    quota: {key: free amount} of QUOTA_KEYS, per namespace (ResourceQuota) or hosts (max_plugins)
+        cpu in millicores, memory in bytes
+    nodes: [{'cpu': float, 'memory': float}, ...] allocatable of schedulable nodes
+    ports: number of free host ports
+
+    None (or missing key) means unknown, which is not checked.
+
+    request of plugin: {'pods': replicas, 'cpu': per pod, 'memory': per pod,
+                        'limits.cpu': per pod, 'limits.memory': per pod}
+    """
+
+    def __init__(self, quota=None, nodes=None, ports=None):
+        self.quota = dict(quota or {})
+        self.nodes = None if nodes is None else list(nodes)
+        self.ports = ports
+
+    def check(self, request: dict):
+        """Returns: reason why request does not fit, None if it fits"""
+        if self.ports is not None and self.ports < 1:
+            return "no free host port in port range"
+
+        for key in QUOTA_KEYS:
+            need = _get_total(request, key)
+            free = self.quota.get(key)
+            if need and free is not None and need > free:
+                return f"quota of {key} is exceeded (request: {need:g}, free: {free:g})"
+
+        if self.nodes is not None:
+            if len(self.nodes) == 0:
+                return "no schedulable node matches nodeSelector"
+            if not any(_fit_node(node, request) for node in self.nodes):
+                return (
+                    f"pod is larger than allocatable of every node"
+                    f" (cpu: {request.get('cpu', 0):g}m, memory: {request.get('memory', 0):g})"
+                )
+        return None
+
+    def reserve(self, request: dict):
+        if self.ports is not None:
+            self.ports -= 1
+        for key in QUOTA_KEYS:
+            if key in self.quota:
+                self.quota[key] -= _get_total(request, key)
+
+
+def get_footprint(request: dict) -> tuple:
+    """Sort key of request, smaller plugins first"""
+    return (
+        _get_total(request, "cpu"),
+        _get_total(request, "memory"),
+        request.get("pods", 1),
+    )
+
+
+def _get_total(request: dict, key) -> float:
+    if key == "pods":
+        return request.get("pods", 1)
+    return request.get(key, 0) * request.get("pods", 1)
+
+
+def _fit_node(node: dict, request: dict) -> bool:
+    for key in ("cpu", "memory"):
+        if request.get(key, 0) > node.get(key, float("inf")):
+            return False
+    return True
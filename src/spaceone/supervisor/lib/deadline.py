@@ -0,0 +1,58 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["Deadline"]
+
+import time
+
+
+class Deadline(object):
+    """Time budget of one sync pass, passed down to manager and connector calls
+
+    Deadline(None) never expires, so callers out of sync pass behave as before.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        self.expires_at = None if timeout is None else self.started_at + timeout
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def limit(self, seconds) -> "Deadline":
+        """Deadline of sub task, which is not later than this one"""
+        if seconds is None or seconds >= self.remaining():
+            return self
+        return Deadline(seconds)
+
+    def sleep(self, seconds) -> bool:
+        """Sleep up to remaining time
+
+        Returns: False if deadline is reached, caller should stop waiting
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            return False
+        time.sleep(min(seconds, remaining))
+        return not self.expired()
@@ -0,0 +1,51 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["HashRing"]
+
+import bisect
+import hashlib
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing(object):
+    """Consistent hash ring of members
+
+    Each member has vnodes points on ring, so only about 1/N of keys
+    move to other member when a member joins or leaves.
+    """
+
+    def __init__(self, members: list, vnodes=64):
+        self.members = sorted(set(members))
+        self._points = []
+        self._owners = []
+        ring = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(vnodes)
+        )
+        for point, member in ring:
+            self._points.append(point)
+            self._owners.append(member)
+
+    def get(self, key: str):
+        """Member which owns key, None if ring is empty"""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[i]
@@ -0,0 +1,106 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["HealthProber"]
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from grpc_health.v1 import health_pb2, health_pb2_grpc
+
+from spaceone.core.utils import parse_endpoint
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HealthProber(object):
+    """Check plugin endpoints with gRPC health protocol
+
+    Every endpoint is checked concurrently in a bounded pool with short deadline.
+    Result is cached for cache_ttl seconds, so publish and sync in same interval
+    share one probe.
+    """
+
+    def __init__(self, pool_size=16, timeout=2, cache_ttl=30, failure_threshold=3):
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.failure_threshold = failure_threshold
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="health_probe"
+        )
+        self._lock = threading.Lock()
+        # endpoint -> (checked_at, healthy)
+        self._results = {}
+        # endpoint -> number of consecutive failure
+        self._failures = {}
+
+    def probe(self, endpoints: list) -> dict:
+        """
+        Args:
+            endpoints(list): ['grpc://10.0.0.1:50051', ...]
+
+        Returns: {endpoint: True | False}
+        """
+        now = time.monotonic()
+        result = {}
+        targets = []
+        with self._lock:
+            for endpoint in set(endpoints):
+                cached = self._results.get(endpoint)
+                if cached and now - cached[0] < self.cache_ttl:
+                    result[endpoint] = cached[1]
+                else:
+                    targets.append(endpoint)
+
+        for endpoint, healthy in zip(targets, self._executor.map(self._check, targets)):
+            result[endpoint] = healthy
+            with self._lock:
+                self._results[endpoint] = (now, healthy)
+                if healthy:
+                    self._failures.pop(endpoint, None)
+                else:
+                    self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+
+        _LOGGER.debug(
+            f"[HealthProber] probed: {len(targets)}, cached: {len(result) - len(targets)}"
+        )
+        return result
+
+    def is_failing(self, endpoint: str) -> bool:
+        """Failed failure_threshold times in a row"""
+        return self._failures.get(endpoint, 0) >= self.failure_threshold
+
+    def _check(self, endpoint: str) -> bool:
+        try:
+            e = parse_endpoint(endpoint)
+            target = f'{e["hostname"]}:{e["port"]}'
+            with grpc.insecure_channel(target) as channel:
+                stub = health_pb2_grpc.HealthStub(channel)
+                response = stub.Check(
+                    health_pb2.HealthCheckRequest(service=""), timeout=self.timeout
+                )
+                return response.status == health_pb2.HealthCheckResponse.SERVING
+        except grpc.RpcError as e:
+            # Plugin is serving, but has no health service
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                return True
+            _LOGGER.debug(f"[HealthProber] {endpoint}: {e.code()}")
+            return False
+        except Exception as e:
+            _LOGGER.debug(f"[HealthProber] {endpoint}: {e}")
+            return False
@@ -0,0 +1,67 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["IdleTracker"]
+
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IdleTracker(object):
+    """Remember when each plugin was last busy
+
+    Plugin is busy while its CPU usage is over cpu_threshold (millicores).
+    Plugin which is seen for the first time, or woken up, starts as busy.
+    """
+
+    def __init__(self, cpu_threshold=5):
+        self.cpu_threshold = cpu_threshold
+        self._lock = threading.Lock()
+        # plugin name -> monotonic time of last activity
+        self._last_active = {}
+
+    def update(self, names: list, usage: dict):
+        """
+        Args:
+            names(list): name of running plugins
+            usage(dict): {name: millicores}, plugin without usage is unknown
+        """
+        now = time.monotonic()
+        with self._lock:
+            for name in names:
+                if name not in self._last_active:
+                    self._last_active[name] = now
+                elif usage.get(name, self.cpu_threshold) >= self.cpu_threshold:
+                    self._last_active[name] = now
+
+    def touch(self, name: str):
+        with self._lock:
+            self._last_active[name] = time.monotonic()
+
+    def forget(self, name: str):
+        with self._lock:
+            self._last_active.pop(name, None)
+
+    def list_idle(self, names: list, idle_timeout: float) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                name
+                for name in names
+                if now - self._last_active.get(name, now) > idle_timeout
+            ]
@@ -0,0 +1,122 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["LabelIndex"]
+
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LabelIndex(object):
+    """Inverted index from (label key, label value) to plugin records
+
+    Connectors keep one index per backend and update it on run/stop and
+    on every inventory refresh, so list_plugins_by_label is answered by
+    set intersection instead of a scan over every container or Service.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # key(container id | service name) -> plugin
+        self._records = {}
+        # key -> labels
+        self._labels = {}
+        # (label key, label value) -> set of key
+        self._index = {}
+        self.updated_at = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def is_stale(self, ttl: float) -> bool:
+        if self.updated_at is None:
+            return True
+        return time.monotonic() - self.updated_at > ttl
+
+    def add(self, key, plugin, labels: dict):
+        with self._lock:
+            self._remove(key)
+            self._records[key] = plugin
+            self._labels[key] = labels
+            for item in labels.items():
+                self._index.setdefault(item, set()).add(key)
+
+    def get(self, key):
+        with self._lock:
+            return self._records.get(key)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def replace(self, entries: list, age: float = 0):
+        """Rebuild index from full inventory
+
+        Args:
+            entries(list): [(key, plugin, labels), ...]
+            age: seconds since entries were listed (restored inventory)
+        """
+        with self._lock:
+            self._records = {}
+            self._labels = {}
+            self._index = {}
+            for key, plugin, labels in entries:
+                self.add(key, plugin, labels)
+            self.updated_at = time.monotonic() - age
+        _LOGGER.debug(f"[LabelIndex] refreshed: {len(entries)}")
+
+    def query(self, label: list) -> list:
+        """Find plugins which have every label
+
+        Args:
+            label(list): ['spaceone.supervisor.name=<supervisor name>', 'a=b', ...]
+
+        Returns: list of plugin
+        """
+        with self._lock:
+            if not label:
+                return list(self._records.values())
+
+            candidates = []
+            for item in label:
+                k, v = item.split("=", 1)
+                keys = self._index.get((k, v))
+                if not keys:
+                    return []
+                candidates.append(keys)
+
+            candidates.sort(key=len)
+            keys = set(candidates[0])
+            for other in candidates[1:]:
+                keys &= other
+                if not keys:
+                    return []
+            return [self._records[key] for key in keys]
+
+    def _remove(self, key):
+        labels = self._labels.pop(key, None)
+        self._records.pop(key, None)
+        if labels is None:
+            return
+        for item in labels.items():
+            keys = self._index.get(item)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._index[item]
@@ -0,0 +1,71 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["PublishCoalescer"]
+
+import logging
+import threading
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PublishCoalescer(object):
+    """Merge publish requests of same key within window into one call
+
+    First request of a key starts a timer, requests until it fires only
+    replace the callback. Callback publishes full snapshot at that time,
+    so nothing is lost by dropping intermediate requests.
+    """
+
+    def __init__(self, window=2):
+        self.window = window
+        self._lock = threading.Lock()
+        # key -> (timer, callback)
+        self._pending = {}
+        self.requested = 0
+        self.published = 0
+
+    def request(self, key, callback):
+        with self._lock:
+            self.requested += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._pending[key] = (pending[0], callback)
+                return
+            timer = threading.Timer(self.window, self._fire, args=(key,))
+            timer.daemon = True
+            self._pending[key] = (timer, callback)
+        timer.start()
+
+    def cancel(self, key):
+        """Drop pending publish, caller publishes by itself"""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending[0].cancel()
+
+    def _fire(self, key):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+            if pending is None:
+                return
+            self.published += 1
+        try:
+            pending[1]()
+        except Exception as e:
+            _LOGGER.error(f"[PublishCoalescer] failed to publish {key}: {e}")
+        _LOGGER.debug(
+            f"[PublishCoalescer] requested: {self.requested}, published: {self.published}"
+        )
@@ -0,0 +1,133 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["RateLimiter", "RateLimitedProxy", "HIGH", "NORMAL", "LOW"]
+
+import functools
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# priority of API call, smaller is first
+HIGH = 0  # create, delete, patch
+NORMAL = 1  # list
+LOW = 2  # status polling
+
+_PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+
+class RateLimiter(object):
+    """Token bucket with priority queue of waiters
+
+    Tokens are refilled at qps up to burst.
+    Waiters get tokens in order of (priority, arrival), so create/delete
+    are not delayed behind burst of status polling.
+    qps <= 0 disables limit.
+    """
+
+    def __init__(self, qps=20, burst=40):
+        self.qps = qps
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+        # priority -> [count, total wait, max wait]
+        self._delays = {p: [0, 0.0, 0.0] for p in _PRIORITY_NAMES}
+
+    def acquire(self, priority=NORMAL):
+        if self.qps <= 0:
+            return
+
+        started_at = time.monotonic()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket:
+                    if self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait((1 - self._tokens) / self.qps)
+                else:
+                    self._cond.wait()
+
+            delay = time.monotonic() - started_at
+            stat = self._delays[priority]
+            stat[0] += 1
+            stat[1] += delay
+            stat[2] = max(stat[2], delay)
+
+    def stats(self) -> dict:
+        """Queueing delay of each priority
+
+        Returns: {'high': {'count': int, 'avg_wait': float, 'max_wait': float}, ...}
+        """
+        with self._cond:
+            return {
+                _PRIORITY_NAMES[p]: {
+                    "count": count,
+                    "avg_wait": round(total / count, 3) if count else 0,
+                    "max_wait": round(max_wait, 3),
+                }
+                for p, (count, total, max_wait) in self._delays.items()
+            }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.qps
+        )
+        self._updated_at = now
+
+
+class RateLimitedProxy(object):
+    """Acquire token of limiter before every public method call of target
+
+    Args:
+        target: API object (kubernetes CoreV1Api, docker APIClient, ...)
+        limiter: RateLimiter
+        get_priority: function(method name) -> priority, None if not limited
+    """
+
+    def __init__(self, target, limiter: RateLimiter, get_priority):
+        self._target = target
+        self._limiter = limiter
+        self._get_priority = get_priority
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        priority = self._get_priority(name)
+        if priority is None:
+            return attr
+        limiter = self._limiter
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            limiter.acquire(priority)
+            return attr(*args, **kwargs)
+
+        return wrapper
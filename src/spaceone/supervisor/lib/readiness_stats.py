@@ -0,0 +1,151 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["ReadinessStats"]
+
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+# upper bound (seconds) of histogram buckets
+BUCKETS = (
+    1,
+    2,
+    3,
+    5,
+    8,
+    13,
+    20,
+    30,
+    45,
+    60,
+    90,
+    120,
+    180,
+    240,
+    300,
+    450,
+    600,
+    900,
+    1200,
+    1800,
+)
+
+
+class ReadinessStats(object):
+    """Decaying histogram of time-to-ready per image (image:version)
+
+    Weight of old observations halves every half_life seconds,
+    so new image builds or slower clusters are learned in a day or so.
+    """
+
+    def __init__(
+        self,
+        half_life=86400,
+        min_samples=5,
+        factor=2,
+        min_timeout=30,
+        max_timeout=900,
+        max_images=1000,
+    ):
+        self.half_life = half_life
+        self.min_samples = min_samples
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_images = max_images
+        self._lock = threading.Lock()
+        # image -> [counts of buckets, updated_at], least recently used first
+        self._histograms = OrderedDict()
+
+    def observe(self, image, seconds):
+        index = min(bisect.bisect_left(BUCKETS, seconds), len(BUCKETS) - 1)
+        with self._lock:
+            counts = self._get_counts(image, create=True)
+            counts[index] += 1
+            while len(self._histograms) > self.max_images:
+                self._histograms.popitem(last=False)
+
+    def count(self, image) -> float:
+        with self._lock:
+            counts = self._get_counts(image)
+            return sum(counts) if counts else 0
+
+    def percentile(self, image, q):
+        """Returns: seconds, None if image is not observed"""
+        with self._lock:
+            counts = self._get_counts(image)
+            if not counts or sum(counts) <= 0:
+                return None
+            target = sum(counts) * q
+            accumulated = 0
+            for index, count in enumerate(counts):
+                if count > 0 and accumulated + count >= target:
+                    lower = BUCKETS[index - 1] if index > 0 else 0
+                    ratio = (target - accumulated) / count
+                    return lower + (BUCKETS[index] - lower) * ratio
+                accumulated += count
+            return BUCKETS[-1]
+
+    def get_wait_policy(self, image, timeout, initial_delay, interval):
+        """Wait parameters learned from history, defaults until min_samples
+
+        timeout: p95 * factor, within min_timeout and max_timeout
+        initial_delay: half of p50 at most
+        interval: p50 / 10, at least 1 second and not longer than default
+
+        Returns: (timeout, initial_delay, interval)
+        """
+        if round(self.count(image), 3) < self.min_samples:
+            return timeout, initial_delay, interval
+        p50 = self.percentile(image, 0.5)
+        p95 = self.percentile(image, 0.95)
+        timeout = min(max(p95 * self.factor, self.min_timeout), self.max_timeout)
+        initial_delay = min(initial_delay, p50 / 2)
+        interval = min(max(p50 / 10, 1), interval)
+        return timeout, initial_delay, interval
+
+    def snapshot(self) -> dict:
+        """Returns: {image: {'count': float, 'p50': float, 'p95': float}}"""
+        with self._lock:
+            images = list(self._histograms)
+        return {
+            image: {
+                "count": round(self.count(image), 1),
+                "p50": round(self.percentile(image, 0.5) or 0, 1),
+                "p95": round(self.percentile(image, 0.95) or 0, 1),
+            }
+            for image in images
+        }
+
+    def _get_counts(self, image, create=False):
+        """Decay counts of image until now"""
+        now = time.monotonic()
+        histogram = self._histograms.get(image)
+        if histogram is None:
+            if not create:
+                return None
+            histogram = [[0.0] * len(BUCKETS), now]
+            self._histograms[image] = histogram
+        self._histograms.move_to_end(image)
+
+        counts, updated_at = histogram
+        if now > updated_at:
+            decay = 0.5 ** ((now - updated_at) / self.half_life)
+            for index in range(len(counts)):
+                counts[index] *= decay
+            histogram[1] = now
+        return counts
@@ -0,0 +1,176 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["CircuitBreaker", "get_circuit_breaker", "call_with_retry", "is_transient"]
+
+import logging
+import random
+import socket
+import threading
+import time
+
+import grpc
+from spaceone.core import config
+from spaceone.core.error import ERROR_BASE
+
+from spaceone.supervisor.error.supervisor import ERROR_CIRCUIT_OPEN
+
+_LOGGER = logging.getLogger(__name__)
+
+RESILIENCE = {
+    "max_retries": 3,
+    "base_delay": 0.2,
+    "max_delay": 2,
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+}
+TRANSIENT_STATUS_CODES = ("UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED")
+
+# endpoint -> CircuitBreaker
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+class CircuitBreaker(object):
+    """Stop calling endpoint after failure_threshold consecutive failures
+
+    CLOSED: calls pass
+    OPEN: calls fail fast for reset_timeout seconds
+    HALF_OPEN: one trial call passes, its result closes or opens circuit again
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, endpoint, failure_threshold=5, reset_timeout=30):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.retry_after() <= 0:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        return max(0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                _LOGGER.info(f"[CircuitBreaker] {self.endpoint} is closed")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or (
+                self._failures >= self.failure_threshold
+            ):
+                if self.state != self.OPEN:
+                    _LOGGER.error(
+                        f"[CircuitBreaker] {self.endpoint} is open for {self.reset_timeout}s"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def get_circuit_breaker(endpoint) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        if endpoint not in _BREAKERS:
+            conf = _get_config()
+            _BREAKERS[endpoint] = CircuitBreaker(
+                endpoint, conf["failure_threshold"], conf["reset_timeout"]
+            )
+        return _BREAKERS[endpoint]
+
+
+def call_with_retry(endpoint, fn, *args, deadline=None, **kwargs):
+    """Call fn with exponential backoff (full jitter) on transient errors
+
+    Args:
+        endpoint: key of circuit breaker, ex) "plugin", "repository"
+        deadline: Deadline, no retry is started if backoff passes it. None is unlimited
+
+    Non-transient errors (NOT_FOUND, INVALID_ARGUMENT, ...) are raised immediately,
+    they do not mean endpoint is unhealthy.
+    """
+    conf = _get_config()
+    breaker = get_circuit_breaker(endpoint)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise ERROR_CIRCUIT_OPEN(
+                endpoint=endpoint, retry_after=round(breaker.retry_after(), 1)
+            )
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()
+                raise e
+            breaker.record_failure()
+            attempt += 1
+            delay = random.uniform(
+                0, min(conf["max_delay"], conf["base_delay"] * 2**attempt)
+            )
+            if attempt > conf["max_retries"] or _is_expired(deadline, delay):
+                raise e
+            _LOGGER.debug(
+                f"[call_with_retry] {endpoint} retry {attempt} after {delay:.2f}s: {e}"
+            )
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+def is_transient(error) -> bool:
+    """Only errors of unavailable or overloaded endpoint are retried
+
+    Others (KeyError, TypeError, NOT_FOUND, ...) fail the same way on retry.
+    """
+    if isinstance(error, ERROR_CIRCUIT_OPEN):
+        return False
+    if isinstance(error, ERROR_BASE):
+        return (
+            error.status_code in TRANSIENT_STATUS_CODES
+            or error.error_code == "ERROR_GRPC_CONNECTION"
+        )
+    if isinstance(error, grpc.RpcError):
+        # grpc.Call has code(), RpcError itself does not
+        code = error.code() if callable(getattr(error, "code", None)) else None
+        return code is not None and code.name in TRANSIENT_STATUS_CODES
+    return isinstance(error, (ConnectionError, socket.timeout))
+
+
+def _is_expired(deadline, delay) -> bool:
+    return deadline is not None and deadline.remaining() <= delay
+
+
+def _get_config() -> dict:
+    conf = RESILIENCE.copy()
+    conf.update(config.get_global("RESILIENCE", {}))
+    return conf
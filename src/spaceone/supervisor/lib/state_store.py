@@ -0,0 +1,332 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["StateStore"]
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS desired (
+    supervisor TEXT NOT NULL,
+    plugin TEXT NOT NULL,
+    PRIMARY KEY (supervisor, plugin)
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    backend TEXT NOT NULL,
+    key TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (backend, key)
+);
+CREATE TABLE IF NOT EXISTS inventory_updated (
+    backend TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ports (
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    owner TEXT,
+    PRIMARY KEY (host, port)
+);
+CREATE TABLE IF NOT EXISTS operations (
+    op_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    params TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    owner TEXT
+);
+CREATE TABLE IF NOT EXISTS idle (
+    name TEXT PRIMARY KEY,
+    marked_at REAL NOT NULL
+);
+"""
+
+# columns added after first release, for state store created by older supervisor
+_MIGRATIONS = (
+    "ALTER TABLE ports ADD COLUMN owner TEXT",
+    "ALTER TABLE operations ADD COLUMN owner TEXT",
+)
+
+# reserve_port retries, if concurrent process takes the same port or holds the write lock
+RESERVE_RETRIES = 3
+RESERVE_BACKOFF = 0.5
+
+# seconds to wait for write lock of other scheduler process
+LOCK_TIMEOUT = 10
+
+
+class StateStore(object):
+    """Local state of supervisor in SQLite
+
+    - desired: plugins assigned by plugin service at last sync
+    - inventory: plugin records observed at backend
+    - ports: host ports reserved for plugins
+    - operations: install/delete which are not finished yet
+    - idle: plugins stopped by idle policy (Docker), not failed ones
+
+    Survives restart of supervisor pod (with persistent volume),
+    so pending operations are resumed or rolled back at startup.
+
+    Scheduler processes share one file, so operations and port reservations
+    have owner process (boot_id:pid:start time). Only those of dead owners are recovered.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=LOCK_TIMEOUT, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        for migration in _MIGRATIONS:
+            try:
+                self._conn.execute(migration)
+            except sqlite3.OperationalError:
+                # duplicate column
+                pass
+        self.owner = get_owner()
+        _LOGGER.debug(f"[StateStore] open: {path}, owner: {self.owner}")
+
+    def save_desired(self, supervisor: str, plugins: list):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM desired WHERE supervisor = ?", (supervisor,)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO desired VALUES (?, ?)",
+                [(supervisor, json.dumps(plugin)) for plugin in plugins],
+            )
+
+    def list_desired(self, supervisor: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT plugin FROM desired WHERE supervisor = ?", (supervisor,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_inventory(self, backend: str, entries: list):
+        """
+        Args:
+            entries(list): [(key, record(dict)), ...]
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM inventory WHERE backend = ?", (backend,))
+            self._conn.executemany(
+                "INSERT INTO inventory VALUES (?, ?, ?)",
+                [(backend, key, json.dumps(record)) for key, record in entries],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO inventory_updated VALUES (?, ?)",
+                (backend, time.time()),
+            )
+
+    def load_inventory(self, backend: str):
+        """
+        Returns: (list of record(dict), updated_at) or ([], None)
+        """
+        with self._lock:
+            updated = self._conn.execute(
+                "SELECT updated_at FROM inventory_updated WHERE backend = ?",
+                (backend,),
+            ).fetchone()
+            rows = self._conn.execute(
+                "SELECT record FROM inventory WHERE backend = ?", (backend,)
+            ).fetchall()
+        if updated is None:
+            return [], None
+        return [json.loads(row[0]) for row in rows], updated[0]
+
+    def reserve_port(self, host: str, ports, name: str):
+        """Select free port and reserve it in one transaction
+
+        Args:
+            ports: candidate ports in order of preference
+
+        Returns: reserved port, None if every candidate is reserved by others
+        """
+        for attempt in range(RESERVE_RETRIES):
+            try:
+                return self._reserve_port(host, ports, name)
+            except sqlite3.IntegrityError as e:
+                _LOGGER.debug(f"[reserve_port] conflict {attempt + 1}: {e}")
+            except sqlite3.OperationalError as e:
+                # database is locked, longer than LOCK_TIMEOUT
+                if not _is_locked(e) or attempt + 1 == RESERVE_RETRIES:
+                    raise
+                _LOGGER.debug(f"[reserve_port] locked {attempt + 1}: {e}")
+                time.sleep(RESERVE_BACKOFF * (attempt + 1))
+        return None
+
+    def _reserve_port(self, host: str, ports, name: str):
+        with self._lock, self._conn:
+            # write lock of database, other processes wait until commit
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT port, name FROM ports WHERE host = ?", (host,)
+            ).fetchall()
+            for port, owner_name in rows:
+                # retried install keeps its port
+                if owner_name == name and port in ports:
+                    return port
+            reserved = set([port for port, _ in rows])
+            for port in ports:
+                if port not in reserved:
+                    self._conn.execute(
+                        "INSERT INTO ports VALUES (?, ?, ?, ?)",
+                        (host, port, name, self.owner),
+                    )
+                    return port
+        return None
+
+    def release_port(self, name: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ports WHERE name = ?", (name,))
+
+    def release_dead_ports(self) -> int:
+        """Release ports reserved by processes which are gone"""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT owner FROM ports").fetchall()
+        dead = [owner for (owner,) in rows if not is_alive(owner)]
+        with self._lock, self._conn:
+            for owner in dead:
+                if owner is None:
+                    self._conn.execute("DELETE FROM ports WHERE owner IS NULL")
+                else:
+                    self._conn.execute("DELETE FROM ports WHERE owner = ?", (owner,))
+        return len(dead)
+
+    def list_reserved_ports(self, host: str) -> dict:
+        """
+        Returns: {port: name}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT port, name FROM ports WHERE host = ?", (host,)
+            ).fetchall()
+        return dict(rows)
+
+    def set_idle(self, name: str, idle: bool):
+        with self._lock, self._conn:
+            if idle:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO idle VALUES (?, ?)", (name, time.time())
+                )
+            else:
+                self._conn.execute("DELETE FROM idle WHERE name = ?", (name,))
+
+    def list_idle(self) -> set:
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM idle").fetchall()
+        return set([row[0] for row in rows])
+
+    def begin_operation(self, kind: str, name: str, params: dict) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO operations (kind, name, params, started_at, owner)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (kind, name, json.dumps(params), time.time(), self.owner),
+            )
+            return cursor.lastrowid
+
+    def finish_operation(self, op_id: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM operations WHERE op_id = ?", (op_id,))
+
+    def list_operations(self, dead_only=False) -> list:
+        """
+        Args:
+            dead_only: operations of processes which are gone, others are still in progress
+
+        Returns: [{'op_id': int, 'kind': str, 'name': str, 'params': dict, 'started_at': float,
+                   'owner': str}]
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT op_id, kind, name, params, started_at, owner FROM operations ORDER BY op_id"
+            ).fetchall()
+        return [
+            {
+                "op_id": op_id,
+                "kind": kind,
+                "name": name,
+                "params": json.loads(params),
+                "started_at": started_at,
+                "owner": owner,
+            }
+            for op_id, kind, name, params, started_at, owner in rows
+            if not dead_only or not is_alive(owner)
+        ]
+
+
+def get_owner() -> str:
+    """Identity of current process, which is not reused by later processes
+
+    pid alone is reused by restarted container, so boot id and start time of process are added.
+    """
+    pid = os.getpid()
+    return f"{_get_boot_id()}:{pid}:{_get_start_time(pid)}"
+
+
+def is_alive(owner) -> bool:
+    if not owner:
+        # written by older supervisor
+        return False
+    boot_id, pid, start_time = owner.split(":")
+    if boot_id != _get_boot_id():
+        return False
+    if start_time:
+        return _get_start_time(int(pid)) == start_time
+    # no procfs
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_locked(error) -> bool:
+    return "locked" in str(error) or "busy" in str(error)
+
+
+def _get_boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _get_start_time(pid) -> str:
+    """Start time of process in clock ticks since boot, empty if unknown"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return ""
+    # comm (2nd field) may have spaces, starttime is 22nd field
+    return stat.rsplit(")", 1)[1].split()[19]
@@ -1,2 +1,3 @@
 from spaceone.supervisor.manager.supervisor_manager import SupervisorManager
 from spaceone.supervisor.manager.plugin_service_manager import PluginServiceManager
+from spaceone.supervisor.manager.shard_manager import ShardManager
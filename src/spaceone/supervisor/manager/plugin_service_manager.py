@@ -22,6 +22,8 @@ from spaceone.core import config
 from spaceone.core.manager import BaseManager
 from spaceone.core.connector.space_connector import SpaceConnector
 
+from spaceone.supervisor.lib.resilience import call_with_retry
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -30,28 +32,45 @@ class PluginServiceManager(BaseManager):
         super().__init__(*args, **kwargs)
         self.plugin_connector = SpaceConnector(service="plugin")
 
-    def publish_supervisor(self, params: dict) -> dict:
+    def publish_supervisor(self, params: dict, token=None) -> dict:
         """Get connector for plugin
 
         connector is gRPC client for Plugin Service
+        token is required, if called out of transaction (background publish)
         """
         _LOGGER.debug("Manager:publish_supervisor")
 
         # todo modify api and model
-        del params["labels"]
-        response = self.plugin_connector.dispatch("Supervisor.publish", params)
+        params.pop("labels", None)
+        # publish sends full snapshot, so retry is safe
+        if token:
+            return call_with_retry(
+                "plugin",
+                self.plugin_connector.dispatch,
+                "Supervisor.publish",
+                params,
+                token=token,
+            )
+        response = call_with_retry(
+            "plugin", self.plugin_connector.dispatch, "Supervisor.publish", params
+        )
         return response
 
-    def list_plugins(self, supervisor_id, hostname, domain_id):
+    def list_plugins(self, supervisor_id, hostname, domain_id, deadline=None):
         """Sync Plugins from Plugin Service"""
-        token = config.get_global("TOKEN")
+        token = self.transaction.get_meta("token") or config.get_global("TOKEN")
         params = {"domain_id": domain_id}
         if supervisor_id:
             params["supervisor_id"] = supervisor_id
         if hostname:
             params["hostname"] = hostname
 
-        response = self.plugin_connector.dispatch(
-            "Supervisor.list_plugins", params, token=token
+        response = call_with_retry(
+            "plugin",
+            self.plugin_connector.dispatch,
+            "Supervisor.list_plugins",
+            params,
+            token=token,
+            deadline=deadline,
         )
         return response
@@ -0,0 +1,119 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["ShardManager"]
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from spaceone.core import cache, config
+from spaceone.core.manager import BaseManager
+
+from spaceone.supervisor.lib.hash_ring import HashRing
+
+_LOGGER = logging.getLogger(__name__)
+
+MEMBER_KEY = "supervisor:member:{domain_id}:{name}:{member_id}"
+
+# (domain_id, name) -> HashRing of last seen members
+_RINGS = {}
+# identities are synced at worker threads of run_fairly
+_RINGS_LOCK = threading.Lock()
+
+
+class ShardManager(BaseManager):
+    """Split plugins of one supervisor among active replicas
+
+    Every replica keeps a lease key at cache while it is alive.
+    Plugins are assigned to replicas by consistent hashing of plugin_id,
+    so shards are rebalanced when a replica joins or its lease expires.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        shard_conf = config.get_global("SHARDING", {})
+        self.enabled = shard_conf.get("enabled", False)
+        self.lease_ttl = shard_conf.get("lease_ttl", 180)
+        self.vnodes = shard_conf.get("vnodes", 64)
+        self.member_id = shard_conf.get("member_id") or _get_default_member_id()
+
+    def get_lock_name(self, name: str) -> str:
+        """Sync lock is per replica, if sharding is enabled"""
+        if self.enabled:
+            return f"{name}:{self.member_id}"
+        return name
+
+    def join(self, domain_id: str, name: str):
+        """Renew lease of this replica"""
+        if not self.enabled:
+            return
+        key = MEMBER_KEY.format(
+            domain_id=domain_id, name=name, member_id=self.member_id
+        )
+        try:
+            cache.set(key, time.time(), expire=self.lease_ttl)
+        except Exception as e:
+            _LOGGER.error(f"[join] failed to renew lease: {e}")
+
+    def leave(self, domain_id: str, name: str):
+        if not self.enabled:
+            return
+        key = MEMBER_KEY.format(
+            domain_id=domain_id, name=name, member_id=self.member_id
+        )
+        try:
+            cache.delete(key)
+        except Exception as e:
+            _LOGGER.error(f"[leave] failed to delete lease: {e}")
+
+    def list_members(self, domain_id: str, name: str) -> list:
+        pattern = MEMBER_KEY.format(domain_id=domain_id, name=name, member_id="*")
+        prefix = pattern[:-1]
+        members = set([self.member_id])
+        try:
+            for key in cache.keys(pattern):
+                if isinstance(key, bytes):
+                    key = key.decode("utf-8")
+                members.add(key[len(prefix) :])
+        except Exception as e:
+            _LOGGER.error(f"[list_members] failed to list members: {e}")
+        return sorted(members)
+
+    def get_owner_filter(self, domain_id: str, name: str):
+        """
+        Returns: function(plugin_id) -> True if this replica owns plugin,
+                 None if sharding is disabled
+        """
+        if not self.enabled:
+            return None
+
+        members = self.list_members(domain_id, name)
+        with _RINGS_LOCK:
+            ring = _RINGS.get((domain_id, name))
+            if ring is None or ring.members != members:
+                _LOGGER.debug(f"[get_owner_filter] rebalance {name}: {members}")
+                ring = HashRing(members, self.vnodes)
+                _RINGS[(domain_id, name)] = ring
+
+        member_id = self.member_id
+        return lambda plugin_id: ring.get(plugin_id) == member_id
+
+
+def _get_default_member_id():
+    # pod name at kubernetes
+    return os.environ.get("HOSTNAME") or socket.gethostname()
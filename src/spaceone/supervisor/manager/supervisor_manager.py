@@ -16,17 +16,40 @@
 __all__ = ["SupervisorManager"]
 
 import logging
-from typing import Union
+import threading
+import time
 
-from spaceone.core import config
+from spaceone.core import cache, config
 from spaceone.core.manager import BaseManager
 from spaceone.core.connector.space_connector import SpaceConnector
 
-from spaceone.supervisor.connector.kubernetes_connector import KubernetesConnector
-from spaceone.supervisor.connector.docker_connector import DockerConnector
+from spaceone.supervisor.connector.container_connector import ContainerConnector
+from spaceone.supervisor.error.supervisor import ERROR_INSUFFICIENT_CAPACITY
+from spaceone.supervisor.lib.capacity import CapacityModel, get_footprint
+from spaceone.supervisor.lib.health_probe import HealthProber
+from spaceone.supervisor.lib.idle_tracker import IdleTracker
+from spaceone.supervisor.lib.resilience import call_with_retry
+from spaceone.supervisor.lib.state_store import StateStore
+from spaceone.supervisor.model.plugin_record import PluginRecord
 
 _LOGGER = logging.getLogger(__name__)
 
+_CONNECTORS = {}
+_CONNECTORS_LOCK = threading.Lock()
+
+_HEALTH_PROBER = None
+_HEALTH_PROBER_LOCK = threading.Lock()
+
+_IDLE_TRACKER = IdleTracker()
+
+_STATE_STORE = None
+_STATE_STORE_LOCK = threading.Lock()
+
+# (domain_id, plugin_id) -> (plugin_info, expires_at), used when CACHES is not configured
+_PLUGIN_INFO = {}
+_PLUGIN_INFO_LOCK = threading.Lock()
+PLUGIN_INFO_TTL = 300
+
 
 class SupervisorManager(BaseManager):
     def __init__(self, *args, **kwargs):
@@ -37,54 +60,244 @@ class SupervisorManager(BaseManager):
         plugin_conf = connectors_conf[self.backend]
         self.port_range = (plugin_conf["start_port"], plugin_conf["end_port"])
 
-    def install_plugin(self, image_uri, labels, ports, name, registry_config):
-        """Install Plugin"""
+    def _get_connector(self) -> ContainerConnector:
+        """Process-wide connector of backend
+
+        Connector keeps docker clients or kubernetes ApiClient with connection pool,
+        so it is created once and shared by every manager and thread.
+        """
+        with _CONNECTORS_LOCK:
+            if self.backend not in _CONNECTORS:
+                connector = self.locator.get_connector(self.backend)
+                connector.state_store = _get_state_store()
+                self._restore_inventory(connector)
+                _CONNECTORS[self.backend] = connector
+            return _CONNECTORS[self.backend]
+
+    def _restore_inventory(self, connector: ContainerConnector):
+        """Seed inventory of new connector from last known state"""
+        store = _get_state_store()
+        if store is None:
+            return
+        records, updated_at = store.load_inventory(self.backend)
+        if updated_at is None:
+            return
+        age = max(time.time() - updated_at, 0)
+        max_age = config.get_global("STATE_STORE", {}).get("max_inventory_age", 600)
+        if age > max_age:
+            _LOGGER.debug(f"[_restore_inventory] too old inventory: {int(age)}s")
+            return
+        connector.restore([PluginRecord.from_dict(record) for record in records], age)
+        _LOGGER.debug(
+            f"[_restore_inventory] restored: {len(records)}, age: {int(age)}s"
+        )
+
+    def save_inventory(self):
+        """Save current inventory of connector to state store"""
+        store = _get_state_store()
+        if store is None:
+            return
+        connector = self._get_connector()
+        entries = [(key, plugin.to_dict()) for key, plugin in connector.snapshot()]
+        store.save_inventory(self.backend, entries)
+
+    def save_desired_state(self, name: str, plugins: list):
+        """Remember plugins assigned by plugin service"""
+        store = _get_state_store()
+        if store is not None:
+            store.save_desired(name, plugins)
+
+    def load_desired_state(self, name: str):
+        """Plugins assigned at last successful sync
+
+        Returns: {'total_count': int, 'results': list} or None, if unknown
+        """
+        store = _get_state_store()
+        if store is None:
+            return None
+        plugins = store.list_desired(name)
+        return {"total_count": len(plugins), "results": plugins}
+
+    def recover_operations(self):
+        """Roll back or finish install/delete interrupted by restart
+
+        Interrupted install may leave partial objects (Service without Deployment),
+        interrupted delete may leave a plugin nobody owns.
+        Both are stopped, since next sync installs missing plugins again.
+
+        Scheduler processes share state store, so only operations of dead processes
+        are recovered. Those of live processes are still in progress.
+        """
+        store = _get_state_store()
+        if store is None:
+            return 0
+        store.release_dead_ports()
+        operations = store.list_operations(dead_only=True)
+        if len(operations) == 0:
+            return 0
+
+        connector = self._get_connector()
+        connector.refresh()
+        names = set([op["name"] for op in operations])
+        for plugin in connector.search(filters={"label": []})["results"]:
+            if plugin.name in names:
+                _LOGGER.debug(f"[recover_operations] stop plugin: {plugin.name}")
+                try:
+                    connector.stop(plugin)
+                except Exception as e:
+                    _LOGGER.error(
+                        f"[recover_operations] failed to stop {plugin.name}: {e}"
+                    )
+        for op in operations:
+            _LOGGER.debug(f'[recover_operations] {op["kind"]}: {op["name"]}')
+            store.release_port(op["name"])
+            store.finish_operation(op["op_id"])
+        return len(operations)
+
+    def install_plugin(
+        self, image_uri, labels, ports, name, registry_config, deadline=None
+    ):
+        """Install Plugin
+
+        Args:
+            deadline(Deadline): budget of sync, connector stops waiting at it
+        """
         # determine connector name
         _LOGGER.debug(
             f"[install_plugin] image_uri: {image_uri}, labels: {labels}, ports: {ports}, name: {name},"
             f" registry_config: {registry_config}"
         )
-        # connector = self.locator.get_connector(self.backend, config=self.plugin_conf)
-        connector = self.locator.get_connector(self.backend)
-        r = connector.run(image_uri, labels, ports, name, registry_config)
-        return r
+        connector = self._get_connector()
+        store = _get_state_store()
+        if store is None:
+            return connector.run(
+                image_uri, labels, ports, name, registry_config, deadline
+            )
 
-    def delete_plugin(self, plugin_id: str, version: str):
-        """Delete plugin"""
+        op_id = store.begin_operation(
+            "install", name, {"image": image_uri, "labels": labels, "ports": ports}
+        )
+        try:
+            return connector.run(
+                image_uri, labels, ports, name, registry_config, deadline
+            )
+        finally:
+            # port is owned by the plugin itself from now on
+            store.release_port(name)
+            store.finish_operation(op_id)
+
+    def delete_plugin(self, plugin_id: str, version: str, name=None, domain_id=None):
+        """Delete plugin
+
+        Without supervisor identity (name, domain_id), plugin of every identity is deleted.
+        """
         labels = [
             f"spaceone.supervisor.plugin_id={plugin_id}",
             f"spaceone.supervisor.plugin.version={version}",
         ]
+        if name:
+            labels.append(f"spaceone.supervisor.name={name}")
+        if domain_id:
+            labels.append(f"spaceone.supervisor.domain_id={domain_id}")
 
         target_plugins = self.list_plugins_by_label(labels)
         _LOGGER.debug(f"[delete_plugin] labels: {labels}, target: {target_plugins}")
+        return self.delete_plugins(target_plugins["results"])
+
+    def delete_plugins(self, plugins: list):
+        """Delete given plugins only
+
+        Returns: number of deleted plugins
+        """
         # determine connector
-        # connector = self.locator.get_connector(self.backend, config=self.plugin_conf)
-        connector = self.locator.get_connector(self.backend)
+        connector = self._get_connector()
+        store = _get_state_store()
         deleted_count = 0
-        for plugin in target_plugins["results"]:
-            _LOGGER.debug(f"[delete_plugin] plugin: {plugin}")
-            connector.stop(plugin)
+        for plugin in plugins:
+            _LOGGER.debug(f"[delete_plugins] plugin: {plugin}")
+            if store is None:
+                connector.stop(plugin)
+            else:
+                op_id = store.begin_operation("delete", plugin.name, plugin.to_dict())
+                connector.stop(plugin)
+                store.finish_operation(op_id)
             deleted_count += 1
         return deleted_count
 
+    def supports_reconcile(self) -> bool:
+        """False if backend can not update plugins in place"""
+        connector = self._get_connector()
+        return connector.supports_reconcile()
+
+    def reconcile_plugins(self, plugins: list, image_uri=None):
+        """Apply desired spec to running plugins in place
+
+        Returns: number of patched plugins
+        """
+        connector = self._get_connector()
+        patched_count = 0
+        for plugin in plugins:
+            if connector.reconcile(plugin, image_uri):
+                patched_count += 1
+        return patched_count
+
+    def apply_idle_policy(self, plugins: list) -> list:
+        """Scale plugins to zero, if CPU usage is low for idle_timeout
+
+        Returns: list of PluginRecord which are scaled to zero
+        """
+        idle_conf = config.get_global("IDLE_POLICY", {})
+        if not idle_conf.get("enabled", False):
+            return []
+
+        _IDLE_TRACKER.cpu_threshold = idle_conf.get("cpu_threshold", 5)
+        connector = self._get_connector()
+        active_plugins = [plugin for plugin in plugins if plugin.state == "ACTIVE"]
+        names = [plugin.name for plugin in active_plugins]
+        _IDLE_TRACKER.update(names, connector.get_usage(active_plugins))
+
+        idle_names = set(
+            _IDLE_TRACKER.list_idle(names, idle_conf.get("idle_timeout", 3600))
+        )
+        scaled = []
+        for plugin in active_plugins:
+            if plugin.name in idle_names and connector.scale(plugin, 0):
+                _IDLE_TRACKER.forget(plugin.name)
+                scaled.append(plugin)
+        return scaled
+
+    def wake_plugins(self, plugins: list) -> list:
+        """Scale idle plugins up again, without waiting for ready
+
+        Returns: list of PluginRecord which are woken up
+        """
+        connector = self._get_connector()
+        woken = []
+        for plugin in plugins:
+            if plugin.state == "IDLE" and connector.scale(plugin):
+                _IDLE_TRACKER.touch(plugin.name)
+                woken.append(plugin)
+        return woken
+
     def create_endpoint(self, hostname):
         """Determine endpoint of plugin"""
         pass
 
-    def list_plugins_by_label(self, label: list) -> dict:
+    def list_plugins_by_label(self, label: list, include_unready=False) -> dict:
         """Discover plugins based on label
 
         Args:
             label(string, label)
                 - spaceone.supervisor.name=<supervisor name>
+            include_unready: headless plugins without endpoints are included too
+
+        Returns: {'total_count': int, 'results': list of PluginRecord,
+                  'unknown_hosts': list (optional, hosts which can not be listed now),
+                  'unlisted_hosts': list (optional, unknown hosts which were never listed)}
         """
-        filters = {"label": label}
+        filters = {"label": label, "include_unready": include_unready}
         try:
-            # connector = self.locator.get_connector(self.backend, self.plugin_conf)
-            connector: Union[
-                KubernetesConnector, DockerConnector
-            ] = self.locator.get_connector(self.backend)
+            connector = self._get_connector()
             data: dict = connector.search(filters=filters)
             return data
         except Exception as e:
@@ -92,31 +305,216 @@ class SupervisorManager(BaseManager):
             _LOGGER.error(e)
             return {"total_count": 0, "results": []}
 
+    def probe_plugins(self, plugins: list) -> list:
+        """Update state of ACTIVE plugins with gRPC health check
+
+        Plugin is ERROR if none of endpoints is serving.
+        Only serving endpoints are left at headless plugin.
+
+        Returns: list of PluginRecord
+        """
+        prober = _get_health_prober()
+        if prober is None:
+            return plugins
+
+        endpoints = []
+        for plugin in plugins:
+            if plugin.state == "ACTIVE":
+                endpoints.extend(_get_probe_endpoints(plugin))
+        health = prober.probe(endpoints)
+
+        result = []
+        for plugin in plugins:
+            if plugin.state == "ACTIVE":
+                serving = [e for e in _get_probe_endpoints(plugin) if health.get(e)]
+                if len(serving) == 0:
+                    plugin = plugin._replace(state="ERROR")
+                elif plugin.endpoints is not None:
+                    plugin = plugin._replace(endpoints=tuple(serving))
+            result.append(plugin)
+        return result
+
+    def list_unhealthy_plugins(self, plugins: list) -> set:
+        """Find plugins which failed health check failure_threshold times in a row
+
+        Empty unless HEALTH_CHECK.reprovision is enabled by operator.
+        Returns: set of (plugin_id, version)
+        """
+        prober = _get_health_prober()
+        if prober is None:
+            return set()
+        if not config.get_global("HEALTH_CHECK", {}).get("reprovision", False):
+            return set()
+
+        self.probe_plugins(plugins)
+        unhealthy = set()
+        for plugin in plugins:
+            endpoints = _get_probe_endpoints(plugin)
+            if endpoints and all(prober.is_failing(e) for e in endpoints):
+                unhealthy.add((plugin.plugin_id, plugin.version))
+        return unhealthy
+
     @staticmethod
-    def get_plugin_from_repository(plugin_id: str, domain_id: str) -> dict:
+    @cache.cacheable(key="supervisor:plugin-info:{domain_id}:{plugin_id}", expire=300)
+    def get_plugin_from_repository(
+        plugin_id: str, domain_id: str, token=None, deadline=None
+    ) -> dict:
         """Contact to repository service
         Find plugin_info
 
         """
+        # cacheable is no-op without CACHES, only then plugin_info is kept in process
+        in_process = not cache.is_set()
+        key = (domain_id, plugin_id)
+        if in_process:
+            with _PLUGIN_INFO_LOCK:
+                plugin_info, expires_at = _PLUGIN_INFO.get(key, (None, 0))
+            if plugin_info is not None and expires_at > time.monotonic():
+                return plugin_info
+
         # Create Repository Connector
-        token = config.get_global("TOKEN")
+        token = token or config.get_global("TOKEN")
         repo_connector = SpaceConnector(service="repository", token=token)
-        plugin_info = repo_connector.dispatch(
-            "Plugin.get", {"plugin_id": plugin_id}, x_domain_id=domain_id
+        plugin_info = call_with_retry(
+            "repository",
+            repo_connector.dispatch,
+            "Plugin.get",
+            {"plugin_id": plugin_id},
+            x_domain_id=domain_id,
+            deadline=deadline,
         )
+        if in_process:
+            with _PLUGIN_INFO_LOCK:
+                _PLUGIN_INFO[key] = (plugin_info, time.monotonic() + PLUGIN_INFO_TTL)
         return plugin_info
 
-    def find_host_port(self):
-        """find host port for container port mapping"""
-        # connector = self.locator.get_connector(self.backend, config=self.plugin_conf)
-        connector = self.locator.get_connector(self.backend)
-        used_ports = connector.list_used_ports()
-        _LOGGER.debug("Used ports list: %s" % used_ports)
-        s, e = self.port_range
-        host_ports = set(range(s, e))
-        possible_ports = host_ports - used_ports
+    def select_host(self, labels=None):
+        """Choose backend host for new plugin
+
+        Args:
+            labels(dict): labels of new plugin, for affinity rules
+
+        Returns:
+            - host(dict): {'name': str, 'hostname': str, ...}
+            - None, if backend has single host
+        """
+        connector = self._get_connector()
+        return connector.select_host(labels)
+
+    def find_host_port(self, host=None, name=None, supervisor_name=None):
+        """find host port for container port mapping
+
+        Port is reserved for plugin name at state store until install is finished,
+        so concurrent or interrupted install does not take it again.
+        Port range of supervisor identity (SUPERVISORS) is preferred.
+        """
+        host_name, possible_ports = self._list_free_ports(host, supervisor_name)
         _LOGGER.debug("Possible allocated port list: %s" % possible_ports)
-        return possible_ports.pop()
+        host_port = None
+        store = _get_state_store()
+        if store is not None and name:
+            # select and reserve atomically, other scheduler processes may install at the same time
+            host_port = store.reserve_port(host_name, sorted(possible_ports), name)
+        elif possible_ports:
+            host_port = possible_ports.pop()
+        if host_port is None:
+            raise ERROR_INSUFFICIENT_CAPACITY(
+                plugin_id=name, reason=f"no free port at {host_name}"
+            )
+        return host_port
+
+    def release_port(self, name):
+        """Release port reserved by find_host_port, if install is not started"""
+        store = _get_state_store()
+        if store is not None:
+            store.release_port(name)
+
+    def _list_free_ports(self, host=None, supervisor_name=None):
+        """
+        Returns: (host name, set of free ports)
+        """
+        connector = self._get_connector()
+        if host:
+            host_name = host["name"]
+            used_ports = connector.list_used_ports(host_name)
+            s = host.get("start_port", self.port_range[0])
+            e = host.get("end_port", self.port_range[1])
+        else:
+            host_name = "local"
+            used_ports = connector.list_used_ports()
+            s, e = self.port_range
+        s, e = _get_supervisor_port_range(supervisor_name, (s, e))
+        store = _get_state_store()
+        if store is not None:
+            used_ports = used_ports | set(store.list_reserved_ports(host_name))
+        _LOGGER.debug("Used ports list: %s" % used_ports)
+        return host_name, set(range(s, e)) - used_ports
+
+    def get_capacity(self, supervisor_name=None) -> CapacityModel:
+        """Free capacity of backend (quota, nodes, plugin slots) and free host ports"""
+        connector = self._get_connector()
+        capacity = connector.get_capacity()
+        capacity.ports = sum(
+            len(self._list_free_ports(host, supervisor_name)[1])
+            for host in connector.list_hosts()
+        )
+        return capacity
+
+    def admit_plugins(self, plans: list, supervisor_name=None):
+        """Check install plan against capacity, before any object is created
+
+        Plans are admitted smallest first, so the most plugins are installed,
+        and each admitted plan takes its share of capacity.
+
+        Args:
+            plans: [(key, labels of new plugin), ...]
+
+        Returns:
+            - admitted: [key, ...] in install order
+            - rejected: {key: reason}
+        """
+        connector = self._get_connector()
+        capacity = self.get_capacity(supervisor_name)
+        requests = [
+            (key, connector.get_plugin_request(labels)) for key, labels in plans
+        ]
+        requests.sort(key=lambda item: get_footprint(item[1]))
+
+        admitted = []
+        rejected = {}
+        for key, request in requests:
+            reason = capacity.check(request)
+            if reason:
+                rejected[key] = reason
+                continue
+            capacity.reserve(request)
+            admitted.append(key)
+        _LOGGER.debug(
+            f"[admit_plugins] admitted: {len(admitted)}, rejected: {len(rejected)}"
+        )
+        return admitted, rejected
+
+    def admit_plugin(self, labels: dict, supervisor_name=None):
+        """Raise ERROR_INSUFFICIENT_CAPACITY, if new plugin does not fit"""
+        admitted, rejected = self.admit_plugins([(0, labels)], supervisor_name)
+        if rejected:
+            raise ERROR_INSUFFICIENT_CAPACITY(
+                plugin_id=labels.get("spaceone.supervisor.plugin_id"),
+                reason=rejected[0],
+            )
+
+    def get_rate_limit_stats(self) -> dict:
+        """Queueing delay of backend API calls by priority"""
+        connector = self._get_connector()
+        return connector.get_rate_limit_stats()
+
+    def watch_plugins(self, callback) -> bool:
+        """Call callback(plugin) whenever backend reports change of plugin endpoints
+
+        Returns: False if backend does not support watch
+        """
+        connector = self._get_connector()
+        return connector.watch(callback)
 
     def get_plugin_endpoint(self, name, hostname, host_port):
         """Find the GRPC endpoint of plugin
@@ -128,8 +526,57 @@ class SupervisorManager(BaseManager):
         """
         if self.backend == "DockerConnector":
             endpoint = f"grpc://{hostname}:{host_port}"
-        elif self.backend == "KubernetesConnector":
+        elif self.backend in ["KubernetesConnector", "MultiKubernetesConnector"]:
             endpoint = f"grpc://{name}.{hostname}:{host_port}"
         else:
             _LOGGER.error(f"[get_plugin_endpoint] undefined backend: {self.backend}")
         return endpoint
+
+
+def _get_health_prober():
+    """Process-wide HealthProber, None if HEALTH_CHECK is disabled"""
+    global _HEALTH_PROBER
+    health_conf = config.get_global("HEALTH_CHECK", {})
+    if not health_conf.get("enabled", False):
+        return None
+
+    with _HEALTH_PROBER_LOCK:
+        if _HEALTH_PROBER is None:
+            _HEALTH_PROBER = HealthProber(
+                pool_size=health_conf.get("pool_size", 16),
+                timeout=health_conf.get("timeout", 2),
+                cache_ttl=health_conf.get("cache_ttl", 30),
+                failure_threshold=health_conf.get("failure_threshold", 3),
+            )
+        return _HEALTH_PROBER
+
+
+def _get_supervisor_port_range(supervisor_name, default: tuple) -> tuple:
+    for supervisor in config.get_global("SUPERVISORS", []):
+        if supervisor.get("name") == supervisor_name:
+            return (
+                supervisor.get("start_port", default[0]),
+                supervisor.get("end_port", default[1]),
+            )
+    return default
+
+
+def _get_state_store():
+    """Process-wide StateStore, None if STATE_STORE.path is empty"""
+    global _STATE_STORE
+    path = config.get_global("STATE_STORE", {}).get("path")
+    if not path:
+        return None
+
+    with _STATE_STORE_LOCK:
+        if _STATE_STORE is None:
+            _STATE_STORE = StateStore(path)
+        return _STATE_STORE
+
+
+def _get_probe_endpoints(plugin: PluginRecord) -> list:
+    if plugin.endpoints:
+        return list(plugin.endpoints)
+    if plugin.endpoint != "Unknown":
+        return [plugin.endpoint]
+    return []
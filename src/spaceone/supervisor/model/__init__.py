@@ -0,0 +1 @@
+from spaceone.supervisor.model.plugin_record import PluginRecord
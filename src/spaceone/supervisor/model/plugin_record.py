@@ -0,0 +1,98 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+__all__ = ["PluginRecord"]
+
+import sys
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+
+def _intern_labels(labels: dict) -> Mapping[str, str]:
+    """Label keys and most values are shared by every plugin of a supervisor"""
+    return MappingProxyType(
+        {sys.intern(str(k)): sys.intern(str(v)) for k, v in labels.items()}
+    )
+
+
+class PluginRecord(NamedTuple):
+    """Plugin instance discovered at container backend
+
+    Shared by connectors, SupervisorManager and SupervisorService.
+    Record is immutable, use _replace() for an updated copy.
+    """
+
+    plugin_id: str
+    version: str
+    image: str
+    endpoint: str
+    name: str
+    state: str
+    labels: Mapping[str, str]
+    endpoints: Optional[Tuple[str, ...]] = None
+    docker_id: Optional[str] = None
+    host_port: Optional[int] = None
+    host: Optional[str] = None
+
+    @classmethod
+    def from_labels(cls, labels: dict, name: str, state: str, **kwargs):
+        """Create record from spaceone.supervisor.* labels
+
+        Args:
+            labels(dict): container labels or service annotations
+            name: container name or service name
+            state: ACTIVE | ERROR
+        """
+        labels = _intern_labels(labels or {})
+        return cls(
+            plugin_id=labels.get("spaceone.supervisor.plugin_id", "Unknown"),
+            version=labels.get("spaceone.supervisor.plugin.version", "Unknown"),
+            image=labels.get("spaceone.supervisor.plugin.image", "Unknown"),
+            endpoint=labels.get("spaceone.supervisor.plugin.endpoint", "Unknown"),
+            name=name,
+            state=state,
+            labels=labels,
+            **kwargs,
+        )
+
+    def to_publish_info(self) -> dict:
+        """plugin_info of Supervisor.publish"""
+        if self.endpoints is None:
+            endpoints = [self.endpoint]
+        else:
+            endpoints = list(self.endpoints)
+        return {
+            "plugin_id": self.plugin_id,
+            "version": self.version,
+            "state": self.state,
+            "endpoint": self.endpoint,
+            "endpoints": endpoints,
+        }
+
+    def to_dict(self) -> dict:
+        """JSON serializable dict for local state store"""
+        data = self._asdict()
+        data["labels"] = dict(self.labels)
+        if self.endpoints is not None:
+            data["endpoints"] = list(self.endpoints)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        data = dict(data)
+        data["labels"] = _intern_labels(data.get("labels", {}))
+        if data.get("endpoints") is not None:
+            data["endpoints"] = tuple(data["endpoints"])
+        return cls(**data)
@@ -0,0 +1,143 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import copy
+import json
+import logging
+import threading
+import time
+from concurrent.futures import wait
+from queue import Queue, Empty
+
+from spaceone.core import config, queue
+from spaceone.core.logger import set_logger
+from spaceone.core.scheduler.scheduler import BaseScheduler
+from spaceone.supervisor.scheduler.sync_scheduler import (
+    list_task_metadata_and_params,
+    run_fairly,
+)
+from spaceone.supervisor.service.supervisor_service import SupervisorService
+
+_LOGGER = logging.getLogger(__name__)
+
+__all__ = ["EventScheduler"]
+
+MAX_DEBOUNCE_FACTOR = 5
+
+
+class EventScheduler(BaseScheduler):
+    """EventScheduler
+
+    Listen "plugin changed" events from queue, then sync only changed plugins.
+    Event is JSON like {"plugin_id": str} or {"plugin_ids": [str, ...]}
+
+    Events within debounce seconds are merged into one targeted sync.
+    If sync is running already (locked) or fails, plugin_ids are retried every retry_interval
+    until synced. Full sync may hold the lock for SYNC_BUDGET seconds, so retries are not limited.
+    Periodic SyncScheduler is still required for full sync.
+    """
+
+    def __init__(self, queue, debounce=2, retry_interval=10, **kwargs):
+        super().__init__(queue, **kwargs)
+        self.config = {"debounce": debounce, "retry_interval": retry_interval}
+        self._events = Queue()
+
+    def run(self):
+        config.set_global_force(**self.global_config)
+
+        # Enable logging configuration
+        set_logger()
+
+        listener = threading.Thread(target=self._listen, daemon=True)
+        listener.start()
+
+        while True:
+            plugin_ids = self._collect()
+            if plugin_ids:
+                self.push_task(plugin_ids)
+
+    def push_task(self, plugin_ids=None):
+        try:
+            self.create_task(plugin_ids)
+        except Exception as e:
+            _LOGGER.error(f"[push_task] error create_task: {e}")
+            self._retry(plugin_ids)
+
+    def create_task(self, plugin_ids=None):
+        # plugin_id is unique, so supervisor which does not have it syncs nothing
+        tasks = list_task_metadata_and_params("sync_plugins")
+        results = []
+
+        def sync_plugins(metadata, params):
+            params = dict(params, plugin_ids=sorted(plugin_ids))
+            supervisor_svc: SupervisorService = SupervisorService(metadata)
+            results.append(supervisor_svc.sync_plugins(copy.deepcopy(params)))
+
+        # identities are synced concurrently, like SyncScheduler
+        wait(run_fairly(tasks, sync_plugins))
+
+        # failed or skipped (still running) identity has no result
+        if len(results) < len(tasks) or not all(results):
+            self._retry(plugin_ids)
+
+        return []
+
+    def _listen(self):
+        while True:
+            try:
+                message = queue.get(self.queue)
+                for plugin_id in _parse_event(message):
+                    self._events.put(plugin_id)
+            except Exception as e:
+                _LOGGER.error(f"[_listen] failed to get event: {e}")
+                time.sleep(1)
+
+    def _collect(self) -> set:
+        """Wait first event, then merge events until queue is quiet for debounce seconds
+
+        Burst of events is flushed after MAX_DEBOUNCE_FACTOR * debounce at most.
+        """
+        plugin_ids = set()
+        try:
+            plugin_ids.add(self._events.get(timeout=1))
+        except Empty:
+            return plugin_ids
+
+        debounce = self.config["debounce"]
+        deadline = time.monotonic() + debounce * MAX_DEBOUNCE_FACTOR
+        while time.monotonic() < deadline:
+            try:
+                plugin_ids.add(self._events.get(timeout=debounce))
+            except Empty:
+                break
+        return plugin_ids
+
+    def _retry(self, plugin_ids):
+        """Put plugin_ids back, they are merged with new events at next collect"""
+        _LOGGER.debug(f"[_retry] not synced yet: {sorted(plugin_ids)}")
+        for plugin_id in plugin_ids:
+            self._events.put(plugin_id)
+        time.sleep(self.config["retry_interval"])
+
+
+def _parse_event(message) -> list:
+    if isinstance(message, bytes):
+        message = message.decode("utf-8")
+    event = json.loads(message)
+    if "plugin_ids" in event:
+        return list(event["plugin_ids"])
+    if "plugin_id" in event:
+        return [event["plugin_id"]]
+    _LOGGER.debug(f"[_parse_event] unknown event: {event}")
+    return []
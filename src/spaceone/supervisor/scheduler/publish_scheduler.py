@@ -0,0 +1,66 @@
+#
+#   Copyright 2020 The SpaceONE Authors.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import copy
+import logging
+
+from spaceone.supervisor.scheduler.sync_scheduler import (
+    SyncScheduler,
+    list_task_metadata_and_params,
+    run_fairly,
+)
+from spaceone.supervisor.service.supervisor_service import SupervisorService
+
+_LOGGER = logging.getLogger(__name__)
+
+__all__ = ["PublishScheduler"]
+
+
+class PublishScheduler(SyncScheduler):
+    """PublishScheduler
+
+    Heartbeat of supervisor with plugins from label index (cached inventory),
+    so it can run at short interval while sync_plugins runs rarely.
+    Endpoints changes of headless services are published by watch in between.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # supervisor names whose endpoints watch is started
+        self._watching = set()
+
+    @staticmethod
+    def get_task_metadata_and_params():
+        metadata, params = SyncScheduler.get_task_metadata_and_params()
+        metadata["verb"] = "publish_supervisor"
+        return metadata, params
+
+    def create_task(self):
+        run_fairly(list_task_metadata_and_params("publish_supervisor"), self._publish)
+        return []
+
+    def _publish(self, metadata, params):
+        supervisor_svc: SupervisorService = SupervisorService(metadata)
+        if params["name"] not in self._watching:
+            try:
+                if supervisor_svc.watch_plugins(
+                    copy.deepcopy(params), metadata["token"]
+                ):
+                    self._watching.add(params["name"])
+            except Exception as e:
+                _LOGGER.error(f"[create_task] failed to watch plugins: {e}")
+        try:
+            supervisor_svc.publish_supervisor(copy.deepcopy(params))
+        except Exception as e:
+            _LOGGER.error(f"[create_task] failed to publish: {e}")
@@ -13,7 +13,11 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 import copy
+import itertools
 import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from spaceone.core import config
 from spaceone.core.error import ERROR_CONFIGURATION, ERROR_UNKNOWN
@@ -25,63 +29,178 @@ _LOGGER = logging.getLogger(__name__)
 
 __all__ = ["SyncScheduler"]
 
+# shared by every supervisor identity of process
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+# (verb, domain_id, name) -> Future of running task
+_RUNNING = {}
+_ROUND = itertools.count()
+
 
 def _get_domain_id_from_token(token):
     decoded_token = JWTUtil.unverified_decode(token)
     return decoded_token["did"]
 
 
+def _make_task_metadata_and_params(name, hostname, token, tags, labels, verb):
+    if token == "":
+        _LOGGER.error("TOKEN is not configured")
+        raise ERROR_CONFIGURATION(key="TOKEN")
+
+    if name == "":
+        _LOGGER.error("name is not configured!")
+        raise ERROR_CONFIGURATION(key="NAME")
+
+    if hostname == "":
+        _LOGGER.error("hostname is not configured!")
+        raise ERROR_CONFIGURATION(key="HOSTNAME")
+
+    domain_id = _get_domain_id_from_token(token)
+
+    metadata = {
+        "token": token,
+        "domain_id": domain_id,
+        "service": "supervisor",
+        "resource": "Supervisor",
+        "verb": verb,
+    }
+
+    params = {
+        "name": name,
+        "hostname": hostname,
+        "tags": tags,
+        "labels": labels,
+        "domain_id": domain_id,
+    }
+
+    return metadata, params
+
+
+def list_task_metadata_and_params(verb="sync_plugins") -> list:
+    """Task of every supervisor identity
+
+    SUPERVISORS hosts many supervisors (domains) in one process,
+    otherwise NAME, HOSTNAME and TOKEN are the only identity.
+
+    Returns: [(metadata, params), ...]
+    """
+    supervisors = config.get_global("SUPERVISORS", [])
+    if len(supervisors) == 0:
+        metadata, params = SyncScheduler.get_task_metadata_and_params()
+        metadata["verb"] = verb
+        return [(metadata, params)]
+
+    tasks = []
+    for supervisor in supervisors:
+        try:
+            tasks.append(
+                _make_task_metadata_and_params(
+                    supervisor.get("name", ""),
+                    supervisor.get("hostname", ""),
+                    supervisor.get("token", ""),
+                    supervisor.get("tags", {}),
+                    supervisor.get("labels", []),
+                    verb,
+                )
+            )
+        except Exception as e:
+            _LOGGER.error(
+                f"[list_task_metadata_and_params] {supervisor.get('name')}: {e}"
+            )
+    return tasks
+
+
+def run_fairly(tasks: list, fn):
+    """Run fn(metadata, params) of every identity at shared worker pool
+
+    Start order is rotated every round, and identity whose previous task
+    is still running is skipped, so a slow tenant can not starve others.
+    Single identity runs at caller thread like before.
+
+    Returns: futures of started tasks, empty if it ran at caller thread
+    """
+    if len(tasks) == 1:
+        fn(*tasks[0])
+        return []
+
+    executor = _get_executor()
+    offset = next(_ROUND) % max(len(tasks), 1)
+    futures = []
+    for metadata, params in tasks[offset:] + tasks[:offset]:
+        key = (metadata["verb"], metadata["domain_id"], params["name"])
+        future = _RUNNING.get(key)
+        if future is not None and not future.done():
+            _LOGGER.debug(f"[run_fairly] still running, skip: {key}")
+            continue
+        _RUNNING[key] = executor.submit(_run_task, fn, metadata, params)
+        futures.append(_RUNNING[key])
+    return futures
+
+
+def _run_task(fn, metadata, params):
+    try:
+        fn(metadata, params)
+    except Exception as e:
+        _LOGGER.error(f'[_run_task] {metadata["verb"]} of {params["name"]}: {e}')
+
+
+def _exit(signum, frame):
+    # unwind run loop, so finally blocks release what this process holds
+    raise SystemExit(0)
+
+
+def _get_executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(
+                max_workers=config.get_global("SUPERVISOR_WORKERS", 4),
+                thread_name_prefix="supervisor",
+            )
+        return _EXECUTOR
+
+
 class SyncScheduler(IntervalScheduler):
     """SyncScheduler"""
 
     @staticmethod
     def get_task_metadata_and_params():
         try:
-            name = config.get_global("NAME", "")
-            hostname = config.get_global("HOSTNAME", "")
-            token = config.get_global("TOKEN", "")
-
-            if token == "":
-                _LOGGER.error("TOKEN is not configured")
-                raise ERROR_CONFIGURATION(key="TOKEN")
-
-            if name == "":
-                _LOGGER.error("name is not configured!")
-                raise ERROR_CONFIGURATION(key="NAME")
-
-            if hostname == "":
-                _LOGGER.error("hostname is not configured!")
-                raise ERROR_CONFIGURATION(key="HOSTNAME")
-
-            tags = config.get_global("TAGS", {})
-            labels = config.get_global("LABELS", [])
-            domain_id = _get_domain_id_from_token(token)
-
-            metadata = {
-                "token": token,
-                "domain_id": domain_id,
-                "service": "supervisor",
-                "resource": "Supervisor",
-                "verb": "sync_plugins",
-            }
-
-            params = {
-                "name": name,
-                "hostname": hostname,
-                "tags": tags,
-                "labels": labels,
-                "domain_id": domain_id,
-            }
-
-            return metadata, params
+            return _make_task_metadata_and_params(
+                config.get_global("NAME", ""),
+                config.get_global("HOSTNAME", ""),
+                config.get_global("TOKEN", ""),
+                config.get_global("TAGS", {}),
+                config.get_global("LABELS", []),
+                "sync_plugins",
+            )
 
         except Exception as e:
             _LOGGER.error(f"[check_global_configuration] error: {e}", exc_info=True)
             raise ERROR_UNKNOWN(message=f"[check_global_configuration] error: {e}")
 
+    def run(self):
+        # terminate() of scheduler process sends SIGTERM
+        signal.signal(signal.SIGTERM, _exit)
+        try:
+            super().run()
+        finally:
+            self.leave_shards()
+
+    def leave_shards(self):
+        """Release shard lease of every identity, so other replicas rebalance at once"""
+        for metadata, params in list_task_metadata_and_params():
+            try:
+                supervisor_svc: SupervisorService = SupervisorService(metadata)
+                supervisor_svc.leave_shards(copy.deepcopy(params))
+            except Exception as e:
+                _LOGGER.error(f"[leave_shards] {params['name']}: {e}")
+
     def create_task(self):
-        metadata, params = self.get_task_metadata_and_params()
+        run_fairly(list_task_metadata_and_params("sync_plugins"), self._sync_plugins)
+        return []
+
+    @staticmethod
+    def _sync_plugins(metadata, params):
         supervisor_svc: SupervisorService = SupervisorService(metadata)
         supervisor_svc.sync_plugins(copy.deepcopy(params))
-
-        return []
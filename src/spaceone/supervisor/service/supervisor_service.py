@@ -1,18 +1,44 @@
+import hashlib
 import logging
+import threading
 
-from datetime import datetime
 from hashids import Hashids
 
 from spaceone.core.error import ERROR_CONFIGURATION
 from spaceone.core.service import *
 from spaceone.core import config, cache
-from spaceone.supervisor.error import ERROR_INSTALL_PLUGINS, ERROR_DELETE_PLUGINS
+from spaceone.supervisor.error import (
+    ERROR_INSTALL_PLUGINS,
+    ERROR_DELETE_PLUGINS,
+    ERROR_INSUFFICIENT_CAPACITY,
+)
 from spaceone.supervisor.manager.supervisor_manager import SupervisorManager
 from spaceone.supervisor.manager.plugin_service_manager import PluginServiceManager
+from spaceone.supervisor.manager.shard_manager import ShardManager
+from spaceone.supervisor.lib.deadline import Deadline
+from spaceone.supervisor.lib.publish_coalescer import PublishCoalescer
+from spaceone.supervisor.lib.single_flight import SingleFlight
+from spaceone.supervisor.model.plugin_record import PluginRecord
 
 _LOGGER = logging.getLogger(__name__)
 
 SUPERVISOR_SYNC_EXPIRE_TIME = 600
+# time budget of one sync pass, shorter than lock, so passes never overlap
+SYNC_BUDGET = 540
+
+SLOT_LABEL = "spaceone.supervisor.plugin.slot"
+# domain of supervisor identity which installed plugin,
+# spaceone.supervisor.domain_id is domain of plugin, which differs at public (root) supervisor
+OWNER_DOMAIN_LABEL = "spaceone.supervisor.owner_domain_id"
+
+# suffix of plugin name, DNS-1035 label safe
+_HASHIDS = Hashids(salt="_create_unique_name", alphabet="qwertyuioplkjhgfdsazxcvbnm")
+
+# (domain_id, name, plugin_id, version) -> in-flight install, any slot
+_INSTALL_FLIGHT = SingleFlight()
+
+_PUBLISH_COALESCER = None
+_PUBLISH_COALESCER_LOCK = threading.Lock()
 
 
 class SupervisorService(BaseService):
@@ -24,6 +50,11 @@ class SupervisorService(BaseService):
         self._plugin_service_mgr: PluginServiceManager = self.locator.get_manager(
             "PluginServiceManager"
         )
+        self._shard_mgr: ShardManager = self.locator.get_manager("ShardManager")
+        # budget of sync pass, never expires out of sync_plugins
+        self._deadline = Deadline()
+        self._deferred = []
+        self._rejected = []
 
     @transaction()
     @check_required(["name", "hostname", "domain_id"])
@@ -42,32 +73,81 @@ class SupervisorService(BaseService):
 
         """
 
+        # keep lease of replica by heartbeat
+        self._shard_mgr.join(params["domain_id"], params["name"])
+
         # collect plugins_info
-        plugins = self.discover_plugins(params["name"])
-        plugins_info = plugins["results"]
+        params2 = params.copy()
+        params2["plugin_info"] = self._collect_plugins_info(
+            params["name"], params["domain_id"]
+        )
+
+        # _LOGGER.debug(f'[publish_supervisor] params: {params2}')
+        result_data = self._plugin_service_mgr.publish_supervisor(params2)
+        return result_data
+
+    def _collect_plugins_info(self, name: str, domain_id: str) -> list:
+        plugins = self.discover_plugins(name, domain_id)
+        plugins_info = self._supervisor_mgr.probe_plugins(plugins["results"])
         count = plugins["total_count"]
         # _LOGGER.debug(f'[publish_supervisor] plugins_info: {plugins_info}, count: {count}')
         _LOGGER.debug(f"[publish_supervisor] count: {count}")
         result = []
         for plugin_info in plugins_info:
-            plugin = {
-                "plugin_id": plugin_info["plugin_id"],
-                "version": plugin_info["version"],
-                "state": plugin_info["status"],
-                "endpoint": plugin_info["endpoint"],
-            }
-            if "endpoints" in plugin_info:
-                plugin["endpoints"] = plugin_info["endpoints"]
-            else:
-                plugin["endpoints"] = [plugin_info["endpoint"]]
+            if plugin_info.state == "IDLE":
+                # plugin service does not know IDLE state
+                plugin_info = plugin_info._replace(state=_get_idle_publish_state())
+            result.append(plugin_info.to_publish_info())
+        return result
 
-            result.append(plugin)
-        params2 = params.copy()
-        params2["plugin_info"] = result
+    @check_required(["name", "domain_id"])
+    def leave_shards(self, params: dict):
+        """Release lease of this replica at shutdown
 
-        # _LOGGER.debug(f'[publish_supervisor] params: {params2}')
-        result_data = self._plugin_service_mgr.publish_supervisor(params2)
-        return result_data
+        Other replicas take over its plugins at next sync, not after lease_ttl.
+        """
+        self._shard_mgr.leave(params["domain_id"], params["name"])
+
+    def watch_plugins(self, params: dict, token=None):
+        """Publish changed endpoints of plugins right away (debounced)
+
+        Args:
+            params: same as publish_supervisor
+            token: token of supervisor, watch callback runs out of transaction
+
+        Returns: True if backend supports watch
+        """
+
+        def on_change(plugin):
+            if plugin.labels.get("spaceone.supervisor.name") != params["name"]:
+                return
+            if not _is_owned(plugin, params["domain_id"]):
+                return
+            _LOGGER.debug(f"[watch_plugins] endpoints changed: {plugin.name}")
+            self._publish_soon(params, token)
+
+        return self._supervisor_mgr.watch_plugins(on_change)
+
+    def _publish_soon(self, params: dict, token=None):
+        """Publish full snapshot after coalescing window, while sync is running
+
+        Plugin service learns endpoint of ready plugin without waiting
+        for the rest of sync. Runs at timer thread, so token is given explicitly.
+        """
+        coalescer = _get_publish_coalescer()
+        if coalescer is None:
+            return
+
+        params = params.copy()
+        token = token or self._get_token()
+
+        def publish():
+            params["plugin_info"] = self._collect_plugins_info(
+                params["name"], params["domain_id"]
+            )
+            self._plugin_service_mgr.publish_supervisor(params, token=token)
+
+        coalescer.request((params["domain_id"], params["name"]), publish)
 
     @transaction()
     @check_required(["hostname", "name", "domain_id"])
@@ -81,7 +161,8 @@ class SupervisorService(BaseService):
               'name': str,
               'tags': dict,
               'labels': list,
-              'domain_id': str
+              'domain_id': str,
+              'plugin_ids': list (optional, sync these plugins only)
             }
         """
         # Parameter check
@@ -89,32 +170,64 @@ class SupervisorService(BaseService):
         hostname = params.get("hostname", None)
         name = params.get("name", None)
         domain_id = params.get("domain_id", None)
+        plugin_ids = params.pop("plugin_ids", None)
+        lock_name = self._shard_mgr.get_lock_name(name)
 
         # LOCK (after next sync)
         # Drop if previous task is running
-        lock = self._get_lock(domain_id, name)
+        lock = self._get_lock(domain_id, lock_name)
         if lock:
             _LOGGER.debug(f"[sync_plugins] running ... drop this task")
             return False
-        self._set_lock(domain_id, name)
+        self._set_lock(domain_id, lock_name)
+        self._deadline = Deadline(config.get_global("SYNC_BUDGET", SYNC_BUDGET))
+        self._deferred = []
+        self._rejected = []
+        self._install_stats = _INSTALL_FLIGHT.stats()
 
         self._supervisor_mgr = self.locator.get_manager("SupervisorManager")
         if supervisor_id is None and hostname is None:
-            self._release_lock(domain_id, name)
+            self._release_lock(domain_id, lock_name)
             raise ERROR_CONFIGURATION(key="supervisor_id | hostname")
 
+        # resume or roll back operations interrupted by restart
+        try:
+            self._supervisor_mgr.recover_operations()
+        except Exception as e:
+            _LOGGER.error(f"[sync_plugins] fail to recover operations, {e}")
+
         # list plugins from plugin service
         _LOGGER.debug("Find plugins at %s, %s" % (supervisor_id, hostname))
+        is_desired_state = True
         try:
             plugins = self._plugin_service_mgr.list_plugins(
-                supervisor_id, hostname, domain_id
+                supervisor_id, hostname, domain_id, deadline=self._deadline
             )
             num_of_plugins = plugins.get("total_count", 0)
             _LOGGER.debug(f"[sync_plugins] num of plugins: {num_of_plugins}")
+            self._supervisor_mgr.save_desired_state(name, plugins.get("results", []))
         except Exception as e:
             _LOGGER.error(f"[sync_plugins] error: {e}", exc_info=True)
-            self._release_lock(domain_id, name)
-            return False
+            # keep plugins of last sync running, without deleting anything
+            plugins = self._supervisor_mgr.load_desired_state(name)
+            if plugins is None:
+                self._release_lock(domain_id, lock_name)
+                return False
+            is_desired_state = False
+            _LOGGER.debug(
+                f'[sync_plugins] use last known plugins: {plugins["total_count"]}'
+            )
+
+        # targeted sync by plugin changed event, and plugins of other replicas
+        self._shard_mgr.join(domain_id, name)
+        is_owner = self._shard_mgr.get_owner_filter(domain_id, name)
+        is_target = _make_target_filter(plugin_ids, is_owner)
+        if is_target is not None:
+            results = [
+                p for p in plugins.get("results", []) if is_target(p["plugin_id"])
+            ]
+            plugins = {"total_count": len(results), "results": results}
+            _LOGGER.debug(f"[sync_plugins] targeted sync: {plugins['total_count']}")
 
         _LOGGER.debug(f"[sync_plugins] Check Plugin State")
         # if plugin state == RE_PROVISION, delete first
@@ -128,47 +241,90 @@ class SupervisorService(BaseService):
             self._install_plugins(plugins.get("results", []), params)
         except Exception as e:
             _LOGGER.error(f"[sync_plugins] fail to install plugins, {e}")
-            self._release_lock(domain_id, name)
+            self._release_lock(domain_id, lock_name)
             raise ERROR_INSTALL_PLUGINS(plugins)
 
+        _LOGGER.debug(f"[sync_plugins] Apply Idle Policy")
+        try:
+            if plugin_ids is None and not self._is_deferred("idle_policy", name):
+                self._apply_idle_policy(params, is_owner)
+        except Exception as e:
+            _LOGGER.error(f"[sync_plugins] fail to apply idle policy, {e}")
+
         _LOGGER.debug(f"[sync_plugins] Clean up Plugins")
         try:
-            self._delete_plugins(plugins.get("results", []), params)
+            if is_desired_state:
+                self._delete_plugins(plugins.get("results", []), params, is_target)
         except Exception as e:
             _LOGGER.error(f"[sync_plugins] fail to delete plugins, {e}")
-            self._release_lock(domain_id, name)
+            self._release_lock(domain_id, lock_name)
             raise ERROR_DELETE_PLUGINS(plugins=plugins)
 
+        try:
+            self._supervisor_mgr.save_inventory()
+        except Exception as e:
+            _LOGGER.error(f"[sync_plugins] fail to save inventory, {e}")
+        _LOGGER.debug(
+            f"[sync_plugins] rate limit: {self._supervisor_mgr.get_rate_limit_stats()}"
+        )
+        self._log_summary(name)
+
         # Publish Again
         _LOGGER.debug(f"[sync_plugins] Publish Supervisor")
+        coalescer = _get_publish_coalescer()
+        if coalescer:
+            coalescer.cancel((domain_id, name))
         try:
             self.publish_supervisor(params)
         except Exception as e:
             _LOGGER.debug(f"[sync_plugins] fail to public {e}")
-            self._release_lock(domain_id, name)
+            self._release_lock(domain_id, lock_name)
 
-        self._release_lock(domain_id, name)
+        self._release_lock(domain_id, lock_name)
         return True
 
     def _check_plugin_state(self, plugins: list, params: dict):
         """Check plugin state first
         if state == RE_PROVISIONING, delete plugin first
+        if local plugin keeps failing health check, handle it like ERROR
         """
+        unhealthy = self._supervisor_mgr.list_unhealthy_plugins(
+            self.discover_plugins(params["name"], params["domain_id"])["results"]
+        )
         for plugin in plugins:
-            plugin_domain_id = plugin["domain_id"]
-            plugin.update(params)
-            plugin["domain_id"] = plugin_domain_id
             state = plugin.get("state", None)
+            if (plugin["plugin_id"], plugin["version"]) in unhealthy:
+                _LOGGER.debug(f"[_check_plugin_state] unhealthy plugin: {plugin}")
+                state = "ERROR"
             # _LOGGER.debug(f'[_check_plugin_state] plugin_info: {dict_plugin}')
             if state == "RE_PROVISIONING" or state == "ERROR":
+                if self._is_deferred("reprovision", plugin["plugin_id"]):
+                    continue
+                # Idle plugin is requested again, wake up instead of reinstall
+                # broken instance may have no endpoints, it must be found to take next slot and be deleted
+                local_plugins = self._find_local_plugins(
+                    _make_install_params(plugin, params), include_unready=True
+                )
+                if _is_unknown(local_plugins):
+                    _LOGGER.debug(f"[_check_plugin_state] unknown host: {plugin}")
+                    continue
+                if self._supervisor_mgr.wake_plugins(local_plugins["results"]):
+                    _LOGGER.debug(f"[_check_plugin_state] wake up plugin: {plugin}")
+                    self._publish_soon(params)
+                    continue
+
                 # _LOGGER.debug(f'[_check_plugin_state] params: {params}')
-                self.install_plugin(plugin)
-                delete_params = {
-                    "plugin_id": plugin["plugin_id"],
-                    "version": plugin["version"],
-                    "domain_id": plugin["domain_id"],
-                }
-                self.delete_plugin(delete_params)
+                # New plugin takes next slot, then only old plugins are deleted
+                install_params = _make_install_params(plugin, params)
+                install_params["slot"] = _get_next_slot(local_plugins["results"])
+                try:
+                    self.install_plugin(install_params)
+                except ERROR_INSUFFICIENT_CAPACITY as e:
+                    # old plugin is kept, until new one fits
+                    self._reject(plugin["plugin_id"], e.message)
+                    continue
+                self._supervisor_mgr.delete_plugins(local_plugins["results"])
+                self._publish_soon(params)
 
     def _install_plugins(self, plugins: list, params: dict):
         """Install plugin based on plugins
@@ -181,49 +337,163 @@ class SupervisorService(BaseService):
             }
 
         """
+        installs = []
+        reconciles = []
+        supports_reconcile = self._supervisor_mgr.supports_reconcile()
         for plugin in plugins:
             _LOGGER.debug(f"[_install_plugins] dict_plugin: {plugin}")
-            plugin_domain_id = plugin["domain_id"]
-            plugin.update(params)
-            plugin["domain_id"] = plugin_domain_id
+            install_params = _make_install_params(plugin, params)
             # _LOGGER.debug(f'[_install_plugins] plugin_info: {dict_plugin}')
-            if not self._exist_plugin(plugin):
-                # _LOGGER.debug(f'[_install_plugins] params: {params}')
-                _LOGGER.debug(f"[_install_plugins] install_plugin: {plugin}")
-                self.install_plugin(plugin)
-                # _LOGGER.debug(f'[_install_plugins] installed: {params}')
-
-    def _delete_plugins(self, plugins, params):
-        """Delete plugins excluding plugins"""
-        labels = [f'spaceone.supervisor.name={params["name"]}']
-        current_plugins = self._supervisor_mgr.list_plugins_by_label(labels)
+            local_plugins = self._find_local_plugins(install_params)
+            if local_plugins.get("unlisted_hosts"):
+                # plugin may be running at target which was never listed
+                _LOGGER.debug(f"[_install_plugins] unlisted hosts: {plugin}")
+                continue
+            if local_plugins["total_count"] == 0:
+                installs.append(install_params)
+            elif supports_reconcile and not _is_unknown(local_plugins):
+                reconciles.append((local_plugins["results"], install_params))
+
+        # new plugins first, which can fit in capacity
+        for install_params in self._admit_plugins(installs):
+            if self._is_deferred("install", install_params["plugin_id"]):
+                continue
+            # _LOGGER.debug(f'[_install_plugins] params: {params}')
+            _LOGGER.debug(f"[_install_plugins] install_plugin: {install_params}")
+            try:
+                # admitted by batch already, not checked again for each plugin
+                plugin_info = self.install_plugin(install_params, admitted=True)
+            except ERROR_INSUFFICIENT_CAPACITY as e:
+                self._reject(install_params["plugin_id"], e.message)
+                continue
+            if plugin_info and plugin_info.state == "ACTIVE":
+                self._publish_soon(params)
+            # _LOGGER.debug(f'[_install_plugins] installed: {params}')
+
+        for local_plugins, install_params in reconciles:
+            if self._is_deferred("reconcile", install_params["plugin_id"]):
+                continue
+            self._reconcile_plugins(local_plugins, install_params)
+
+    def _admit_plugins(self, installs: list) -> list:
+        """Check capacity for every new plugin, before any of them is created
+
+        Returns: admitted install params, in install order
+        """
+        if len(installs) == 0:
+            return []
+        plans = []
+        for index, install_params in enumerate(installs):
+            try:
+                plugin_info = self._supervisor_mgr.get_plugin_from_repository(
+                    install_params["plugin_id"],
+                    install_params["domain_id"],
+                    token=self._get_token(),
+                    deadline=self._deadline,
+                )
+            except Exception as e:
+                _LOGGER.error(f"[_admit_plugins] failed to get plugin info: {e}")
+                self._deferred.append(f'install:{install_params["plugin_id"]}')
+                continue
+            plans.append((index, _make_plugin_labels(install_params, plugin_info)))
+
+        admitted, rejected = self._supervisor_mgr.admit_plugins(
+            plans, installs[0]["name"]
+        )
+        for index, reason in rejected.items():
+            self._reject(installs[index]["plugin_id"], reason)
+        return [installs[index] for index in admitted]
+
+    def _reject(self, plugin_id, reason):
+        _LOGGER.error(f"[_install_plugins] reject {plugin_id}: {reason}")
+        self._rejected.append(plugin_id)
+
+    def _apply_idle_policy(self, params, is_target=None):
+        """Scale unused plugins to zero, Service and port are kept"""
+        plugins = self.discover_plugins(params["name"], params["domain_id"])["results"]
+        if is_target is not None:
+            plugins = [plugin for plugin in plugins if is_target(plugin.plugin_id)]
+        scaled = self._supervisor_mgr.apply_idle_policy(plugins)
+        for plugin in scaled:
+            _LOGGER.debug(f"[_apply_idle_policy] scale to zero: {plugin.name}")
+
+    @check_required(["name", "plugin_id", "version", "hostname", "domain_id"])
+    def wake_plugin(self, params: dict):
+        """Wake up idle plugin, when plugin service indicates demand
+
+        Args:
+            params (dict): {
+              'name': str,
+              'plugin_id': str,
+              'version': str,
+              'hostname': str,
+              'domain_id': str
+            }
+
+        Returns: True if plugin is woken up
+        """
+        local_plugins = self._find_local_plugins(params)
+        woken = self._supervisor_mgr.wake_plugins(local_plugins["results"])
+        return len(woken) > 0
+
+    def _delete_plugins(self, plugins, params, is_target=None):
+        """Delete plugins excluding plugins
+
+        If is_target is given, only local plugins whose is_target(plugin_id) are candidates.
+        """
+        current_plugins = self.discover_plugins(params["name"], params["domain_id"])
+        unknown_hosts = current_plugins.get("unknown_hosts", [])
         for current_plugin in current_plugins["results"]:
+            if is_target is not None and not is_target(current_plugin.plugin_id):
+                continue
+            if current_plugin.host in unknown_hosts:
+                # last known plugin of unreachable host, it may be still running
+                continue
             if _is_members(current_plugin, plugins) is False:
+                if self._is_deferred("delete", current_plugin.plugin_id):
+                    continue
                 # _LOGGER.debug(f'[_delete_plugins] delete plugin: {current_plugin}')
-                # Delete current_plugin
-                delete_params = {
-                    "plugin_id": current_plugin["plugin_id"],
-                    "version": current_plugin["version"],
-                }
-                self.delete_plugin(delete_params)
+                # Delete current_plugin only, same plugin_id and version may run for other identities
+                self._supervisor_mgr.delete_plugins([current_plugin])
             else:
                 _LOGGER.debug(f"[_delete_plugins] member plugin: {current_plugin}")
 
-    def _exist_plugin(self, plugin):
+    def _find_local_plugins(self, plugin, include_unready=False):
         """Find plugin at local"""
         labels = [
             f'spaceone.supervisor.name={plugin["name"]}',
+            f'spaceone.supervisor.domain_id={plugin["domain_id"]}',
             f'spaceone.supervisor.plugin_id={plugin["plugin_id"]}',
             f'spaceone.supervisor.plugin.version={plugin["version"]}',
         ]
-        plugins = self._supervisor_mgr.list_plugins_by_label(labels)
-        # _LOGGER.debug(f'[_exist_plugin]\n {labels}\n{plugins}')
-        if plugins["total_count"] > 0:
-            return True
-        return False
+        plugins = self._supervisor_mgr.list_plugins_by_label(labels, include_unready)
+        # _LOGGER.debug(f'[_find_local_plugins]\n {labels}\n{plugins}')
+        if "owner_domain_id" in plugin:
+            plugins = _filter_owned(plugins, plugin["owner_domain_id"])
+        return plugins
+
+    def _reconcile_plugins(self, local_plugins: list, params: dict):
+        """Apply config changes (replicas, resources, env, nodeSelector, image) in place"""
+        try:
+            plugin_info = self._supervisor_mgr.get_plugin_from_repository(
+                params["plugin_id"],
+                params["domain_id"],
+                token=self._get_token(),
+                deadline=self._deadline,
+            )
+            image_uri = _get_image_uri(plugin_info, params["version"])
+            patched_count = self._supervisor_mgr.reconcile_plugins(
+                local_plugins, image_uri
+            )
+            if patched_count > 0:
+                _LOGGER.debug(
+                    f'[_reconcile_plugins] {params["plugin_id"]}: patched {patched_count}'
+                )
+        except Exception as e:
+            _LOGGER.error(f"[_reconcile_plugins] failed to reconcile: {e}")
 
     @check_required(["name", "plugin_id", "version", "hostname", "domain_id"])
-    def install_plugin(self, params: dict):
+    def install_plugin(self, params: dict, admitted=False):
         """Install Plugin based on params
 
         Args:
@@ -232,39 +502,59 @@ class SupervisorService(BaseService):
               - plugin_id: plugin ID
               - version
               - hostname : for updating plugin endpoint
+              - slot(optional): replica slot, plugin name is derived from it
+            admitted: capacity is checked by _admit_plugins, direct call is checked here
 
         image is real uri from repository service, since we maintain multiple docker repository
+        Concurrent install of same plugin shares one in-flight install.
         """
+        key = (
+            params["domain_id"],
+            params["name"],
+            params["plugin_id"],
+            params["version"],
+        )
+        return _INSTALL_FLIGHT.do(key, self._install_plugin, params, admitted)
+
+    def _install_plugin(self, params: dict, admitted=False):
         # Find detailed plugin information
         plugin_id = params["plugin_id"]
         version = params["version"]
         domain_id = params["domain_id"]
         plugin_info = self._supervisor_mgr.get_plugin_from_repository(
-            plugin_id, domain_id
+            plugin_id, domain_id, token=self._get_token(), deadline=self._deadline
         )
         # _LOGGER.debug(f'[install_plugin] plugin_info: {plugin_info}')
         # - image_uri
         # based on image, version, contact to repository API
-        image_uri = "%s/%s:%s" % (
-            plugin_info["registry_url"],
-            plugin_info["image"],
-            version,
-        )
+        image_uri = _get_image_uri(plugin_info, version)
 
         registry_config = plugin_info["registry_config"]
 
-        labels = {
-            "spaceone.supervisor.name": params["name"],
-            "spaceone.supervisor.plugin_id": params["plugin_id"],
-            "spaceone.supervisor.domain_id": params["domain_id"],
-            # 'spaceone.supervisor.plugin.plugin_name': plugin_info.name,
-            "spaceone.supervisor.plugin.image": plugin_info["image"],
-            "spaceone.supervisor.plugin.version": params["version"],
-            "spaceone.supervisor.plugin.resource_type": plugin_info["resource_type"],
-        }
-
-        # Determine port mapping
-        host_port = self._supervisor_mgr.find_host_port()
+        labels = _make_plugin_labels(params, plugin_info)
+        slot = params.get("slot", 0)
+
+        # Fail fast before any object is created, if plugin can not be scheduled
+        if not admitted:
+            self._supervisor_mgr.admit_plugin(labels, params["name"])
+
+        # Determine backend host and port mapping
+        hostname = params["hostname"]
+        host = self._supervisor_mgr.select_host(labels)
+        if host:
+            labels["spaceone.supervisor.plugin.host"] = host["name"]
+            hostname = host.get("hostname", hostname)
+
+        # container name(Retried or concurrent install gets same name)
+        name = _create_plugin_name(
+            params["name"],
+            params.get("owner_domain_id", domain_id),
+            domain_id,
+            plugin_id,
+            version,
+            slot,
+        )
+        host_port = self._supervisor_mgr.find_host_port(host, name, params["name"])
         _LOGGER.debug("Choose Host Port: %d" % host_port)
 
         # ports(dict)
@@ -274,17 +564,20 @@ class SupervisorService(BaseService):
         target_port = 50051
         ports = {"HostPort": host_port, "TargetPort": target_port}
 
-        # container name(This will reduce duplicated container)
-        name = f"{plugin_id}-{_create_unique_name()}"
-        # Update plugin endpoint
-        endpoint = self._supervisor_mgr.get_plugin_endpoint(
-            name, params["hostname"], host_port
-        )
-        labels.update({"spaceone.supervisor.plugin.endpoint": endpoint})
+        try:
+            # Update plugin endpoint
+            endpoint = self._supervisor_mgr.get_plugin_endpoint(
+                name, hostname, host_port
+            )
+            labels.update({"spaceone.supervisor.plugin.endpoint": endpoint})
 
-        result_data = self._supervisor_mgr.install_plugin(
-            image_uri, labels, ports, name, registry_config
-        )
+            result_data = self._supervisor_mgr.install_plugin(
+                image_uri, labels, ports, name, registry_config, deadline=self._deadline
+            )
+        except Exception:
+            # reserved port is not left behind, if install fails before it runs
+            self._supervisor_mgr.release_port(name)
+            raise
         # _LOGGER.debug(f'[install_plugin] installed plugin info: {result_data}')
         # update endpoint
         return result_data
@@ -296,18 +589,27 @@ class SupervisorService(BaseService):
         Args:
             params(dict) = {
                 'plugin_id': 'str',
-                'version': 'str'
+                'version': 'str',
+                'name': 'str' (optional, name of supervisor),
+                'domain_id': 'str' (optional, domain of plugin)
             }
 
         """
         result_data = self._supervisor_mgr.delete_plugin(
-            params["plugin_id"], params["version"]
+            params["plugin_id"],
+            params["version"],
+            params.get("name"),
+            params.get("domain_id"),
         )
         # _LOGGER.debug(f'[delete_plugin] result: {result_data}')
         return result_data
 
-    def discover_plugins(self, name: str) -> dict:
-        """Discover plugins
+    def discover_plugins(self, name: str, domain_id: str) -> dict:
+        """Discover plugins of supervisor identity (name, domain_id)
+
+        Plugins may belong to other domains (public supervisor),
+        so domain_id is matched with owner label, not with domain of plugin.
+
         Returns:
             plugins (dict): {
                 'total_count': int,
@@ -317,7 +619,40 @@ class SupervisorService(BaseService):
         label = [f"spaceone.supervisor.name={name}"]
         # _LOGGER.debug(f'[discover_plugins] label: {label}')
         plugins = self._supervisor_mgr.list_plugins_by_label(label)
-        return plugins
+        return _filter_owned(plugins, domain_id)
+
+    def _is_deferred(self, action, target) -> bool:
+        """Defer work to next sync, if budget of this sync is spent"""
+        if not self._deadline.expired():
+            return False
+        self._deferred.append(f"{action}:{target}")
+        return True
+
+    def _log_summary(self, name):
+        elapsed = self._deadline.elapsed()
+        stats = _INSTALL_FLIGHT.stats()
+        executed = stats["executed"] - self._install_stats["executed"]
+        collapsed = stats["collapsed"] - self._install_stats["collapsed"]
+        if collapsed:
+            _LOGGER.info(
+                f"[sync_plugins] {name}: {collapsed} of {executed + collapsed}"
+                f" installs joined in-flight install"
+            )
+        if self._rejected:
+            _LOGGER.error(
+                f"[sync_plugins] {name}: rejected by capacity: {self._rejected}"
+            )
+        if self._deferred:
+            _LOGGER.warning(
+                f"[sync_plugins] {name}: budget is spent in {elapsed:.1f}s,"
+                f" deferred to next sync: {self._deferred}"
+            )
+        else:
+            _LOGGER.debug(f"[sync_plugins] {name}: finished in {elapsed:.1f}s")
+
+    def _get_token(self):
+        """Token of supervisor identity in transaction, TOKEN if not given"""
+        return self.transaction.get_meta("token") or config.get_global("TOKEN")
 
     @staticmethod
     def _get_lock(domain_id, name):
@@ -347,9 +682,20 @@ class SupervisorService(BaseService):
             return False
 
 
-def _is_members(plugin_info, plugins_vo):
-    plugin_id = plugin_info["plugin_id"]
-    version = plugin_info["version"]
+def _make_target_filter(plugin_ids, is_owner):
+    """
+    Returns: function(plugin_id) -> bool, None if every plugin is target
+    """
+    if plugin_ids is None:
+        return is_owner
+    if is_owner is None:
+        return lambda plugin_id: plugin_id in plugin_ids
+    return lambda plugin_id: plugin_id in plugin_ids and is_owner(plugin_id)
+
+
+def _is_members(plugin_info: PluginRecord, plugins_vo):
+    plugin_id = plugin_info.plugin_id
+    version = plugin_info.version
 
     for plugin in plugins_vo:
         if plugin.get("plugin_id") == plugin_id and plugin.get("version") == version:
@@ -357,10 +703,105 @@ def _is_members(plugin_info, plugins_vo):
     return False
 
 
-def _create_unique_name():
-    """Create random unique id for endpoint"""
-    hashids = Hashids(salt="_create_unique_name", alphabet="qwertyuioplkjhgfdsazxcvbnm")
-    utcnow = datetime.utcnow()
-    return hashids.encode(
-        utcnow.year, utcnow.month, utcnow.day, utcnow.hour, utcnow.minute, utcnow.second
+def _get_idle_publish_state():
+    idle_conf = config.get_global("IDLE_POLICY", {})
+    return idle_conf.get("publish_state", "PROVISIONING")
+
+
+def _get_publish_coalescer():
+    """Process-wide PublishCoalescer, None if INCREMENTAL_PUBLISH is disabled"""
+    global _PUBLISH_COALESCER
+    publish_conf = config.get_global("INCREMENTAL_PUBLISH", {})
+    if not publish_conf.get("enabled", False):
+        return None
+
+    with _PUBLISH_COALESCER_LOCK:
+        if _PUBLISH_COALESCER is None:
+            _PUBLISH_COALESCER = PublishCoalescer(publish_conf.get("window", 2))
+        return _PUBLISH_COALESCER
+
+
+def _get_image_uri(plugin_info: dict, version: str) -> str:
+    return "%s/%s:%s" % (
+        plugin_info["registry_url"],
+        plugin_info["image"],
+        version,
+    )
+
+
+def _make_plugin_labels(params: dict, plugin_info: dict) -> dict:
+    labels = {
+        "spaceone.supervisor.name": params["name"],
+        "spaceone.supervisor.plugin_id": params["plugin_id"],
+        "spaceone.supervisor.domain_id": params["domain_id"],
+        # 'spaceone.supervisor.plugin.plugin_name': plugin_info.name,
+        "spaceone.supervisor.plugin.image": plugin_info["image"],
+        "spaceone.supervisor.plugin.version": params["version"],
+        "spaceone.supervisor.plugin.resource_type": plugin_info["resource_type"],
+    }
+    labels[SLOT_LABEL] = str(params.get("slot", 0))
+    if "owner_domain_id" in params:
+        labels[OWNER_DOMAIN_LABEL] = params["owner_domain_id"]
+    return labels
+
+
+def _make_install_params(plugin: dict, params: dict) -> dict:
+    """Pick install params from plugin service response and sync params
+
+    plugin_id, version and domain_id come from plugin,
+    name, hostname and owner_domain_id (domain of supervisor) come from sync params.
+    """
+    return {
+        "name": params["name"],
+        "hostname": params["hostname"],
+        "plugin_id": plugin["plugin_id"],
+        "version": plugin["version"],
+        "domain_id": plugin["domain_id"],
+        "owner_domain_id": params["domain_id"],
+    }
+
+
+def _create_plugin_name(
+    supervisor_name, owner_domain_id, domain_id, plugin_id, version, slot=0
+):
+    """Deterministic name of plugin instance
+
+    Same (supervisor identity, domain of plugin, plugin_id, version, slot) always gets same name,
+    so get-or-create at backend turns retry into lookup.
+    Supervisors of same name in other domains get other names.
+    """
+    key = (
+        f"{supervisor_name}/{owner_domain_id}/{domain_id}/{plugin_id}/{version}/{slot}"
     )
+    key = key.encode()
+    digest = hashlib.blake2b(key, digest_size=6).digest()
+    return f"{plugin_id}-{_HASHIDS.encode(int.from_bytes(digest, 'big'))}"
+
+
+def _is_owned(plugin, owner_domain_id) -> bool:
+    """Plugin installed before owner label is kept by name only"""
+    return plugin.labels.get(OWNER_DOMAIN_LABEL, owner_domain_id) == owner_domain_id
+
+
+def _filter_owned(plugins: dict, owner_domain_id) -> dict:
+    """total_count may include plugins which are not in results (headless without endpoints)"""
+    results = [p for p in plugins["results"] if _is_owned(p, owner_domain_id)]
+    removed = len(plugins["results"]) - len(results)
+    return dict(plugins, results=results, total_count=plugins["total_count"] - removed)
+
+
+def _is_unknown(local_plugins: dict) -> bool:
+    """Some of local plugins are at unreachable host, their state is last known one
+
+    If unreachable host was never listed, any plugin may be there.
+    """
+    if local_plugins.get("unlisted_hosts"):
+        return True
+    unknown_hosts = local_plugins.get("unknown_hosts", [])
+    return any(plugin.host in unknown_hosts for plugin in local_plugins["results"])
+
+
+def _get_next_slot(plugins: list) -> int:
+    """Slot which is not used by plugins"""
+    slots = [int(plugin.labels.get(SLOT_LABEL, 0)) for plugin in plugins]
+    return max(slots, default=-1) + 1
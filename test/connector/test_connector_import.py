@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import unittest
+
+SRC_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "src")
+
+# importing connector package must not load SDK of container backends
+BACKEND_SDKS = ("docker", "kubernetes")
+
+# max milliseconds of cumulative import time (python -X importtime)
+MAX_IMPORT_TIME = 2000
+
+
+def _import_connector(*args):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([SRC_PATH, env.get("PYTHONPATH", "")])
+    script = (
+        "import sys\n"
+        "import spaceone.supervisor.connector\n"
+        f"print(','.join(m for m in {BACKEND_SDKS!r} if m in sys.modules))\n"
+    )
+    return subprocess.run(
+        [sys.executable, *args, "-c", script],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+
+class TestConnectorImport(unittest.TestCase):
+    def test_backend_sdk_is_not_imported(self):
+        result = _import_connector()
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_import_time(self):
+        result = _import_connector("-X", "importtime")
+        # import time: self [us] | cumulative | imported package
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[2] == "spaceone.supervisor.connector":
+                cumulative = int(fields[1]) / 1000
+                print(f"spaceone.supervisor.connector: {cumulative:.1f}ms")
+                self.assertLess(cumulative, MAX_IMPORT_TIME)
+                return
+        self.fail("spaceone.supervisor.connector is not in importtime output")
+
+
+if __name__ == "__main__":
+    unittest.main()
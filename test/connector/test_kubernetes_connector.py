@@ -0,0 +1,187 @@
+import unittest
+from types import SimpleNamespace
+
+from spaceone.supervisor.connector.kubernetes_connector import (
+    KubernetesConnector,
+    _normalize_resources,
+    _parse_cpu,
+    _parse_memory,
+    _parse_quantity,
+)
+
+
+class TestQuantity(unittest.TestCase):
+    def test_parse_memory(self):
+        self.assertEqual(_parse_memory("134217728"), 134217728)
+        self.assertEqual(_parse_memory("64Mi"), 64 * 2**20)
+        self.assertEqual(_parse_memory("1Gi"), 2**30)
+        self.assertEqual(_parse_memory("1G"), 10**9)
+        self.assertEqual(_parse_memory("500k"), 500 * 10**3)
+        self.assertEqual(_parse_memory("1Pi"), 2**50)
+        self.assertEqual(_parse_memory("2E"), 2 * 10**18)
+
+    def test_parse_milli_byte_memory(self):
+        # ResourceQuota reports memory in milli-bytes
+        self.assertAlmostEqual(_parse_memory("1288490188800m"), 1288490188.8)
+
+    def test_parse_cpu(self):
+        self.assertEqual(_parse_cpu("250m"), 250)
+        self.assertEqual(_parse_cpu("1"), 1000)
+        self.assertEqual(_parse_cpu("0.5"), 500)
+        self.assertEqual(_parse_cpu("12345678n"), 12.345678)
+        self.assertEqual(_parse_cpu("2500u"), 2.5)
+
+    def test_parse_quantity(self):
+        self.assertEqual(_parse_quantity("requests.cpu", "1"), 1000)
+        self.assertEqual(_parse_quantity("limits.memory", "1Ki"), 1024)
+        self.assertEqual(_parse_quantity("pods", 10), 10)
+        self.assertRaises(ValueError, _parse_quantity, "memory", "1Xi")
+
+    def test_normalize_resources(self):
+        self.assertEqual(
+            _normalize_resources({"limits": {"cpu": "1", "memory": "1Gi"}}),
+            _normalize_resources({"limits": {"cpu": "1000m", "memory": "1024Mi"}}),
+        )
+        self.assertEqual(_normalize_resources({"requests": None}), {})
+        self.assertEqual(_normalize_resources(None), {})
+
+
+LABELS = {
+    "spaceone.supervisor.name": "root",
+    "spaceone.supervisor.domain_id": "domain-root",
+    "spaceone.supervisor.plugin_id": "plugin-aws-ec2",
+    "spaceone.supervisor.plugin.version": "1.0",
+    "spaceone.supervisor.plugin.resource_type": "inventory.Collector",
+}
+IMAGE = "cloudforet/aws-ec2:1.0"
+
+
+def _make_connector(**conf):
+    connector = KubernetesConnector.__new__(KubernetesConnector)
+    connector.config = dict(conf, namespace="supervisor")
+    connector.namespace = "supervisor"
+    connector.node_selector = conf.get("nodeSelector", {})
+    connector.NUM_OF_REPLICAS = 1
+    return connector
+
+
+def _make_live_deployment(replicas=1, resources=None, node_selector=None):
+    container = {"name": "plugin", "image": IMAGE}
+    if resources:
+        container["resources"] = resources
+    pod_spec = {"containers": [container]}
+    if node_selector:
+        pod_spec["nodeSelector"] = node_selector
+    return {"spec": {"replicas": replicas, "template": {"spec": pod_spec}}}
+
+
+class TestDeploymentPatch(unittest.TestCase):
+    def test_up_to_date(self):
+        connector = _make_connector(resources={"limits": {"cpu": "1", "memory": "1Gi"}})
+        live = _make_live_deployment(
+            resources={"limits": {"cpu": "1000m", "memory": "1024Mi"}}
+        )
+        # same quantities in other notation
+        self.assertEqual(connector._get_deployment_patch(live, LABELS, IMAGE), [])
+
+    def test_replicas(self):
+        connector = _make_connector(replica={"inventory.Collector": 2})
+        live = _make_live_deployment(replicas=1)
+        self.assertEqual(
+            connector._get_deployment_patch(live, LABELS),
+            [{"op": "replace", "path": "/spec/replicas", "value": 2}],
+        )
+        # replicas of autoscaled Deployment are not touched
+        self.assertEqual(
+            connector._get_deployment_patch(live, LABELS, autoscaled=True), []
+        )
+
+    def test_image_and_env(self):
+        connector = _make_connector(env=[{"name": "LOG_LEVEL", "value": "DEBUG"}])
+        live = _make_live_deployment()
+        patch = connector._get_deployment_patch(live, LABELS, "cloudforet/aws-ec2:1.1")
+        self.assertEqual(
+            patch,
+            [
+                {
+                    "op": "add",
+                    "path": "/spec/template/spec/containers/0/env",
+                    "value": [{"name": "LOG_LEVEL", "value": "DEBUG"}],
+                },
+                {
+                    "op": "add",
+                    "path": "/spec/template/spec/containers/0/image",
+                    "value": "cloudforet/aws-ec2:1.1",
+                },
+            ],
+        )
+
+    def test_removed_config(self):
+        connector = _make_connector()
+        live = _make_live_deployment(
+            resources={"limits": {"cpu": "1"}}, node_selector={"pool": "plugin"}
+        )
+        self.assertEqual(
+            connector._get_deployment_patch(live, LABELS),
+            [
+                {"op": "remove", "path": "/spec/template/spec/nodeSelector"},
+                {"op": "remove", "path": "/spec/template/spec/containers/0/resources"},
+            ],
+        )
+
+
+def _make_pod(name, replica_set, reason=None):
+    state = SimpleNamespace(waiting=SimpleNamespace(reason=reason) if reason else None)
+    return SimpleNamespace(
+        metadata=SimpleNamespace(
+            name=name,
+            owner_references=[SimpleNamespace(kind="ReplicaSet", name=replica_set)],
+        ),
+        status=SimpleNamespace(container_statuses=[SimpleNamespace(state=state)]),
+    )
+
+
+class Api(object):
+    """AppsV1Api and CoreV1Api of one Deployment, which is rolling out"""
+
+    def __init__(self, pods):
+        self.pods = pods
+
+    def read_namespaced_deployment(self, name, namespace):
+        return SimpleNamespace(
+            metadata=SimpleNamespace(name=name, annotations={}),
+            spec=SimpleNamespace(replicas=1),
+            status=SimpleNamespace(
+                available_replicas=None, ready_replicas=None, conditions=[]
+            ),
+        )
+
+    def list_namespaced_pod(self, namespace, label_selector=None):
+        return SimpleNamespace(items=self.pods)
+
+
+class TestRolloutState(unittest.TestCase):
+    def _get_rollout_state(self, pods):
+        connector = _make_connector()
+        connector.apps_v1 = connector.core_v1 = Api(pods)
+        return connector._get_rollout_state("plugin-new")
+
+    def test_crash_of_old_slot(self):
+        pods = [
+            _make_pod("plugin-old-5d9f-x1", "plugin-old-5d9f", "CrashLoopBackOff"),
+            _make_pod("plugin-new-7c4b-y1", "plugin-new-7c4b"),
+        ]
+        # pods of other Deployment are not counted
+        self.assertEqual(self._get_rollout_state(pods), "PROVISIONING")
+
+    def test_crash_of_new_slot(self):
+        pods = [_make_pod("plugin-new-7c4b-y1", "plugin-new-7c4b", "ErrImagePull")]
+        self.assertEqual(self._get_rollout_state(pods), "ERROR")
+
+    def test_slot_label(self):
+        labels = dict(LABELS, **{"spaceone.supervisor.plugin.slot": "1"})
+        self.assertEqual(KubernetesConnector._get_k8s_label(labels)["slot"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
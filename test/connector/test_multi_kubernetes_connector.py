@@ -0,0 +1,126 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from spaceone.supervisor.connector.multi_kubernetes_connector import (
+    MultiKubernetesConnector,
+)
+from spaceone.supervisor.error.supervisor import ERROR_NO_AVAILABLE_HOST
+from spaceone.supervisor.lib.label_index import LabelIndex
+from spaceone.supervisor.model.plugin_record import PluginRecord
+
+
+class TargetConnector(object):
+    """KubernetesConnector of one target, which searches its label index"""
+
+    def __init__(self, plugin_ids=None, reachable=True):
+        self._label_index = LabelIndex()
+        self.reachable = reachable
+        if plugin_ids is not None:
+            self._label_index.replace(
+                [
+                    (plugin_id, _make_plugin(plugin_id), _make_labels(plugin_id))
+                    for plugin_id in plugin_ids
+                ]
+            )
+
+    def search(self, filters):
+        if not self.reachable:
+            raise ConnectionError("unreachable")
+        results = self._label_index.query(filters.get("label", []))
+        return {"results": results, "total_count": len(results)}
+
+
+def _make_labels(plugin_id):
+    return {
+        "spaceone.supervisor.name": "root",
+        "spaceone.supervisor.plugin_id": plugin_id,
+    }
+
+
+def _make_plugin(plugin_id):
+    return PluginRecord.from_labels(
+        _make_labels(plugin_id), name=plugin_id, state="ACTIVE"
+    )
+
+
+def _make_connector(targets, placement="least_loaded", max_plugins=None):
+    connector = MultiKubernetesConnector.__new__(MultiKubernetesConnector)
+    connector.placement = placement
+    connector.targets = targets
+    connector.hosts = {
+        name: {"name": name, "hostname": f"{name}.local", "affinity": {}}
+        for name in targets
+    }
+    if max_plugins is not None:
+        for host in connector.hosts.values():
+            host["max_plugins"] = max_plugins
+    connector._executor = ThreadPoolExecutor(max_workers=len(targets))
+    return connector
+
+
+class TestMultiKubernetesConnector(unittest.TestCase):
+    def test_search_with_unreachable_target(self):
+        connector = _make_connector(
+            {
+                "cluster-a": TargetConnector(["plugin-a"]),
+                "cluster-b": TargetConnector(["plugin-b"], reachable=False),
+            }
+        )
+        result = connector.search({"label": ["spaceone.supervisor.name=root"]})
+
+        # last known plugins of unreachable target
+        hosts = sorted((p.plugin_id, p.host) for p in result["results"])
+        self.assertEqual(hosts, [("plugin-a", "cluster-a"), ("plugin-b", "cluster-b")])
+        self.assertEqual(result["unknown_hosts"], ["cluster-b"])
+        self.assertEqual(result["unlisted_hosts"], [])
+
+    def test_search_with_unlisted_target(self):
+        connector = _make_connector(
+            {
+                "cluster-a": TargetConnector(["plugin-a"]),
+                "cluster-b": TargetConnector(reachable=False),
+            }
+        )
+        result = connector.search({"label": []})
+
+        # partial results of healthy targets
+        self.assertEqual([p.plugin_id for p in result["results"]], ["plugin-a"])
+        self.assertEqual(result["unknown_hosts"], ["cluster-b"])
+        self.assertEqual(result["unlisted_hosts"], ["cluster-b"])
+
+    def test_select_host_least_loaded(self):
+        connector = _make_connector(
+            {
+                "cluster-a": TargetConnector(["plugin-a", "plugin-b"]),
+                "cluster-b": TargetConnector(["plugin-c"]),
+            },
+            max_plugins=3,
+        )
+        self.assertEqual(connector.select_host({})["name"], "cluster-b")
+
+    def test_select_host_bin_packing(self):
+        connector = _make_connector(
+            {
+                "cluster-a": TargetConnector(["plugin-a", "plugin-b"]),
+                "cluster-b": TargetConnector(["plugin-c"]),
+            },
+            placement="bin_packing",
+            max_plugins=3,
+        )
+        self.assertEqual(connector.select_host({})["name"], "cluster-a")
+
+    def test_select_host_skips_unlisted_target(self):
+        connector = _make_connector(
+            {"cluster-a": TargetConnector(["plugin-a"]), "cluster-b": TargetConnector()}
+        )
+        self.assertEqual(connector.select_host({})["name"], "cluster-a")
+
+    def test_no_available_host(self):
+        connector = _make_connector(
+            {"cluster-a": TargetConnector(["plugin-a"])}, max_plugins=1
+        )
+        self.assertRaises(ERROR_NO_AVAILABLE_HOST, connector.select_host, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import time
+import unittest
+
+from spaceone.supervisor.lib.deadline import Deadline
+
+
+class TestDeadline(unittest.TestCase):
+    def test_unlimited(self):
+        deadline = Deadline()
+        self.assertEqual(deadline.remaining(), float("inf"))
+        self.assertFalse(deadline.expired())
+        self.assertIs(deadline.limit(None), deadline)
+
+    def test_expired(self):
+        deadline = Deadline(0)
+        self.assertEqual(deadline.remaining(), 0)
+        self.assertTrue(deadline.expired())
+        # no sleep at expired deadline
+        started_at = time.monotonic()
+        self.assertFalse(deadline.sleep(10))
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_sleep_up_to_remaining(self):
+        deadline = Deadline(0.05)
+        started_at = time.monotonic()
+        self.assertFalse(deadline.sleep(10))
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_sleep(self):
+        self.assertTrue(Deadline(10).sleep(0.01))
+
+    def test_limit_of_unlimited(self):
+        deadline = Deadline()
+        sub = deadline.limit(30)
+        self.assertIsNot(sub, deadline)
+        self.assertLessEqual(sub.remaining(), 30)
+
+    def test_limit_is_shorter(self):
+        deadline = Deadline(60)
+        sub = deadline.limit(5)
+        self.assertIsNot(sub, deadline)
+        self.assertLessEqual(sub.remaining(), 5)
+
+    def test_limit_is_not_later(self):
+        # sub task can not outlive sync pass
+        deadline = Deadline(5)
+        self.assertIs(deadline.limit(60), deadline)
+        self.assertIs(deadline.limit(None), deadline)
+
+
+if __name__ == "__main__":
+    unittest.main()
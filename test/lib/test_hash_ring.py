@@ -0,0 +1,50 @@
+import unittest
+
+from spaceone.supervisor.lib.hash_ring import HashRing
+
+PLUGIN_IDS = [f"plugin-{i:04d}" for i in range(1000)]
+
+
+def _owners(ring):
+    return {plugin_id: ring.get(plugin_id) for plugin_id in PLUGIN_IDS}
+
+
+class TestHashRing(unittest.TestCase):
+    def test_empty_ring(self):
+        self.assertIsNone(HashRing([]).get("plugin-0001"))
+
+    def test_single_member_owns_every_key(self):
+        ring = HashRing(["pod-a"])
+        self.assertEqual(set(_owners(ring).values()), {"pod-a"})
+
+    def test_ownership_is_stable(self):
+        # members are sorted and deduplicated, order does not matter
+        ring = HashRing(["pod-b", "pod-a", "pod-a"])
+        self.assertEqual(ring.members, ["pod-a", "pod-b"])
+        self.assertEqual(_owners(ring), _owners(HashRing(["pod-a", "pod-b"])))
+
+    def test_keys_are_balanced(self):
+        ring = HashRing(["pod-a", "pod-b", "pod-c"])
+        owners = list(_owners(ring).values())
+        for member in ring.members:
+            self.assertGreater(owners.count(member), len(PLUGIN_IDS) / 6)
+
+    def test_rebalance_on_join(self):
+        before = _owners(HashRing(["pod-a", "pod-b", "pod-c"]))
+        after = _owners(HashRing(["pod-a", "pod-b", "pod-c", "pod-d"]))
+        moved = [key for key in PLUGIN_IDS if before[key] != after[key]]
+        # only keys taken by new member move, about 1/4 of them
+        self.assertTrue(all(after[key] == "pod-d" for key in moved))
+        self.assertLess(len(moved), len(PLUGIN_IDS) / 2)
+
+    def test_rebalance_on_leave(self):
+        before = _owners(HashRing(["pod-a", "pod-b", "pod-c"]))
+        after = _owners(HashRing(["pod-a", "pod-b"]))
+        for key in PLUGIN_IDS:
+            if before[key] != "pod-c":
+                self.assertEqual(after[key], before[key])
+            self.assertIn(after[key], ["pod-a", "pod-b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from spaceone.supervisor.lib.label_index import LabelIndex
+
+
+def _make_labels(name, plugin_id, version="1.0"):
+    return {
+        "spaceone.supervisor.name": name,
+        "spaceone.supervisor.plugin_id": plugin_id,
+        "spaceone.supervisor.plugin.version": version,
+    }
+
+
+class TestLabelIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = LabelIndex()
+        self.index.add("c1", "plugin-a@root", _make_labels("root", "plugin-a"))
+        self.index.add("c2", "plugin-b@root", _make_labels("root", "plugin-b"))
+        self.index.add("c3", "plugin-a@dev", _make_labels("dev", "plugin-a", "2.0"))
+
+    def _query(self, *label):
+        return sorted(self.index.query(list(label)))
+
+    def test_query_every_plugin(self):
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(len(self._query()), 3)
+
+    def test_query_intersection(self):
+        self.assertEqual(
+            self._query("spaceone.supervisor.name=root"),
+            ["plugin-a@root", "plugin-b@root"],
+        )
+        self.assertEqual(
+            self._query(
+                "spaceone.supervisor.name=root",
+                "spaceone.supervisor.plugin_id=plugin-a",
+            ),
+            ["plugin-a@root"],
+        )
+
+    def test_query_without_match(self):
+        self.assertEqual(self._query("spaceone.supervisor.name=other"), [])
+        self.assertEqual(
+            self._query(
+                "spaceone.supervisor.name=dev", "spaceone.supervisor.plugin_id=plugin-b"
+            ),
+            [],
+        )
+
+    def test_label_value_with_equal_sign(self):
+        self.index.add("c4", "plugin-c", {"spaceone.supervisor.tag": "a=b"})
+        self.assertEqual(self._query("spaceone.supervisor.tag=a=b"), ["plugin-c"])
+
+    def test_update_labels(self):
+        # re-added key is indexed by its new labels only
+        self.index.add("c1", "plugin-a@root", _make_labels("root", "plugin-a", "2.0"))
+        self.assertEqual(
+            self._query("spaceone.supervisor.plugin.version=2.0"),
+            ["plugin-a@dev", "plugin-a@root"],
+        )
+        self.assertEqual(
+            self._query("spaceone.supervisor.plugin.version=1.0"), ["plugin-b@root"]
+        )
+
+    def test_remove(self):
+        self.index.remove("c1")
+        self.index.remove("unknown")
+        self.assertIsNone(self.index.get("c1"))
+        self.assertEqual(
+            self._query("spaceone.supervisor.plugin_id=plugin-a"), ["plugin-a@dev"]
+        )
+
+    def test_replace(self):
+        self.assertTrue(LabelIndex().is_stale(60))
+        self.index.replace([("c9", "plugin-z", _make_labels("root", "plugin-z"))])
+        self.assertEqual(self._query("spaceone.supervisor.name=root"), ["plugin-z"])
+        self.assertFalse(self.index.is_stale(60))
+
+    def test_replace_with_age(self):
+        # restored inventory is as old as it was listed
+        self.index.replace([], age=120)
+        self.assertTrue(self.index.is_stale(60))
+
+
+if __name__ == "__main__":
+    unittest.main()
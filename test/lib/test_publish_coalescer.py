@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from spaceone.supervisor.lib.publish_coalescer import PublishCoalescer
+
+
+class Publisher(object):
+    def __init__(self):
+        self.published = []
+        self.done = threading.Event()
+
+    def publish(self, snapshot):
+        def callback():
+            self.published.append(snapshot)
+            self.done.set()
+
+        return callback
+
+
+class TestPublishCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.coalescer = PublishCoalescer(window=0.1)
+        self.publisher = Publisher()
+
+    def test_requests_within_window_are_merged(self):
+        for snapshot in ("plugin-a", "plugin-a,b", "plugin-a,b,c"):
+            self.coalescer.request("root", self.publisher.publish(snapshot))
+
+        self.assertTrue(self.publisher.done.wait(5))
+        # latest snapshot is published once
+        self.assertEqual(self.publisher.published, ["plugin-a,b,c"])
+        self.assertEqual(self.coalescer.requested, 3)
+        self.assertEqual(self.coalescer.published, 1)
+
+    def test_keys_are_published_separately(self):
+        other = Publisher()
+        self.coalescer.request("root", self.publisher.publish("root"))
+        self.coalescer.request("dev", other.publish("dev"))
+
+        self.assertTrue(self.publisher.done.wait(5))
+        self.assertTrue(other.done.wait(5))
+        self.assertEqual(self.publisher.published, ["root"])
+        self.assertEqual(other.published, ["dev"])
+
+    def test_next_window_after_publish(self):
+        self.coalescer.request("root", self.publisher.publish("first"))
+        self.assertTrue(self.publisher.done.wait(5))
+        self.publisher.done.clear()
+
+        self.coalescer.request("root", self.publisher.publish("second"))
+        self.assertTrue(self.publisher.done.wait(5))
+        self.assertEqual(self.publisher.published, ["first", "second"])
+
+    def test_cancel(self):
+        self.coalescer.request("root", self.publisher.publish("plugin-a"))
+        self.coalescer.cancel("root")
+        self.coalescer.cancel("unknown")
+
+        self.assertFalse(self.publisher.done.wait(0.3))
+        self.assertEqual(self.coalescer.published, 0)
+
+    def test_failed_callback(self):
+        def fail():
+            raise ConnectionError("unavailable")
+
+        self.coalescer.request("root", fail)
+        self.coalescer.request("dev", self.publisher.publish("dev"))
+        self.assertTrue(self.publisher.done.wait(5))
+        self.assertEqual(self.publisher.published, ["dev"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+
+from spaceone.supervisor.lib.rate_limiter import (
+    HIGH,
+    LOW,
+    NORMAL,
+    RateLimitedProxy,
+    RateLimiter,
+)
+
+
+class Api(object):
+    def __init__(self):
+        self.version = "v1"
+
+    def create_pod(self):
+        return "created"
+
+    def close(self):
+        return "closed"
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst(self):
+        limiter = RateLimiter(qps=1, burst=3)
+        started_at = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertEqual(limiter.stats()["normal"]["count"], 3)
+
+    def test_refill_at_qps(self):
+        limiter = RateLimiter(qps=20, burst=1)
+        started_at = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        # 2 tokens are refilled in 0.1s
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.09)
+
+    def test_disabled(self):
+        limiter = RateLimiter(qps=0, burst=1)
+        for _ in range(100):
+            limiter.acquire()
+        self.assertEqual(limiter.stats()["normal"]["count"], 0)
+
+    def test_priority_order(self):
+        limiter = RateLimiter(qps=5, burst=1)
+        limiter.acquire()
+        order = []
+
+        def acquire(priority):
+            limiter.acquire(priority)
+            order.append(priority)
+
+        threads = []
+        # polling arrives first, create/delete are served before it
+        for priority in (LOW, NORMAL, HIGH):
+            thread = threading.Thread(target=acquire, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(order, [HIGH, NORMAL, LOW])
+        stats = limiter.stats()
+        self.assertGreater(stats["low"]["max_wait"], stats["high"]["max_wait"])
+
+
+class TestRateLimitedProxy(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(qps=10, burst=10)
+        priorities = {"create_pod": HIGH, "close": None}
+        self.api = RateLimitedProxy(Api(), self.limiter, priorities.get)
+
+    def test_limited_call(self):
+        self.assertEqual(self.api.create_pod(), "created")
+        self.assertEqual(self.limiter.stats()["high"]["count"], 1)
+
+    def test_not_limited(self):
+        self.assertEqual(self.api.close(), "closed")
+        self.assertEqual(self.api.version, "v1")
+        self.assertEqual(
+            sum(stat["count"] for stat in self.limiter.stats().values()), 0
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+
+from spaceone.supervisor.lib import readiness_stats
+from spaceone.supervisor.lib.readiness_stats import ReadinessStats
+
+IMAGE = "cloudforet/aws-ec2:1.0"
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestReadinessStats(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(readiness_stats, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stats = ReadinessStats(half_life=100, min_samples=5)
+
+    def test_not_observed(self):
+        self.assertIsNone(self.stats.percentile(IMAGE, 0.95))
+        self.assertEqual(self.stats.count(IMAGE), 0)
+
+    def test_percentile(self):
+        for _ in range(19):
+            self.stats.observe(IMAGE, 10)
+        self.stats.observe(IMAGE, 100)
+
+        # 19 of 20 samples are at (8, 13] bucket
+        self.assertTrue(8 < self.stats.percentile(IMAGE, 0.5) <= 13)
+        self.assertTrue(8 < self.stats.percentile(IMAGE, 0.95) <= 13)
+        self.assertTrue(90 < self.stats.percentile(IMAGE, 1) <= 120)
+
+    def test_longer_than_last_bucket(self):
+        # counted in last bucket, so timeout is bounded
+        self.stats.observe(IMAGE, 3600)
+        self.assertTrue(1200 < self.stats.percentile(IMAGE, 0.95) <= 1800)
+
+    def test_decay(self):
+        for _ in range(10):
+            self.stats.observe(IMAGE, 10)
+        self.clock.now += 100
+        self.assertAlmostEqual(self.stats.count(IMAGE), 5)
+
+        # slower image build is learned, as old observations fade out
+        for _ in range(20):
+            self.stats.observe(IMAGE, 200)
+        self.assertTrue(180 < self.stats.percentile(IMAGE, 0.95) <= 240)
+
+    def test_wait_policy_defaults_until_min_samples(self):
+        for _ in range(4):
+            self.stats.observe(IMAGE, 10)
+        self.assertEqual(self.stats.get_wait_policy(IMAGE, 300, 10, 5), (300, 10, 5))
+
+    def test_wait_policy(self):
+        for _ in range(10):
+            self.stats.observe(IMAGE, 100)
+        timeout, initial_delay, interval = self.stats.get_wait_policy(IMAGE, 300, 10, 5)
+        # p95 * factor, p50 is about 100s
+        self.assertTrue(180 < timeout <= 240)
+        self.assertEqual(initial_delay, 10)
+        self.assertEqual(interval, 5)
+
+    def test_wait_policy_bounds(self):
+        for _ in range(10):
+            self.stats.observe(IMAGE, 1)
+        timeout, initial_delay, interval = self.stats.get_wait_policy(IMAGE, 300, 10, 5)
+        self.assertEqual(timeout, self.stats.min_timeout)
+        self.assertLessEqual(initial_delay, 0.5)
+        self.assertEqual(interval, 1)
+
+    def test_least_recently_used_image_is_dropped(self):
+        self.stats.max_images = 2
+        for image in ("image-a", "image-b", "image-c"):
+            self.stats.observe(image, 10)
+        self.assertEqual(list(self.stats.snapshot()), ["image-b", "image-c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import socket
+import unittest
+from unittest import mock
+
+import grpc
+from spaceone.core.error import ERROR_GRPC_CONNECTION, ERROR_NOT_FOUND
+
+from spaceone.supervisor.error.supervisor import ERROR_CIRCUIT_OPEN
+from spaceone.supervisor.lib import resilience
+from spaceone.supervisor.lib.deadline import Deadline
+from spaceone.supervisor.lib.resilience import (
+    CircuitBreaker,
+    call_with_retry,
+    is_transient,
+)
+
+
+class RpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+class Endpoint(object):
+    """Endpoint which raises given errors, then returns ok"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("plugin", failure_threshold=2, reset_timeout=30)
+
+    def test_open_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertGreater(self.breaker.retry_after(), 0)
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial(self):
+        self.breaker.reset_timeout = 0
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        # one trial call passes after reset_timeout
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_trial_success(self):
+        self.breaker.reset_timeout = 0
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial_failure(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.state = CircuitBreaker.HALF_OPEN
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class TestIsTransient(unittest.TestCase):
+    def test_transient(self):
+        self.assertTrue(is_transient(ERROR_GRPC_CONNECTION(channel="a", message="b")))
+        self.assertTrue(is_transient(RpcError(grpc.StatusCode.UNAVAILABLE)))
+        self.assertTrue(is_transient(RpcError(grpc.StatusCode.DEADLINE_EXCEEDED)))
+        self.assertTrue(is_transient(ConnectionResetError()))
+        self.assertTrue(is_transient(socket.timeout()))
+
+    def test_not_transient(self):
+        self.assertFalse(is_transient(ERROR_NOT_FOUND(key="plugin_id", value="a")))
+        self.assertFalse(is_transient(RpcError(grpc.StatusCode.INVALID_ARGUMENT)))
+        self.assertFalse(is_transient(grpc.RpcError()))
+        self.assertFalse(is_transient(ERROR_CIRCUIT_OPEN(endpoint="a", retry_after=1)))
+        self.assertFalse(is_transient(KeyError("image")))
+        self.assertFalse(is_transient(TypeError()))
+
+
+@mock.patch.dict(
+    resilience.RESILIENCE,
+    {"base_delay": 0, "max_retries": 2, "failure_threshold": 10},
+)
+class TestCallWithRetry(unittest.TestCase):
+    def setUp(self):
+        resilience._BREAKERS.clear()
+
+    def test_retry_transient_error(self):
+        endpoint = Endpoint(ConnectionError(), ConnectionError())
+        self.assertEqual(call_with_retry("repository", endpoint), "ok")
+        self.assertEqual(endpoint.calls, 3)
+
+    def test_max_retries(self):
+        endpoint = Endpoint(*[ConnectionError()] * 3)
+        self.assertRaises(ConnectionError, call_with_retry, "repository", endpoint)
+        self.assertEqual(endpoint.calls, 3)
+
+    def test_not_transient_error_is_not_retried(self):
+        endpoint = Endpoint(KeyError("image"))
+        self.assertRaises(KeyError, call_with_retry, "repository", endpoint)
+        self.assertEqual(endpoint.calls, 1)
+
+    def test_no_retry_after_deadline(self):
+        endpoint = Endpoint(ConnectionError())
+        deadline = Deadline(0)
+        self.assertRaises(
+            ConnectionError, call_with_retry, "repository", endpoint, deadline=deadline
+        )
+        self.assertEqual(endpoint.calls, 1)
+
+    @mock.patch.dict(resilience.RESILIENCE, {"failure_threshold": 2})
+    def test_fail_fast_at_open_circuit(self):
+        endpoint = Endpoint(ConnectionError(), ConnectionError())
+        self.assertRaises(ERROR_CIRCUIT_OPEN, call_with_retry, "plugin", endpoint)
+        # third attempt is not called
+        self.assertEqual(endpoint.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
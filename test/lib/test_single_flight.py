@@ -0,0 +1,71 @@
+import threading
+import unittest
+
+from spaceone.supervisor.lib.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def _install(self, result):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return result
+
+    def _run_concurrently(self, key, count):
+        results = []
+
+        def follow():
+            results.append(self.flight.do(key, self._install, "follower"))
+
+        leader = threading.Thread(
+            target=lambda: results.append(self.flight.do(key, self._install, "leader"))
+        )
+        leader.start()
+        self.started.wait(5)
+        followers = [threading.Thread(target=follow) for _ in range(count - 1)]
+        for thread in followers:
+            thread.start()
+        # followers are blocked on the leader's call
+        while self.flight.stats()["collapsed"] < count - 1:
+            threading.Event().wait(0.01)
+        self.release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        return results
+
+    def test_concurrent_calls_share_result(self):
+        results = self._run_concurrently("plugin-a", 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ["leader"] * 4)
+        self.assertEqual(
+            self.flight.stats(), {"executed": 1, "collapsed": 3, "in_flight": 0}
+        )
+
+    def test_key_is_forgotten_after_call(self):
+        self.release.set()
+        self.flight.do("plugin-a", self._install, 1)
+        self.flight.do("plugin-a", self._install, 2)
+        self.assertEqual(self.calls, 2)
+
+    def test_other_keys_are_not_collapsed(self):
+        self.release.set()
+        self.assertEqual(self.flight.do("plugin-a", self._install, "a"), "a")
+        self.assertEqual(self.flight.do("plugin-b", self._install, "b"), "b")
+        self.assertEqual(self.flight.stats()["collapsed"], 0)
+
+    def test_error_is_raised(self):
+        def fail():
+            raise ValueError("install failed")
+
+        self.assertRaises(ValueError, self.flight.do, "plugin-a", fail)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
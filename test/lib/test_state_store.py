@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from spaceone.supervisor.lib import state_store
+from spaceone.supervisor.lib.state_store import StateStore, get_owner, is_alive
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state.db")
+        self.store = StateStore(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reserve_port(self):
+        port = self.store.reserve_port("local", [50051, 50052], "plugin-a")
+        self.assertEqual(port, 50051)
+        # reserved port is skipped by others
+        port = self.store.reserve_port("local", [50051, 50052], "plugin-b")
+        self.assertEqual(port, 50052)
+        self.assertEqual(
+            self.store.list_reserved_ports("local"),
+            {50051: "plugin-a", 50052: "plugin-b"},
+        )
+
+    def test_retried_install_keeps_port(self):
+        self.store.reserve_port("local", [50051, 50052], "plugin-a")
+        port = self.store.reserve_port("local", [50051, 50052], "plugin-a")
+        self.assertEqual(port, 50051)
+
+    def test_no_free_port(self):
+        self.store.reserve_port("local", [50051], "plugin-a")
+        self.assertIsNone(self.store.reserve_port("local", [50051], "plugin-b"))
+
+    def test_ports_are_per_host(self):
+        self.store.reserve_port("host-a", [50051], "plugin-a")
+        port = self.store.reserve_port("host-b", [50051], "plugin-b")
+        self.assertEqual(port, 50051)
+
+    def test_release_port(self):
+        self.store.reserve_port("local", [50051], "plugin-a")
+        self.store.release_port("plugin-a")
+        port = self.store.reserve_port("local", [50051], "plugin-b")
+        self.assertEqual(port, 50051)
+
+    def test_reserve_port_while_locked(self):
+        with mock.patch.object(state_store, "RESERVE_BACKOFF", 0):
+            with mock.patch.object(
+                self.store,
+                "_reserve_port",
+                side_effect=[sqlite3.OperationalError("database is locked"), 50051],
+            ):
+                port = self.store.reserve_port("local", [50051], "plugin-a")
+        self.assertEqual(port, 50051)
+
+    def test_reserve_port_locked_too_long(self):
+        error = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(state_store, "RESERVE_BACKOFF", 0):
+            with mock.patch.object(self.store, "_reserve_port", side_effect=error):
+                self.assertRaises(
+                    sqlite3.OperationalError,
+                    self.store.reserve_port,
+                    "local",
+                    [50051],
+                    "plugin-a",
+                )
+
+    def test_release_dead_ports(self):
+        self.store.reserve_port("local", [50051], "plugin-a")
+        self.store.owner = _get_dead_owner()
+        self.store.reserve_port("local", [50052], "plugin-b")
+
+        self.assertEqual(self.store.release_dead_ports(), 1)
+        self.assertEqual(self.store.list_reserved_ports("local"), {50051: "plugin-a"})
+
+
+class TestOwner(unittest.TestCase):
+    def test_current_process_is_alive(self):
+        self.assertTrue(is_alive(get_owner()))
+
+    def test_exited_process_is_dead(self):
+        self.assertFalse(is_alive(_get_dead_owner()))
+
+    def test_owner_of_older_supervisor_is_dead(self):
+        self.assertFalse(is_alive(None))
+
+    def test_owner_of_other_boot_is_dead(self):
+        _, pid, start_time = get_owner().split(":")
+        self.assertFalse(is_alive(f"other-boot:{pid}:{start_time}"))
+
+
+def _get_dead_owner():
+    script = (
+        "from spaceone.supervisor.lib.state_store import get_owner; print(get_owner())"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+
+from spaceone.supervisor.lib.deadline import Deadline
+from spaceone.supervisor.lib.label_index import LabelIndex
+from spaceone.supervisor.model.plugin_record import PluginRecord
+from spaceone.supervisor.service.supervisor_service import (
+    OWNER_DOMAIN_LABEL,
+    SLOT_LABEL,
+    SupervisorService,
+    _create_plugin_name,
+    _get_next_slot,
+    _make_install_params,
+    _make_plugin_labels,
+)
+
+SUPERVISOR = {"name": "root", "hostname": "svc.local", "domain_id": "domain-root"}
+PLUGIN_INFO = {"image": "cloudforet/aws-ec2", "resource_type": "inventory.Collector"}
+
+
+class LabelIndexManager(object):
+    """SupervisorManager over LabelIndex, which records deleted plugins"""
+
+    def __init__(self):
+        self.index = LabelIndex()
+        self.deleted = []
+
+    def add(self, name, labels):
+        plugin = PluginRecord.from_labels(labels, name=name, state="ACTIVE")
+        self.index.add(name, plugin, labels)
+
+    def list_plugins_by_label(self, label, include_unready=False):
+        results = self.index.query(label)
+        return {"results": results, "total_count": len(results)}
+
+    def delete_plugins(self, plugins):
+        for plugin in plugins:
+            self.deleted.append(plugin.name)
+            self.index.remove(plugin.name)
+        return len(plugins)
+
+
+def _make_labels(plugin_id, domain_id, owner_domain_id=SUPERVISOR["domain_id"]):
+    plugin = {"plugin_id": plugin_id, "version": "1.0", "domain_id": domain_id}
+    params = dict(SUPERVISOR, domain_id=owner_domain_id)
+    return _make_plugin_labels(_make_install_params(plugin, params), PLUGIN_INFO)
+
+
+class TestPluginOfOtherDomain(unittest.TestCase):
+    def setUp(self):
+        self.manager = LabelIndexManager()
+        self.service = SupervisorService.__new__(SupervisorService)
+        self.service._supervisor_mgr = self.manager
+        self.service._deadline = Deadline()
+        self.service._deferred = []
+
+    def test_labels(self):
+        labels = _make_labels("plugin-a", "domain-a")
+        self.assertEqual(labels["spaceone.supervisor.domain_id"], "domain-a")
+        self.assertEqual(labels[OWNER_DOMAIN_LABEL], "domain-root")
+
+    def test_discover_plugins(self):
+        self.manager.add("plugin-a-1", _make_labels("plugin-a", "domain-a"))
+        self.manager.add("plugin-b-1", _make_labels("plugin-b", "domain-root"))
+        # same name at other domain is other supervisor identity
+        self.manager.add("plugin-c-1", _make_labels("plugin-c", "domain-c", "domain-c"))
+
+        plugins = self.service.discover_plugins("root", "domain-root")
+        names = sorted(plugin.name for plugin in plugins["results"])
+        self.assertEqual(names, ["plugin-a-1", "plugin-b-1"])
+        self.assertEqual(plugins["total_count"], 2)
+
+    def test_discover_plugins_without_owner_label(self):
+        labels = _make_labels("plugin-a", "domain-a")
+        del labels[OWNER_DOMAIN_LABEL]
+        self.manager.add("plugin-a-1", labels)
+
+        plugins = self.service.discover_plugins("root", "domain-root")
+        self.assertEqual(plugins["total_count"], 1)
+
+    def test_delete_orphan_of_other_domain(self):
+        self.manager.add("plugin-a-1", _make_labels("plugin-a", "domain-a"))
+        self.manager.add("plugin-b-1", _make_labels("plugin-b", "domain-b"))
+        desired = [{"plugin_id": "plugin-b", "version": "1.0", "domain_id": "domain-b"}]
+
+        self.service._delete_plugins(desired, SUPERVISOR)
+        self.assertEqual(self.manager.deleted, ["plugin-a-1"])
+
+    def test_find_local_plugin_of_other_domain(self):
+        self.manager.add("plugin-a-1", _make_labels("plugin-a", "domain-a"))
+        plugin = {"plugin_id": "plugin-a", "version": "1.0", "domain_id": "domain-a"}
+
+        local_plugins = self.service._find_local_plugins(
+            _make_install_params(plugin, SUPERVISOR)
+        )
+        self.assertEqual(local_plugins["total_count"], 1)
+
+
+class TestPluginName(unittest.TestCase):
+    def _create_plugin_name(self, **kwargs):
+        identity = dict(
+            supervisor_name="root",
+            owner_domain_id="domain-root",
+            domain_id="domain-a",
+            plugin_id="plugin-aws-ec2",
+            version="1.0",
+            slot=0,
+        )
+        identity.update(kwargs)
+        return _create_plugin_name(**identity)
+
+    def test_deterministic(self):
+        # retried install gets same name
+        self.assertEqual(self._create_plugin_name(), self._create_plugin_name())
+
+    def test_valid_name(self):
+        name = self._create_plugin_name()
+        self.assertTrue(name.startswith("plugin-aws-ec2-"))
+        # DNS label of kubernetes Service
+        self.assertRegex(name, r"^[a-z0-9]([-a-z0-9]*[a-z0-9])?$")
+        self.assertLessEqual(len(name), 63)
+
+    def test_unique_by_identity(self):
+        names = set(
+            [
+                self._create_plugin_name(),
+                self._create_plugin_name(supervisor_name="dev"),
+                self._create_plugin_name(owner_domain_id="domain-dev"),
+                self._create_plugin_name(domain_id="domain-b"),
+                self._create_plugin_name(version="1.1"),
+                self._create_plugin_name(slot=1),
+            ]
+        )
+        self.assertEqual(len(names), 6)
+
+
+class TestNextSlot(unittest.TestCase):
+    def _make_plugins(self, *slots):
+        plugins = []
+        for slot in slots:
+            labels = {"spaceone.supervisor.plugin_id": "plugin-a"}
+            if slot is not None:
+                labels[SLOT_LABEL] = str(slot)
+            plugins.append(
+                PluginRecord.from_labels(
+                    labels, name=f"plugin-a-{slot}", state="ACTIVE"
+                )
+            )
+        return plugins
+
+    def test_first_slot(self):
+        self.assertEqual(_get_next_slot([]), 0)
+
+    def test_next_slot(self):
+        self.assertEqual(_get_next_slot(self._make_plugins(0)), 1)
+        self.assertEqual(_get_next_slot(self._make_plugins(2, 0)), 3)
+
+    def test_plugin_without_slot_label(self):
+        # installed before slots, it is slot 0
+        self.assertEqual(_get_next_slot(self._make_plugins(None)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()